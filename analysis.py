@@ -20,9 +20,11 @@ import numpy
 from numpy import nan
 
 import scipy
+import scipy.special
 
 from miscellaneous.decomposition import (
     decompose,
+    hashValues,
     DECOMPOSITION_METHOD_NAMES,
     DECOMPOSITION_METHOD_LABEL
 )
@@ -34,6 +36,8 @@ import matplotlib.patches
 import matplotlib.lines
 import matplotlib.gridspec
 import matplotlib.colors
+import matplotlib.cm
+import matplotlib.animation
 from matplotlib.ticker import LogFormatterSciNotation
 from mpl_toolkits.axes_grid1 import make_axes_locatable
 
@@ -43,11 +47,20 @@ from PIL import Image
 
 from pandas import DataFrame
 
-from data import createLabelSorter, standard_deviation, sparsity
+from data import (
+    createLabelSorter, summaryStatistics,
+    decomposition_registry, decompositionRegistryKey, dataSetIdentity
+)
 
 import os
 import gzip
 import pickle
+import atexit
+import hashlib
+import inspect
+import weakref
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
 
 import copy
 import re
@@ -58,11 +71,16 @@ from auxiliary import (
     loadCentroids, loadKLDivergences,
     checkRunID,
     formatTime, formatDuration,
-    normaliseString, properString, capitaliseString, subheading
+    normaliseString, properString, capitaliseString, subheading,
+    enumerateListOfStrings
+)
+from miscellaneous.prediction import (
+    PREDICTION_METHOD_NAMES,
+    contingencyTable
+)
+from miscellaneous.metrics_store import (
+    metricsStorePath, appendToMetricsStore
 )
-from miscellaneous.prediction import PREDICTION_METHOD_NAMES
-
-import warnings
 
 standard_palette = seaborn.color_palette('Set2', 8)
 standard_colour_map = seaborn.cubehelix_palette(light = .95, as_cmap = True)
@@ -86,6 +104,10 @@ reset_plot_look()
 figure_extension = ".png"
 image_extension = ".png"
 
+video_extension = ".mp4"
+animation_extension = ".gif"
+video_frame_rate = 10
+
 publication_figure_extension = ".tiff"
 publication_dpi = 350
 publication_copies = {
@@ -100,14 +122,21 @@ publication_copies = {
     }
 }
 
-maximum_size_for_normal_statistics_computation = 5e8
 maximum_number_of_examples_before_sampling_silhouette_score = 20000
 
 maximum_number_of_bins_for_histograms = 20000
 
-maximum_number_of_values_for_heat_maps = 5000 * 25000
 maximum_number_of_examples_for_square_heat_maps = 10000
 maximum_number_of_examples_for_dendrogram = 1000
+maximum_number_of_examples_for_scatter_plots = 100000
+
+raster_grid_size = 500
+
+maximum_number_of_heat_map_rows = 1000
+maximum_number_of_heat_map_columns = 2000
+
+distance_block_size = 1000
+count_accuracy_block_size = 1000
 
 maximum_number_of_features_for_t_sne = 100
 maximum_number_of_examples_for_t_sne = 200000
@@ -115,6 +144,8 @@ number_of_pca_components_before_tsne = 50
 
 number_of_random_examples = 100
 
+maximum_number_of_figure_timings_shown = 10
+
 evaluation_subset_maximum_number_of_examples = 25
 evaluation_subset_maximum_number_of_examples_per_class = 3
 
@@ -259,8 +290,7 @@ def analyseData(data_sets,
         
         # Heat map for data set
         
-        if "heat_maps" in analyses and \
-            data_set.number_of_values <= maximum_number_of_values_for_heat_maps:
+        if "heat_maps" in analyses:
             
             print("Plotting heat map for {} set.".format(data_set.kind))
             
@@ -273,22 +303,27 @@ def analyseData(data_sets,
             else:
                 labels = None
             
-            figure, figure_name = plotHeatMap(
-                data_set.values,
-                labels = labels,
-                normalisation = data_set.heat_map_normalisation,
-                normalisation_constants = data_set.count_sum,
-                x_name = capitaliseString(data_set.tags["feature"]) + "s",
-                y_name = capitaliseString(data_set.tags["example"]) + "s",
-                z_name = capitaliseString(data_set.tags["value"]) + "s",
-                z_symbol = "x",
-                name = data_set.kind
+            submitFigure(
+                plotHeatMap,
+                plotting_arguments = dict(
+                    values = data_set.values,
+                    labels = labels,
+                    normalisation = data_set.heat_map_normalisation,
+                    normalisation_constants = data_set.count_sum,
+                    x_name = capitaliseString(data_set.tags["feature"]) + "s",
+                    y_name = capitaliseString(data_set.tags["example"]) + "s",
+                    z_name = capitaliseString(data_set.tags["value"]) + "s",
+                    z_symbol = "x",
+                    name = data_set.kind
+                ),
+                export_options = export_options,
+                results_directory = heat_maps_directory
             )
-            saveFigure(figure, figure_name, export_options, heat_maps_directory)
             
-            heat_maps_duration = time() - heat_maps_time_start
-            print("Heat map for {} set plotted and saved ({})."\
-                .format(data_set.kind, formatDuration(heat_maps_duration)))
+            reportFigures(
+                "Heat map for {} set".format(data_set.kind),
+                heat_maps_time_start
+            )
             
             print()
         
@@ -347,43 +382,47 @@ def analyseData(data_sets,
             
             time_start = time()
             
-            figure, figure_name = plotSeries(
-                series = feature_value_standard_deviations,
-                x_label = data_set.tags["feature"] + "s",
-                y_label = "{} standard deviations".format(
-                    data_set.tags["type"]),
-                sort = True,
-                scale = "log",
-                name = ["feature value standard deviations", data_set.kind]
+            submitFigure(
+                plotSeries,
+                plotting_arguments = dict(
+                    series = feature_value_standard_deviations,
+                    x_label = data_set.tags["feature"] + "s",
+                    y_label = "{} standard deviations".format(
+                        data_set.tags["type"]),
+                    sort = True,
+                    scale = "log",
+                    name = ["feature value standard deviations", data_set.kind]
+                ),
+                export_options = export_options,
+                results_directory = feature_value_standard_deviations_directory
             )
-            saveFigure(figure, figure_name, export_options,
-                feature_value_standard_deviations_directory)
             
-            duration = time() - time_start
-            print("    Feature value standard deviations plotted and saved",
-                      "({}).".format(formatDuration(duration)))
+            reportFigures("    Feature value standard deviations", time_start)
             
             ## Distribution of feature value standard deviations
             
             time_start = time()
             
-            figure, figure_name = plotHistogram(
-                series = feature_value_standard_deviations,
-                label = "{} {} standard deviations".format(
-                    data_set.tags["feature"], data_set.tags["type"]
+            submitFigure(
+                plotHistogram,
+                plotting_arguments = dict(
+                    series = feature_value_standard_deviations,
+                    label = "{} {} standard deviations".format(
+                        data_set.tags["feature"], data_set.tags["type"]
+                    ),
+                    normed = True,
+                    x_scale = "linear",
+                    y_scale = "log",
+                    name = ["feature value standard deviations", data_set.kind]
                 ),
-                normed = True,
-                x_scale = "linear",
-                y_scale = "log",
-                name = ["feature value standard deviations", data_set.kind]
+                export_options = export_options,
+                results_directory = feature_value_standard_deviations_directory
             )
-            saveFigure(figure, figure_name, export_options,
-                feature_value_standard_deviations_directory)
             
-            duration = time() - time_start
-            print("    Feature value standard deviation distribution",
-                      "plotted and saved ({}).".format(
-                          formatDuration(duration)))
+            reportFigures(
+                "    Feature value standard deviation distribution",
+                time_start
+            )
             
             print()
 
@@ -426,47 +465,81 @@ def analyseModel(model, run_id = None, analyses = ["default"],
             run_id = run_id
         )
         
-        figure, figure_name = plotLearningCurves(learning_curves, model.type)
-        saveFigure(figure, figure_name, export_options, results_directory)
+        submitFigure(
+            plotLearningCurves,
+            plotting_arguments = dict(
+                curves = learning_curves,
+                model_type = model.type
+            ),
+            export_options = export_options,
+            results_directory = results_directory
+        )
         
         if "video" in export_options:
             print("Plotting learning-curve evolutions for video.")
-            for epoch in range(number_of_epochs_trained):
-                figure, figure_name = plotLearningCurves(
-                    learning_curves,
-                    model.type,
-                    epoch_slice = slice(epoch + 1),
-                    global_y_lim = "video" in export_options
-                )
-                saveFigure(figure, figure_name, export_options,
-                    os.path.join(results_directory, "learning_curve_evolution"))
+            submitFrames(
+                plotLearningCurves,
+                plotting_arguments = dict(
+                    curves = learning_curves,
+                    model_type = model.type,
+                    global_y_lim = True
+                ),
+                number_of_frames = number_of_epochs_trained,
+                results_directory = os.path.join(
+                    results_directory, "learning_curve_evolution")
+            )
         
         if model.type == "SNN":
-            figure, figure_name = plotSeparateLearningCurves(learning_curves,
-                loss = "log_likelihood")
-            saveFigure(figure, figure_name, export_options, results_directory)
+            submitFigure(
+                plotSeparateLearningCurves,
+                plotting_arguments = dict(
+                    curves = learning_curves,
+                    loss = "log_likelihood"
+                ),
+                export_options = export_options,
+                results_directory = results_directory
+            )
         elif "VAE" in model.type:
-            figure, figure_name = plotSeparateLearningCurves(learning_curves,
-                loss = ["lower_bound", "reconstruction_error"])
-            saveFigure(figure, figure_name, export_options, results_directory)
+            submitFigure(
+                plotSeparateLearningCurves,
+                plotting_arguments = dict(
+                    curves = learning_curves,
+                    loss = ["lower_bound", "reconstruction_error"]
+                ),
+                export_options = export_options,
+                results_directory = results_directory
+            )
             if model.type in ["GMVAE"]:
-                figure, figure_name = plotSeparateLearningCurves(learning_curves,
-                    loss = "kl_divergence_z")
-                saveFigure(figure, figure_name, export_options,
-                    results_directory)
-                figure, figure_name = plotSeparateLearningCurves(
-                    learning_curves,
-                    loss = "kl_divergence_y"
+                submitFigure(
+                    plotSeparateLearningCurves,
+                    plotting_arguments = dict(
+                        curves = learning_curves,
+                        loss = "kl_divergence_z"
+                    ),
+                    export_options = export_options,
+                    results_directory = results_directory
+                )
+                submitFigure(
+                    plotSeparateLearningCurves,
+                    plotting_arguments = dict(
+                        curves = learning_curves,
+                        loss = "kl_divergence_y"
+                    ),
+                    export_options = export_options,
+                    results_directory = results_directory
                 )
-                saveFigure(figure, figure_name, export_options, results_directory)
             else:
-                figure, figure_name = plotSeparateLearningCurves(learning_curves,
-                    loss = "kl_divergence")
-                saveFigure(figure, figure_name, export_options, results_directory)
+                submitFigure(
+                    plotSeparateLearningCurves,
+                    plotting_arguments = dict(
+                        curves = learning_curves,
+                        loss = "kl_divergence"
+                    ),
+                    export_options = export_options,
+                    results_directory = results_directory
+                )
     
-        learning_curves_duration = time() - learning_curves_time_start
-        print("Learning curves plotted and saved ({}).".format(
-            formatDuration(learning_curves_duration)))
+        reportFigures("Learning curves", learning_curves_time_start)
     
         print()
     
@@ -488,8 +561,14 @@ def analyseModel(model, run_id = None, analyses = ["default"],
             
             print("Plotting accuracies.")
             
-            figure, figure_name = plotAccuracies(accuracies)
-            saveFigure(figure, figure_name, export_options, results_directory)
+            submitFigure(
+                plotAccuracies,
+                plotting_arguments = dict(
+                    accuracies = accuracies
+                ),
+                export_options = export_options,
+                results_directory = results_directory
+            )
             
             superset_accuracies = loadAccuracies(
                 model = model,
@@ -499,13 +578,17 @@ def analyseModel(model, run_id = None, analyses = ["default"],
             )
             
             if superset_accuracies is not None:
-                figure, figure_name = plotAccuracies(superset_accuracies,
-                    name = "superset")
-                saveFigure(figure, figure_name, export_options, results_directory)
+                submitFigure(
+                    plotAccuracies,
+                    plotting_arguments = dict(
+                        accuracies = superset_accuracies,
+                        name = "superset"
+                    ),
+                    export_options = export_options,
+                    results_directory = results_directory
+                )
             
-            accuracies_duration = time() - accuracies_time_start
-            print("Accuracies plotted and saved ({}).".format(
-                formatDuration(accuracies_duration)))
+            reportFigures("Accuracies", accuracies_time_start)
             
             print()
     
@@ -523,12 +606,16 @@ def analyseModel(model, run_id = None, analyses = ["default"],
         KL_neurons = numpy.sort(KL_neurons, axis = 1)
         log_KL_neurons = numpy.log(KL_neurons)
         
-        figure, figure_name = plotKLDivergenceEvolution(KL_neurons)
-        saveFigure(figure, figure_name, export_options, results_directory)
+        submitFigure(
+            plotKLDivergenceEvolution,
+            plotting_arguments = dict(
+                KL_neurons = KL_neurons
+            ),
+            export_options = export_options,
+            results_directory = results_directory
+        )
         
-        heat_map_duration = time() - heat_map_time_start
-        print("Heat map plotted and saved ({}).".format(
-            formatDuration(heat_map_duration)))
+        reportFigures("Heat map", heat_map_time_start)
         
         print()
     
@@ -578,44 +665,58 @@ def analyseModel(model, run_id = None, analyses = ["default"],
                 centroid_means_decomposed = \
                     distribution_centroids_decomposed["means"]
                 
-                figure, figure_name = plotEvolutionOfCentroidProbabilities(
-                    centroid_probabilities, distribution)
-                saveFigure(figure, figure_name, export_options, centroids_directory)
+                submitFigure(
+                    plotEvolutionOfCentroidProbabilities,
+                    plotting_arguments = dict(
+                        probabilities = centroid_probabilities,
+                        distribution = distribution
+                    ),
+                    export_options = export_options,
+                    results_directory = centroids_directory
+                )
                 
-                figure, figure_name = plotEvolutionOfCentroidMeans(
-                    centroid_means_decomposed, distribution, decomposed)
-                saveFigure(figure, figure_name, export_options, centroids_directory)
+                submitFigure(
+                    plotEvolutionOfCentroidMeans,
+                    plotting_arguments = dict(
+                        means = centroid_means_decomposed,
+                        distribution = distribution,
+                        decomposed = decomposed
+                    ),
+                    export_options = export_options,
+                    results_directory = centroids_directory
+                )
                 
-                figure, figure_name = plotEvolutionOfCentroidCovarianceMatrices(
-                    centroid_covariance_matrices, distribution)
-                saveFigure(figure, figure_name, export_options, centroids_directory)
+                submitFigure(
+                    plotEvolutionOfCentroidCovarianceMatrices,
+                    plotting_arguments = dict(
+                        covariance_matrices = centroid_covariance_matrices,
+                        distribution = distribution
+                    ),
+                    export_options = export_options,
+                    results_directory = centroids_directory
+                )
                 
-                centroids_duration = time() - centroids_time_start
-                print("Evolution of latent {} parameters plotted and saved ({})"\
-                    .format(distribution, formatDuration(centroids_duration)))
+                reportFigures(
+                    "Evolution of latent {} parameters".format(distribution),
+                    centroids_time_start
+                )
                 
                 print()
 
         if "video" in export_options:
             print("Plotting evolution of latent class probabilities for video")
-            centroid_prior_probabilities = centroids["prior"]["probabilities"]
-            centroid_posterior_probabilities = centroids["posterior"]["probabilities"]
-            for i in range(number_of_epochs_trained):
-                figure, figure_name = plotEvolutionOfCentroidProbabilities(
-                    centroid_prior_probabilities[:(i+1), :],
-                    distribution = "prior",
-                    figure = None,
-                    linestyle = "dashed",
-                    name = ["epoch", i]
-                )                
-                figure, figure_name = plotEvolutionOfCentroidProbabilities(
-                    centroid_posterior_probabilities[:(i+1), :],
-                    distribution = "posterior",
-                    figure = figure,
-                    linestyle = "solid",
-                    name = ["epoch", i]
-                )
-                saveFigure(figure, figure_name, export_options, centroids_directory)
+            submitFrames(
+                plotEvolutionOfPriorAndPosteriorCentroidProbabilities,
+                plotting_arguments = dict(
+                    prior_probabilities =
+                        centroids["prior"]["probabilities"],
+                    posterior_probabilities =
+                        centroids["posterior"]["probabilities"],
+                    name = "video"
+                ),
+                number_of_frames = number_of_epochs_trained,
+                results_directory = centroids_directory
+            )
 
             print()
 
@@ -647,16 +748,18 @@ def analyseIntermediateResults(learning_curves = None, epoch_start = None,
     else:
         epoch_name = None
 
-    figure, figure_name = plotLearningCurves(
-        learning_curves,
-        model_type,
-        epoch_offset = epoch_start
+    submitFigure(
+        plotLearningCurves,
+        plotting_arguments = dict(
+            curves = learning_curves,
+            model_type = model_type,
+            epoch_offset = epoch_start
+        ),
+        export_options = export_options,
+        results_directory = results_directory
     )
-    saveFigure(figure, figure_name, export_options, results_directory)
     
-    learning_curves_duration = time() - learning_curves_time_start
-    print("Learning curves plotted and saved ({}).".format(
-        formatDuration(learning_curves_duration)))
+    reportFigures("Learning curves", learning_curves_time_start)
     
     if latent_values is not None:
     
@@ -715,36 +818,45 @@ def analyseIntermediateResults(learning_curves = None, epoch_start = None,
         name = "latent_space-" + epoch_name
     
         if data_set.labels is not None:
-            figure, figure_name = plotValues(
-                latent_values_decomposed,
-                colour_coding = "labels",
-                colouring_data_set = data_set,
-                centroids = centroids_decomposed,
-                figure_labels = figure_labels,
-                name = name
-            )
-            saveFigure(figure, figure_name, export_options = ["video"],
-                results_directory = results_directory)
-            if data_set.label_superset is not None:
-                figure, figure_name = plotValues(
-                    latent_values_decomposed,
-                    colour_coding = "superset labels",
-                    colouring_data_set = data_set,
+            submitFigure(
+                plotValues,
+                plotting_arguments = dict(
+                    values = latent_values_decomposed,
+                    colour_coding = "labels",
+                    colouring_data_set = ColouringData(data_set),
                     centroids = centroids_decomposed,
                     figure_labels = figure_labels,
                     name = name
+                ),
+                export_options = ["video"],
+                results_directory = results_directory
+            )
+            if data_set.label_superset is not None:
+                submitFigure(
+                    plotValues,
+                    plotting_arguments = dict(
+                        values = latent_values_decomposed,
+                        colour_coding = "superset labels",
+                        colouring_data_set = ColouringData(data_set),
+                        centroids = centroids_decomposed,
+                        figure_labels = figure_labels,
+                        name = name
+                    ),
+                    export_options = ["video"],
+                    results_directory = results_directory
                 )
-                saveFigure(figure, figure_name, export_options = ["video"],    
-                    results_directory = results_directory)
         else:
-            figure, figure_name = plotValues(
-                latent_values_decomposed,
-                centroids = centroids_decomposed,
-                figure_labels = figure_labels,
-                name = name
+            submitFigure(
+                plotValues,
+                plotting_arguments = dict(
+                    values = latent_values_decomposed,
+                    centroids = centroids_decomposed,
+                    figure_labels = figure_labels,
+                    name = name
+                ),
+                export_options = ["video"],
+                results_directory = results_directory
             )
-            saveFigure(figure, figure_name, export_options = ["video"],
-                results_directory = results_directory)
     
         if centroids:
             analyseCentroidProbabilities(
@@ -752,16 +864,17 @@ def analyseIntermediateResults(learning_curves = None, epoch_start = None,
                 export_options = ["video"],
                 results_directory = results_directory)
     
-        plot_duration = time() - plot_time_start
-        print("{} plotted and saved ({}).".format(
-            capitaliseString(latent_set_name), formatDuration(plot_duration)))
+        reportFigures(
+            capitaliseString(latent_set_name),
+            plot_time_start
+        )
 
 def analyseResults(evaluation_set, reconstructed_evaluation_set,
     latent_evaluation_sets, model, run_id = None,
     decomposition_methods = ["PCA"], evaluation_subset_indices = set(),
     highlight_feature_indices = [],
     prediction_details = None,
-    early_stopping = False, best_model = False,
+    early_stopping = False, best_model = False, antithetic_sampling = False,
     analyses = ["default"], analysis_level = "normal",
     export_options = [], results_directory = "results"):
     
@@ -784,6 +897,16 @@ def analyseResults(evaluation_set, reconstructed_evaluation_set,
         best_model = best_model
     )
     
+    # Reconstructed and latent data sets are identified in the analysis
+    # cache by the checkpoint of the model
+    global analysis_checkpoint_fingerprint
+    analysis_checkpoint_fingerprint = modelCheckpointFingerprint(
+        model = model,
+        run_id = run_id,
+        early_stopping = early_stopping,
+        best_model = best_model
+    )
+    
     M = evaluation_set.number_of_examples
     
     analyses = parseAnalyses(analyses)
@@ -811,6 +934,9 @@ def analyseResults(evaluation_set, reconstructed_evaluation_set,
     evaluation_directory_parts.append("iw_{}".format(
         model.number_of_importance_samples["evaluation"]))
     
+    if antithetic_sampling:
+        evaluation_directory_parts.append("antithetic")
+    
     evaluation_directory = "-".join(evaluation_directory_parts)
     
     results_directory = buildPathForResultDirectory(
@@ -820,6 +946,8 @@ def analyseResults(evaluation_set, reconstructed_evaluation_set,
         subdirectories = [evaluation_directory]
     )
     
+    version_results_directory = results_directory
+    
     if evaluation_set.kind != "test":
         results_directory = os.path.join(results_directory, evaluation_set.kind)
     
@@ -975,6 +1103,13 @@ def analyseResults(evaluation_set, reconstructed_evaluation_set,
             }
             pickle.dump(metrics_dictionary, metrics_file)
         
+        appendToEnabledMetricsStore(
+            version_results_directory,
+            evaluation_set = evaluation_set.kind,
+            record_kind = "metrics",
+            record = metrics_dictionary
+        )
+        
         if prediction_details:
             
             prediction_log_filename = "{}-prediction-{}".format(
@@ -1061,6 +1196,14 @@ def analyseResults(evaluation_set, reconstructed_evaluation_set,
             
             with gzip.open(prediction_dictionary_path, "w") as prediction_file:
                 pickle.dump(prediction_dictionary, prediction_file)
+            
+            appendToEnabledMetricsStore(
+                version_results_directory,
+                evaluation_set = evaluation_set.kind,
+                record_kind = "prediction",
+                record = prediction_dictionary,
+                prediction_name = prediction_details["id"].replace("-", "")
+            )
         
         metrics_saving_duration = time() - metrics_saving_time_start
         print("Metrics saved ({}).".format(formatDuration(
@@ -1179,45 +1322,55 @@ def analyseResults(evaluation_set, reconstructed_evaluation_set,
                     else:
                         sort_name_part = "unsorted"
                     example_name_parts.append(sort_name_part)
-                    figure, figure_name = plotProfileComparison(
-                        observed_series,
-                        expected_series,
-                        expected_series_total_standard_deviations,
-                        expected_series_explained_standard_deviations,
-                        x_name = evaluation_set.tags["feature"],
-                        y_name = evaluation_set.tags["value"],
-                        sort = sort_profile_comparison,
-                        sort_by = "expected",
-                        sort_direction = "descending",
-                        x_scale = "log",
-                        y_scale = y_scale,
-                        name = example_name_parts
+                    submitFigure(
+                        plotProfileComparison,
+                        plotting_arguments = dict(
+                            observed_series = observed_series,
+                            expected_series = expected_series,
+                            expected_series_total_standard_deviations =
+                                expected_series_total_standard_deviations,
+                            expected_series_explained_standard_deviations =
+                                expected_series_explained_standard_deviations,
+                            x_name = evaluation_set.tags["feature"],
+                            y_name = evaluation_set.tags["value"],
+                            sort = sort_profile_comparison,
+                            sort_by = "expected",
+                            sort_direction = "descending",
+                            x_scale = "log",
+                            y_scale = y_scale,
+                            name = example_name_parts
+                        ),
+                        export_options = export_options,
+                        results_directory = profile_comparisons_directory
                     )
-                    saveFigure(figure, figure_name, export_options,
-                        profile_comparisons_directory)
             
             if maximum_count > 3 * y_cutoff:
                 for y_scale in ["linear", "log", "both"]:
                     example_name_parts = example_name_base_parts.copy()
                     example_name_parts.append("cutoff")
                     example_name_parts.append(y_scale)
-                    figure, figure_name = plotProfileComparison(
-                        observed_series,
-                        expected_series,
-                        expected_series_total_standard_deviations,
-                        expected_series_explained_standard_deviations,
-                        x_name = evaluation_set.tags["feature"],
-                        y_name = evaluation_set.tags["value"],
-                        sort = True,
-                        sort_by = "expected",
-                        sort_direction = "descending",
-                        x_scale = "log",
-                        y_scale = y_scale,
-                        y_cutoff = y_cutoff,
-                        name = example_name_parts
+                    submitFigure(
+                        plotProfileComparison,
+                        plotting_arguments = dict(
+                            observed_series = observed_series,
+                            expected_series = expected_series,
+                            expected_series_total_standard_deviations =
+                                expected_series_total_standard_deviations,
+                            expected_series_explained_standard_deviations =
+                                expected_series_explained_standard_deviations,
+                            x_name = evaluation_set.tags["feature"],
+                            y_name = evaluation_set.tags["value"],
+                            sort = True,
+                            sort_by = "expected",
+                            sort_direction = "descending",
+                            x_scale = "log",
+                            y_scale = y_scale,
+                            y_cutoff = y_cutoff,
+                            name = example_name_parts
+                        ),
+                        export_options = export_options,
+                        results_directory = profile_comparisons_directory
                     )
-                    saveFigure(figure, figure_name, export_options,
-                        profile_comparisons_directory)
             
             # Plot image examples for subset
             if evaluation_set.example_type == "images":
@@ -1243,9 +1396,7 @@ def analyseResults(evaluation_set, reconstructed_evaluation_set,
             if analysis_level == "limited":
                 break
         
-        profile_comparisons_duration = time() - profile_comparisons_time_start
-        print("Profile comparisons plotted and saved ({}).".format(
-            formatDuration(profile_comparisons_duration)))
+        reportFigures("Profile comparisons", profile_comparisons_time_start)
         
         print()
     
@@ -1303,9 +1454,7 @@ def analyseResults(evaluation_set, reconstructed_evaluation_set,
     
     # Heat maps
     
-    if "heat_maps" in analyses and \
-        reconstructed_evaluation_set.number_of_values \
-        <= maximum_number_of_values_for_heat_maps:
+    if "heat_maps" in analyses:
         
         print("Plotting heat maps.")
         
@@ -1315,65 +1464,71 @@ def analyseResults(evaluation_set, reconstructed_evaluation_set,
         
         heat_maps_time_start = time()
         
-        figure, figure_name = plotHeatMap(
-            reconstructed_evaluation_set.values,
-            labels = reconstructed_evaluation_set.labels,
-            normalisation =
-                reconstructed_evaluation_set.heat_map_normalisation,
-            normalisation_constants = evaluation_set.count_sum,
-            x_name = evaluation_set.tags["feature"].capitalize() + "s",
-            y_name = evaluation_set.tags["example"].capitalize() + "s",
-            z_name = evaluation_set.tags["value"].capitalize() + "s",
-            z_symbol = "\\tilde{{x}}",
-            name = "reconstruction"
+        submitFigure(
+            plotHeatMap,
+            plotting_arguments = dict(
+                values = reconstructed_evaluation_set.values,
+                labels = reconstructed_evaluation_set.labels,
+                normalisation =
+                    reconstructed_evaluation_set.heat_map_normalisation,
+                normalisation_constants = evaluation_set.count_sum,
+                x_name = evaluation_set.tags["feature"].capitalize() + "s",
+                y_name = evaluation_set.tags["example"].capitalize() + "s",
+                z_name = evaluation_set.tags["value"].capitalize() + "s",
+                z_symbol = "\\tilde{{x}}",
+                name = "reconstruction"
+            ),
+            export_options = export_options,
+            results_directory = heat_maps_directory
         )
-        saveFigure(figure, figure_name, export_options, heat_maps_directory)
         
-        heat_maps_duration = time() - heat_maps_time_start
-        print("    Reconstruction heat map plotted and saved ({})." \
-            .format(formatDuration(heat_maps_duration)))
+        reportFigures("    Reconstruction heat map", heat_maps_time_start)
         
         ## Differences
         
         if analysis_level == "extensive":
             heat_maps_time_start = time()
             
-            figure, figure_name = plotHeatMap(
-                x_diff,
-                labels = reconstructed_evaluation_set.labels,
-                x_name = evaluation_set.tags["feature"].capitalize() + "s",
-                y_name = evaluation_set.tags["example"].capitalize() + "s",
-                z_name = "Differences",
-                z_symbol = "\\tilde{{x}} - x",
-                name = "difference",
-                center = 0
+            submitFigure(
+                plotHeatMap,
+                plotting_arguments = dict(
+                    values = x_diff,
+                    labels = reconstructed_evaluation_set.labels,
+                    x_name = evaluation_set.tags["feature"].capitalize() + "s",
+                    y_name = evaluation_set.tags["example"].capitalize() + "s",
+                    z_name = "Differences",
+                    z_symbol = "\\tilde{{x}} - x",
+                    name = "difference",
+                    center = 0
+                ),
+                export_options = export_options,
+                results_directory = heat_maps_directory
             )
-            saveFigure(figure, figure_name, export_options, heat_maps_directory)
             
-            heat_maps_duration = time() - heat_maps_time_start
-            print("    Difference heat map plotted and saved ({})." \
-                .format(formatDuration(heat_maps_duration)))
+            reportFigures("    Difference heat map", heat_maps_time_start)
     
         ## log-ratios
         
         if analysis_level == "extensive":
             heat_maps_time_start = time()
             
-            figure, figure_name = plotHeatMap(
-                x_log_ratio,
-                labels = reconstructed_evaluation_set.labels,
-                x_name = evaluation_set.tags["feature"].capitalize() + "s",
-                y_name = evaluation_set.tags["example"].capitalize() + "s",
-                z_name = "log-ratios",
-                z_symbol = "\\log \\frac{{\\tilde{{x}} + 1}}{{x + 1}}",
-                name = "log_ratio",
-                center = 0
+            submitFigure(
+                plotHeatMap,
+                plotting_arguments = dict(
+                    values = x_log_ratio,
+                    labels = reconstructed_evaluation_set.labels,
+                    x_name = evaluation_set.tags["feature"].capitalize() + "s",
+                    y_name = evaluation_set.tags["example"].capitalize() + "s",
+                    z_name = "log-ratios",
+                    z_symbol = "\\log \\frac{{\\tilde{{x}} + 1}}{{x + 1}}",
+                    name = "log_ratio",
+                    center = 0
+                ),
+                export_options = export_options,
+                results_directory = heat_maps_directory
             )
-            saveFigure(figure, figure_name, export_options, heat_maps_directory)
             
-            heat_maps_duration = time() - heat_maps_time_start
-            print("    log-ratio heat map plotted and saved ({})." \
-                .format(formatDuration(heat_maps_duration)))
+            reportFigures("    log-ratio heat map", heat_maps_time_start)
     
     print()
     
@@ -1458,14 +1613,18 @@ def analyseResults(evaluation_set, reconstructed_evaluation_set,
             correlations_time_start = time()
             
             latent_evaluation_set = latent_evaluation_sets[set_name]
-            figure, figure_name = plotVariableCorrelations(
-                latent_evaluation_set.values,
-                latent_evaluation_set.feature_names,
-                latent_evaluation_set,
-                name = ["latent correlations", set_name]
+            submitFigure(
+                plotVariableCorrelations,
+                plotting_arguments = dict(
+                    values = latent_evaluation_set.values,
+                    variable_names = latent_evaluation_set.feature_names,
+                    colouring_data_set = ColouringData(
+                        latent_evaluation_set),
+                    name = ["latent correlations", set_name]
+                ),
+                export_options = export_options,
+                results_directory = correlations_directory
             )
-            saveFigure(figure, figure_name, export_options,
-                correlations_directory)
             
             correlations_duration = time() - correlations_time_start
             print("    Latent correlations for {} plotted ({}).".format(
@@ -1474,6 +1633,8 @@ def analyseResults(evaluation_set, reconstructed_evaluation_set,
             ))
         
         print()
+    
+    analysis_checkpoint_fingerprint = None
 
 def analyseDistributions(data_set, colouring_data_set = None,
     cutoffs = None, preprocessed = False, original_maximum_count = None,
@@ -1500,6 +1661,16 @@ def analyseDistributions(data_set, colouring_data_set = None,
     
     data_set_discreteness = data_set.discreteness and not preprocessed
     
+    ## Cache
+    
+    try:
+        distributions_cache_key = analysisCacheKey(
+            "distributions", cacheIdentity(data_set),
+            cacheIdentity(colouring_data_set), export_options
+        )
+    except ValueError:
+        distributions_cache_key = None
+    
     ## Maximum values for count histograms
     
     maximum_counts = {0: None}
@@ -1530,7 +1701,7 @@ def analyseDistributions(data_set, colouring_data_set = None,
         
         distribution_time_start = time()
         
-        figure, figure_name = plotClassHistogram(
+        plotting_arguments = dict(
             labels = data_set.labels,
             class_names = data_set.class_names,
             class_palette = data_set.class_palette,
@@ -1539,17 +1710,25 @@ def analyseDistributions(data_set, colouring_data_set = None,
             label_sorter = data_set.label_sorter,
             name = data_set_name
         )
-        saveFigure(figure, figure_name, export_options, distribution_directory)
+        submitFigure(
+            plotClassHistogram,
+            plotting_arguments = plotting_arguments,
+            export_options = export_options,
+            results_directory = distribution_directory,
+            cache_key = figureCacheKey(
+                distributions_cache_key,
+                plotClassHistogram,
+                plotting_arguments
+            )
+        )
         
-        distribution_duration = time() - distribution_time_start
-        print("    Class distribution plotted and saved ({})."\
-            .format(formatDuration(distribution_duration)))
+        reportFigures("    Class distribution", distribution_time_start)
     
     if data_set.label_superset and colouring_data_set == data_set:
         
         distribution_time_start = time()
         
-        figure, figure_name = plotClassHistogram(
+        plotting_arguments = dict(
             labels = data_set.superset_labels,
             class_names = data_set.superset_class_names,
             class_palette = data_set.superset_class_palette,
@@ -1558,11 +1737,22 @@ def analyseDistributions(data_set, colouring_data_set = None,
             label_sorter = data_set.superset_label_sorter,
             name = [data_set_name, "superset"]
         )
-        saveFigure(figure, figure_name, export_options, distribution_directory)
+        submitFigure(
+            plotClassHistogram,
+            plotting_arguments = plotting_arguments,
+            export_options = export_options,
+            results_directory = distribution_directory,
+            cache_key = figureCacheKey(
+                distributions_cache_key,
+                plotClassHistogram,
+                plotting_arguments
+            )
+        )
         
-        distribution_duration = time() - distribution_time_start
-        print("    Superset class distribution plotted and saved ({})."\
-            .format(formatDuration(distribution_duration)))
+        reportFigures(
+            "    Superset class distribution",
+            distribution_time_start
+        )
     
     ## Count distribution
     
@@ -1588,7 +1778,7 @@ def analyseDistributions(data_set, colouring_data_set = None,
             count_histogram_name = ["counts", data_set_name]
         
         for x_scale in ["linear", "log"]:
-            figure, figure_name = plotHistogram(
+            plotting_arguments = dict(
                 series = series,
                 excess_zero_count = excess_zero_count,
                 label = data_set.tags["value"].capitalize() + "s",
@@ -1599,8 +1789,17 @@ def analyseDistributions(data_set, colouring_data_set = None,
                 maximum_count = maximum_count,
                 name = count_histogram_name
             )
-            saveFigure(figure, figure_name, export_options,
-                distribution_directory)
+            submitFigure(
+                plotHistogram,
+                plotting_arguments = plotting_arguments,
+                export_options = export_options,
+                results_directory = distribution_directory,
+                cache_key = figureCacheKey(
+                    distributions_cache_key,
+                    plotHistogram,
+                    plotting_arguments
+                )
+            )
         
         if maximum_count:
             maximum_count_string = " (with a maximum count of {:d})".format(
@@ -1608,10 +1807,10 @@ def analyseDistributions(data_set, colouring_data_set = None,
         else:
             maximum_count_string = ""
         
-        distribution_duration = time() - distribution_time_start
-        print("    Count distribution{} plotted and saved ({})."\
-            .format(maximum_count_string,
-                formatDuration(distribution_duration)))
+        reportFigures(
+            "    Count distribution{}".format(maximum_count_string),
+            distribution_time_start
+        )
     
     ## Count distributions with cut-off
 
@@ -1621,7 +1820,7 @@ def analyseDistributions(data_set, colouring_data_set = None,
         distribution_time_start = time()
 
         for cutoff in cutoffs:
-            figure, figure_name = plotCutOffCountHistogram(
+            plotting_arguments = dict(
                 series = series,
                 excess_zero_count = excess_zero_count,
                 cutoff = cutoff,
@@ -1629,18 +1828,28 @@ def analyseDistributions(data_set, colouring_data_set = None,
                 scale = "log",
                 name = data_set_name
             )
-            saveFigure(figure, figure_name, export_options,
-                distribution_directory + "-counts")
+            submitFigure(
+                plotCutOffCountHistogram,
+                plotting_arguments = plotting_arguments,
+                export_options = export_options,
+                results_directory = distribution_directory + "-counts",
+                cache_key = figureCacheKey(
+                    distributions_cache_key,
+                    plotCutOffCountHistogram,
+                    plotting_arguments
+                )
+            )
 
-        distribution_duration = time() - distribution_time_start
-        print("    Count distributions with cut-offs plotted and saved ({})."\
-            .format(formatDuration(distribution_duration)))
+        reportFigures(
+            "    Count distributions with cut-offs",
+            distribution_time_start
+        )
     
     ## Count sum distribution
     
     distribution_time_start = time()
     
-    figure, figure_name = plotHistogram(
+    plotting_arguments = dict(
         series = data_set.count_sum,
         label = "Total number of {}s per {}".format(
             data_set.tags["item"], data_set.tags["example"]
@@ -1649,11 +1858,19 @@ def analyseDistributions(data_set, colouring_data_set = None,
         y_scale = "log",
         name = ["count sum", data_set_name]
     )
-    saveFigure(figure, figure_name, export_options, distribution_directory)
+    submitFigure(
+        plotHistogram,
+        plotting_arguments = plotting_arguments,
+        export_options = export_options,
+        results_directory = distribution_directory,
+        cache_key = figureCacheKey(
+            distributions_cache_key,
+            plotHistogram,
+            plotting_arguments
+        )
+    )
     
-    distribution_duration = time() - distribution_time_start
-    print("    Count sum distribution plotted and saved ({})."\
-        .format(formatDuration(distribution_duration)))
+    reportFigures("    Count sum distribution", distribution_time_start)
     
     ## Count distributions and count sum distributions for each class
     
@@ -1701,7 +1918,7 @@ def analyseDistributions(data_set, colouring_data_set = None,
                 series = data_set.values.reshape(-1)
                 excess_zero_count = 0
             
-            figure, figure_name = plotHistogram(
+            plotting_arguments = dict(
                 series = series,
                 excess_zero_count = excess_zero_count,
                 label = data_set.tags["value"].capitalize() + "s",
@@ -1711,12 +1928,22 @@ def analyseDistributions(data_set, colouring_data_set = None,
                 colour = class_palette[class_name],
                 name = ["counts", data_set_name, "class", class_name]
             )
-            saveFigure(figure, figure_name, export_options,
-                class_count_distribution_directory)
+            submitFigure(
+                plotHistogram,
+                plotting_arguments = plotting_arguments,
+                export_options = export_options,
+                results_directory = class_count_distribution_directory,
+                cache_key = figureCacheKey(
+                    distributions_cache_key,
+                    plotHistogram,
+                    plotting_arguments
+                )
+            )
     
-        distribution_duration = time() - distribution_time_start
-        print("    Count distributions for each class plotted and saved ({})."\
-            .format(formatDuration(distribution_duration)))
+        reportFigures(
+            "    Count distributions for each class",
+            distribution_time_start
+        )
         
         distribution_time_start = time()
         
@@ -1724,7 +1951,7 @@ def analyseDistributions(data_set, colouring_data_set = None,
             class_indices = labels == class_name
             if not class_indices.any():
                 continue
-            figure, figure_name = plotHistogram(
+            plotting_arguments = dict(
                 series = data_set.count_sum[class_indices],
                 label = "Total number of {}s per {}".format(
                     data_set.tags["item"], data_set.tags["example"]
@@ -1734,13 +1961,22 @@ def analyseDistributions(data_set, colouring_data_set = None,
                 colour = class_palette[class_name],
                 name = ["count sum", data_set_name, "class", class_name]
             )
-            saveFigure(figure, figure_name, export_options,
-                class_count_distribution_directory)
+            submitFigure(
+                plotHistogram,
+                plotting_arguments = plotting_arguments,
+                export_options = export_options,
+                results_directory = class_count_distribution_directory,
+                cache_key = figureCacheKey(
+                    distributions_cache_key,
+                    plotHistogram,
+                    plotting_arguments
+                )
+            )
     
-        distribution_duration = time() - distribution_time_start
-        print("    " + \
-            "Count sum distributions for each class plotted and saved ({})."\
-            .format(formatDuration(distribution_duration)))
+        reportFigures(
+            "    Count sum distributions for each class",
+            distribution_time_start
+        )
     
     print()
 
@@ -1783,34 +2019,40 @@ def analyseDistances(data_set, name=None, export_options=[],
                              key = data_set.label_sorter))
         }
     
+    # Shared by both metrics and computed when first needed
+    squared_norms = None
+    
     for metric in ["Euclidean", "cosine"]:
         
-        print("Computing pairwise {} distances in {} space{}.".format(
-            metric,
-            data_set.version,
-            " for {} randomly sampled examples".format(number_of_examples)
-            if number_of_examples != data_set.number_of_examples else ""
-        ))
-        start_time = time()
+        try:
+            distances_cache_key = analysisCacheKey(
+                "distances", cacheIdentity(data_set), metric, name,
+                maximum_number_of_examples_for_dendrogram,
+                maximum_number_of_examples_for_square_heat_maps,
+                export_options
+            )
+        except ValueError:
+            distances_cache_key = None
         
-        distances = computePairwiseDistances(
-            values,
-            metric=metric.lower()
-        )
+        if restoreCachedFigures(distances_cache_key, distances_directory):
+            print("Plots of pairwise {} distances in {} space restored from"
+                " cache.".format(metric, data_set.version))
+            print()
+            continue
         
-        duration = time() - start_time
-        print("Distances computed ({}).".format(formatDuration(duration)))
-        print()
+        print("Computing and plotting pairwise {} distances in {} space."
+            .format(metric, data_set.version))
         
-        print("Plotting pairwise {} distances in {} space.".format(
-            metric, data_set.version
-        ))
+        if squared_norms is None:
+            squared_norms = rowSquaredNorms(values)
         
         sort_methods = ["hierarchical_clustering"]
         
         if labels is not None:
             sort_methods.append("labels")
         
+        figure_cache_keys = []
+        
         for sort_method in sort_methods:
             
             start_time = time()
@@ -1838,26 +2080,46 @@ def analyseDistances(data_set, name=None, export_options=[],
                     sample_size, data_set.tags["example"] + "s"
                 )
             
-            figure, figure_name = plotDistanceMatrix(
-                distances=distances[indices][:, indices],
-                axis_label=axis_label,
-                colour_bar_label="Pairwise cosine distances in {} space"
-                    .format(
-                        "${}$".format(data_set.version)
-                        if len(data_set.version) == 1
-                        else data_set.version
-                    ),
-                sort_method=sort_method,
-                labels=labels[indices] if labels is not None else None,
-                label_kind=data_set.tags["class"],
-                class_palette=class_palette,
-                name=name + [data_set.version, metric, sort_method]
+            # Only the distances between the sampled examples are computed
+            distances = computePairwiseDistances(
+                values[indices],
+                metric = metric.lower(),
+                squared_norms = squared_norms[indices]
+            )
+            
+            if distances_cache_key:
+                figure_cache_key = analysisCacheKey(
+                    distances_cache_key, sort_method)
+            else:
+                figure_cache_key = None
+            
+            figure_cache_key = submitFigure(
+                plotDistanceMatrix,
+                plotting_arguments = dict(
+                    distances = distances,
+                    axis_label = axis_label,
+                    colour_bar_label = "Pairwise cosine distances in {} space"
+                        .format(
+                            "${}$".format(data_set.version)
+                            if len(data_set.version) == 1
+                            else data_set.version
+                        ),
+                    sort_method = sort_method,
+                    labels = labels[indices] if labels is not None else None,
+                    label_kind = data_set.tags["class"],
+                    class_palette = class_palette,
+                    name = name + [data_set.version, metric, sort_method]
+                ),
+                export_options = export_options,
+                results_directory = distances_directory,
+                cache_key = figure_cache_key
             )
-            saveFigure(figure, figure_name, export_options, distances_directory)
+            figure_cache_keys.append(figure_cache_key)
             
             duration = time() - start_time
             print(
-                "    Distances{} sorted using {} plotted and saved ({}).".format(
+                "    Distances{} sorted using {} computed, plotted, and saved"
+                " ({}).".format(
                     " for {} randomly sampled examples".format(sample_size)
                     if sample_size else "",
                     sort_method.replace("_", " "),
@@ -1865,6 +2127,9 @@ def analyseDistances(data_set, name=None, export_options=[],
                 )
             )
         
+        if distances_cache_key and all(figure_cache_keys):
+            saveCachedAnalysis(distances_cache_key, figure_cache_keys)
+        
         print()
 
 def analyseDecompositions(data_sets, other_data_sets = [], centroids = None,
@@ -1921,6 +2186,13 @@ def analyseDecompositions(data_sets, other_data_sets = [], centroids = None,
         if not colouring_data_set:
             colouring_data_set = data_set
         
+        colouring_data = ColouringData(colouring_data_set)
+        highlighted_colouring_data = {
+            feature_index: ColouringData(
+                colouring_data_set, feature_index = feature_index)
+            for feature_index in highlight_feature_indices
+        }
+        
         if data_set.version in ["z", "z1"]:
             centroids = copy.deepcopy(centroids_original)
         else:
@@ -1955,8 +2227,9 @@ def analyseDecompositions(data_sets, other_data_sets = [], centroids = None,
                 other_values_decomposed = other_values
                 centroids_decomposed = centroids
                 
-                if decomposition_method == "t-SNE":
-                    if data_set.number_of_examples \
+                if decomposition_method in ["t-SNE", "NE"]:
+                    if decomposition_method == "t-SNE" \
+                        and data_set.number_of_examples \
                         > maximum_number_of_examples_for_t_sne:
                         
                         print(
@@ -1983,13 +2256,14 @@ def analyseDecompositions(data_sets, other_data_sets = [], centroids = None,
                         decompose_time_start = time()
                         
                         values_decomposed, other_values_decomposed, \
-                            centroids_decomposed = decompose(
+                            centroids_decomposed = cachedDecompose(
                                 values_decomposed,
                                 other_value_sets = other_values_decomposed,
                                 centroids = centroids_decomposed,
                                 method = "pca",
                                 number_of_components = 
-                                    number_of_pca_components_before_tsne
+                                    number_of_pca_components_before_tsne,
+                                data_sets = [data_set, other_data_set]
                             )
                         
                         decompose_duration = time() - decompose_time_start
@@ -2002,19 +2276,20 @@ def analyseDecompositions(data_sets, other_data_sets = [], centroids = None,
                         if scipy.sparse.issparse(values_decomposed):
                             values_decomposed = values_decomposed.A
                         if scipy.sparse.issparse(other_values_decomposed):
-                            other_values_decomposed = values_decomposed.A
+                            other_values_decomposed = other_values_decomposed.A
                 
                 print("Decomposing {} using {}.".format(
                     title_with_ID, decomposition_method))
                 decompose_time_start = time()
                 
                 values_decomposed, other_values_decomposed, \
-                    centroids_decomposed = decompose(
+                    centroids_decomposed = cachedDecompose(
                         values_decomposed,
                         other_value_sets = other_values_decomposed,
                         centroids = centroids_decomposed,
                         method = decomposition_method,
-                        number_of_components = 2
+                        number_of_components = 2,
+                        data_sets = [data_set, other_data_set]
                     )
                 
                 decompose_duration = time() - decompose_time_start
@@ -2047,6 +2322,19 @@ def analyseDecompositions(data_sets, other_data_sets = [], centroids = None,
                 "y label": y_label
             }
             
+            try:
+                decomposition_cache_key = analysisCacheKey(
+                    "decomposition figures",
+                    cacheIdentity(data_set),
+                    cacheIdentity(other_data_set),
+                    cacheIdentity(colouring_data_set),
+                    decomposition_method,
+                    centroids is not None,
+                    export_options
+                )
+            except ValueError:
+                decomposition_cache_key = None
+            
             if other_data_set:
                 plot_values_decomposed = other_values_decomposed
             else:
@@ -2150,80 +2438,107 @@ def analyseDecompositions(data_sets, other_data_sets = [], centroids = None,
             
                 plot_time_start = time()
             
-                figure, figure_name = plotValues(
-                    plot_values_decomposed,
+                plotting_arguments = dict(
+                    values = plot_values_decomposed,
                     centroids = centroids_decomposed,
                     figure_labels = figure_labels,
                     axis_limits = axis_limits,
                     example_tag = data_set.tags["example"],
                     name = plot_name
                 )
-                saveFigure(figure, figure_name, export_options,
-                    decompositions_directory)
+                submitFigure(
+                    plotValues,
+                    plotting_arguments = plotting_arguments,
+                    export_options = export_options,
+                    results_directory = decompositions_directory,
+                    cache_key = figureCacheKey(
+                        decomposition_cache_key,
+                        plotValues,
+                        plotting_arguments
+                    )
+                )
             
-                plot_duration = time() - plot_time_start
-                print("    {} plotted and saved ({}).".format(
-                    capitaliseString(title_with_ID),
-                    formatDuration(plot_duration)
-                ))
+                reportFigures(
+                    "    {}".format(capitaliseString(title_with_ID)),
+                    plot_time_start
+                )
         
                 # Labels
         
                 if colouring_data_set.labels is not None:
                     plot_time_start = time()
             
-                    figure, figure_name = plotValues(
-                        plot_values_decomposed,
+                    plotting_arguments = dict(
+                        values = plot_values_decomposed,
                         colour_coding = "labels",
-                        colouring_data_set = colouring_data_set,
+                        colouring_data_set = colouring_data,
                         centroids = centroids_decomposed,
                         figure_labels = figure_labels,
                         axis_limits = axis_limits,
                         example_tag = data_set.tags["example"],
                         name = plot_name
                     )
-                    saveFigure(figure, figure_name, export_options,
-                        decompositions_directory)
+                    submitFigure(
+                        plotValues,
+                        plotting_arguments = plotting_arguments,
+                        export_options = export_options,
+                        results_directory = decompositions_directory,
+                        cache_key = figureCacheKey(
+                            decomposition_cache_key,
+                            plotValues,
+                            plotting_arguments
+                        )
+                    )
         
-                    plot_duration = time() - plot_time_start
-                    print("    {} (with labels) plotted and saved ({}).".format(
-                        capitaliseString(title_with_ID), formatDuration(plot_duration)))
+                    reportFigures(
+                        "    {} (with labels)".format(
+                            capitaliseString(title_with_ID)
+                        ),
+                        plot_time_start
+                    )
                 
                     if colouring_data_set.superset_labels is not None:
                         plot_time_start = time()
                     
-                        figure, figure_name = plotValues(
-                            plot_values_decomposed,
+                        plotting_arguments = dict(
+                            values = plot_values_decomposed,
                             colour_coding = "superset labels",
-                            colouring_data_set = colouring_data_set,
+                            colouring_data_set = colouring_data,
                             centroids = centroids_decomposed,
                             figure_labels = figure_labels,
                             axis_limits = axis_limits,
                             example_tag = data_set.tags["example"],
                             name = plot_name
                         )
-                        saveFigure(figure, figure_name, export_options,
-                            decompositions_directory)
-                    
-                        plot_duration = time() - plot_time_start
-                        print("    " +
-                            "{} (with superset labels) plotted and saved ({})."\
-                                .format(
-                                    capitaliseString(title_with_ID),
-                                    formatDuration(plot_duration)
+                        submitFigure(
+                            plotValues,
+                            plotting_arguments = plotting_arguments,
+                            export_options = export_options,
+                            results_directory = decompositions_directory,
+                            cache_key = figureCacheKey(
+                                decomposition_cache_key,
+                                plotValues,
+                                plotting_arguments
                             )
                         )
                     
+                        reportFigures(
+                            "    {} (with superset labels)".format(
+                                capitaliseString(title_with_ID)
+                            ),
+                            plot_time_start
+                        )
+                    
                     if analysis_level == "extensive":
                         
                         if colouring_data_set.number_of_classes <= 10:
                             plot_time_start = time()
                         
                             for class_name in colouring_data_set.class_names:
-                                figure, figure_name = plotValues(
-                                    plot_values_decomposed,
+                                plotting_arguments = dict(
+                                    values = plot_values_decomposed,
                                     colour_coding = "class",
-                                    colouring_data_set = colouring_data_set,
+                                    colouring_data_set = colouring_data,
                                     centroids = centroids_decomposed,
                                     class_name = class_name,
                                     figure_labels = figure_labels,
@@ -2231,15 +2546,24 @@ def analyseDecompositions(data_sets, other_data_sets = [], centroids = None,
                                     example_tag = data_set.tags["example"],
                                     name = plot_name
                                 )
-                                saveFigure(figure, figure_name, export_options,
-                                    decompositions_directory)
+                                submitFigure(
+                                    plotValues,
+                                    plotting_arguments = plotting_arguments,
+                                    export_options = export_options,
+                                    results_directory = decompositions_directory,
+                                    cache_key = figureCacheKey(
+                                        decomposition_cache_key,
+                                        plotValues,
+                                        plotting_arguments
+                                    )
+                                )
                         
-                            plot_duration = time() - plot_time_start
-                            print("    {} (for each class) plotted and saved ({})."\
-                                .format(
-                                    capitaliseString(title_with_ID),
-                                    formatDuration(plot_duration)
-                            ))
+                            reportFigures(
+                                "    {} (for each class)".format(
+                                    capitaliseString(title_with_ID)
+                                ),
+                                plot_time_start
+                            )
                         
                         if colouring_data_set.superset_labels is not None \
                             and data_set.number_of_superset_classes <= 10:
@@ -2248,10 +2572,10 @@ def analyseDecompositions(data_sets, other_data_sets = [], centroids = None,
                         
                             for superset_class_name in \
                                 colouring_data_set.superset_class_names:
-                                figure, figure_name = plotValues(
-                                    plot_values_decomposed,
+                                plotting_arguments = dict(
+                                    values = plot_values_decomposed,
                                     colour_coding = "superset class",
-                                    colouring_data_set = colouring_data_set,
+                                    colouring_data_set = colouring_data,
                                     centroids = centroids_decomposed,
                                     class_name = superset_class_name,
                                     figure_labels = figure_labels,
@@ -2259,119 +2583,158 @@ def analyseDecompositions(data_sets, other_data_sets = [], centroids = None,
                                     example_tag = data_set.tags["example"],
                                     name = plot_name
                                 )
-                                saveFigure(figure, figure_name, export_options,
-                                    decompositions_directory)
+                                submitFigure(
+                                    plotValues,
+                                    plotting_arguments = plotting_arguments,
+                                    export_options = export_options,
+                                    results_directory = decompositions_directory,
+                                    cache_key = figureCacheKey(
+                                        decomposition_cache_key,
+                                        plotValues,
+                                        plotting_arguments
+                                    )
+                                )
                         
-                            plot_duration = time() - plot_time_start
-                            print("    " +
-                                "{} (for each superset class) plotted and saved ({})."\
-                                    .format(
-                                        capitaliseString(title_with_ID),
-                                        formatDuration(plot_duration)
-                            ))
+                            reportFigures(
+                                "    {} (for each superset class)".format(
+                                    capitaliseString(title_with_ID)
+                                ),
+                                plot_time_start
+                            )
                 
                 ## Predictions
                 
                 if colouring_data_set.has_predicted_cluster_ids:
                     plot_time_start = time()
                     
-                    figure, figure_name = plotValues(
-                        plot_values_decomposed,
+                    plotting_arguments = dict(
+                        values = plot_values_decomposed,
                         colour_coding = "predicted cluster IDs",
-                        colouring_data_set = colouring_data_set,
+                        colouring_data_set = colouring_data,
                         centroids = centroids_decomposed,
                         figure_labels = figure_labels,
                         prediction_details = prediction_details,
                         axis_limits = axis_limits,
                         example_tag = data_set.tags["example"],
-                        name = plot_name,
+                        name = plot_name
                     )
-                    saveFigure(figure, figure_name, export_options,
-                        decompositions_directory)
-                
-                    plot_duration = time() - plot_time_start
-                    print("    " +
-                        "{} (with predicted cluster IDs) plotted and saved ({})."\
-                            .format(
-                                capitaliseString(title_with_ID),
-                                formatDuration(plot_duration)
+                    submitFigure(
+                        plotValues,
+                        plotting_arguments = plotting_arguments,
+                        export_options = export_options,
+                        results_directory = decompositions_directory,
+                        cache_key = figureCacheKey(
+                            decomposition_cache_key,
+                            plotValues,
+                            plotting_arguments
                         )
                     )
                 
+                    reportFigures(
+                        "    {} (with predicted cluster IDs)".format(
+                            capitaliseString(title_with_ID)
+                        ),
+                        plot_time_start
+                    )
+                
                 if colouring_data_set.has_predicted_labels:
                     plot_time_start = time()
                     
-                    figure, figure_name = plotValues(
-                        plot_values_decomposed,
+                    plotting_arguments = dict(
+                        values = plot_values_decomposed,
                         colour_coding = "predicted labels",
-                        colouring_data_set = colouring_data_set,
+                        colouring_data_set = colouring_data,
                         centroids = centroids_decomposed,
                         figure_labels = figure_labels,
                         prediction_details = prediction_details,
                         axis_limits = axis_limits,
                         example_tag = data_set.tags["example"],
-                        name = plot_name,
+                        name = plot_name
                     )
-                    saveFigure(figure, figure_name, export_options,
-                        decompositions_directory)
-                    
-                    plot_duration = time() - plot_time_start
-                    print("    " +
-                        "{} (with predicted labels) plotted and saved ({})."\
-                            .format(
-                                capitaliseString(title_with_ID),
-                                formatDuration(plot_duration)
+                    submitFigure(
+                        plotValues,
+                        plotting_arguments = plotting_arguments,
+                        export_options = export_options,
+                        results_directory = decompositions_directory,
+                        cache_key = figureCacheKey(
+                            decomposition_cache_key,
+                            plotValues,
+                            plotting_arguments
                         )
                     )
+                    
+                    reportFigures(
+                        "    {} (with predicted labels)".format(
+                            capitaliseString(title_with_ID)
+                        ),
+                        plot_time_start
+                    )
                 
                 if colouring_data_set.has_predicted_superset_labels:
                     plot_time_start = time()
                     
-                    figure, figure_name = plotValues(
-                        plot_values_decomposed,
+                    plotting_arguments = dict(
+                        values = plot_values_decomposed,
                         colour_coding = "predicted superset labels",
-                        colouring_data_set = colouring_data_set,
+                        colouring_data_set = colouring_data,
                         centroids = centroids_decomposed,
                         figure_labels = figure_labels,
                         prediction_details = prediction_details,
                         axis_limits = axis_limits,
                         example_tag = data_set.tags["example"],
-                        name = plot_name,
+                        name = plot_name
                     )
-                    saveFigure(figure, figure_name, export_options,
-                        decompositions_directory)
-                    
-                    plot_duration = time() - plot_time_start
-                    print("    " +
-                        "{} (with predicted superset labels) plotted and saved ({})."\
-                            .format(
-                                capitaliseString(title_with_ID),
-                                formatDuration(plot_duration)
+                    submitFigure(
+                        plotValues,
+                        plotting_arguments = plotting_arguments,
+                        export_options = export_options,
+                        results_directory = decompositions_directory,
+                        cache_key = figureCacheKey(
+                            decomposition_cache_key,
+                            plotValues,
+                            plotting_arguments
                         )
                     )
+                    
+                    reportFigures(
+                        "    {} (with predicted superset labels)".format(
+                            capitaliseString(title_with_ID)
+                        ),
+                        plot_time_start
+                    )
                 
                 # Count sum
                 
                 plot_time_start = time()
         
-                figure, figure_name = plotValues(
-                    plot_values_decomposed,
+                plotting_arguments = dict(
+                    values = plot_values_decomposed,
                     colour_coding = "count sum",
-                    colouring_data_set = colouring_data_set,
+                    colouring_data_set = colouring_data,
                     centroids = centroids_decomposed,
                     figure_labels = figure_labels,
                     axis_limits = axis_limits,
                     example_tag = data_set.tags["example"],
                     name = plot_name
                 )
-                saveFigure(figure, figure_name, export_options,
-                    decompositions_directory)
+                submitFigure(
+                    plotValues,
+                    plotting_arguments = plotting_arguments,
+                    export_options = export_options,
+                    results_directory = decompositions_directory,
+                    cache_key = figureCacheKey(
+                        decomposition_cache_key,
+                        plotValues,
+                        plotting_arguments
+                    )
+                )
         
-                plot_duration = time() - plot_time_start
-                print("    {} (with count sum) plotted and saved ({}).".format(
-                    capitaliseString(title_with_ID),
-                    formatDuration(plot_duration)
-                ))
+                reportFigures(
+                    "    {} (with count sum)".format(
+                        capitaliseString(title_with_ID)
+                    ),
+                    plot_time_start
+                )
                 
                 # Features
                 
@@ -2379,10 +2742,11 @@ def analyseDecompositions(data_sets, other_data_sets = [], centroids = None,
             
                     plot_time_start = time()
             
-                    figure, figure_name = plotValues(
-                        plot_values_decomposed,
+                    plotting_arguments = dict(
+                        values = plot_values_decomposed,
                         colour_coding = "feature",
-                        colouring_data_set = colouring_data_set,
+                        colouring_data_set = \
+                            highlighted_colouring_data[feature_index],
                         centroids = centroids_decomposed,
                         feature_index = feature_index,
                         figure_labels = figure_labels,
@@ -2390,15 +2754,25 @@ def analyseDecompositions(data_sets, other_data_sets = [], centroids = None,
                         example_tag = data_set.tags["example"],
                         name = plot_name
                     )
-                    saveFigure(figure, figure_name, export_options,
-                        decompositions_directory)
-            
-                    plot_duration = time() - plot_time_start
-                    print("    {} (with {}) plotted and saved ({}).".format(
-                        capitaliseString(title_with_ID),
-                        data_set.feature_names[feature_index],
-                        formatDuration(plot_duration)
-                    ))
+                    submitFigure(
+                        plotValues,
+                        plotting_arguments = plotting_arguments,
+                        export_options = export_options,
+                        results_directory = decompositions_directory,
+                        cache_key = figureCacheKey(
+                            decomposition_cache_key,
+                            plotValues,
+                            plotting_arguments
+                        )
+                    )
+            
+                    reportFigures(
+                        "    {} (with {})".format(
+                            capitaliseString(title_with_ID),
+                            data_set.feature_names[feature_index]
+                        ),
+                        plot_time_start
+                    )
                 
                 print()
 
@@ -2452,20 +2826,22 @@ def analyseCentroidProbabilities(centroids, name = None,
         else:
             plot_name = "posterior"
 
-    figure, figure_name = plotProbabilities(
-        posterior_probabilities,
-        prior_probabilities,
-        x_label = x_label,
-        y_label = y_label,
-        palette = centroids_palette,
-        uniform = False,
-        name = plot_name
+    submitFigure(
+        plotProbabilities,
+        plotting_arguments = dict(
+            posterior_probabilities = posterior_probabilities,
+            prior_probabilities = prior_probabilities,
+            x_label = x_label,
+            y_label = y_label,
+            palette = centroids_palette,
+            uniform = False,
+            name = plot_name
+        ),
+        export_options = export_options,
+        results_directory = results_directory
     )
-    saveFigure(figure, figure_name, export_options, results_directory)
     
-    plot_duration = time() - plot_time_start
-    print("Centroid probabilities plotted and saved ({}).".format(
-        formatDuration(plot_duration)))
+    reportFigures("Centroid probabilities", plot_time_start)
 
 def evaluationSubsetIndices(evaluation_set,
     maximum_number_of_examples_per_class =
@@ -2503,23 +2879,20 @@ def evaluationSubsetIndices(evaluation_set,
 
 def statistics(x, name = "", tolerance = 1e-3, skip_sparsity = False):
     
-    batch_size = None
+    x_statistics = summaryStatistics(x, tolerance = tolerance, ddof = 1)
     
-    if x.size > maximum_size_for_normal_statistics_computation:
-        batch_size = 1000
+    x_mean = x_statistics["mean"]
+    x_std = numpy.sqrt(x_statistics["variance"])
     
-    x_mean = x.mean()
-    x_std = standard_deviation(x, ddof=1, batch_size=batch_size)
-    
-    x_min  = x.min()
-    x_max  = x.max()
+    x_min  = x_statistics["minimum"]
+    x_max  = x_statistics["maximum"]
     
     x_dispersion = x_std**2 / x_mean
     
     if skip_sparsity:
         x_sparsity = nan
     else:
-        x_sparsity = sparsity(x, tolerance=tolerance, batch_size=batch_size)
+        x_sparsity = x_statistics["sparsity"]
     
     statistics = {
         "name": name,
@@ -2554,166 +2927,423 @@ def accuracy(labels, predicted_labels, excluded_classes = []):
         labels, predicted_labels, excluded_classes = excluded_classes)
     return numpy.mean(predicted_labels == labels)
 
-def adjusted_rand_index(labels, predicted_labels, excluded_classes = []):
-    labels, predicted_labels = excludeClassesFromLabelSet(
-        labels, predicted_labels, excluded_classes = excluded_classes)
-    return sklearn.metrics.cluster.adjusted_rand_score(labels,
-        predicted_labels)
-
-def adjusted_mutual_information(labels, predicted_labels, excluded_classes = []):
-    labels, predicted_labels = excludeClassesFromLabelSet(
-        labels, predicted_labels, excluded_classes = excluded_classes)
-    return sklearn.metrics.cluster.adjusted_mutual_info_score(labels,
-        predicted_labels)
-
-def silhouette_score(values, predicted_labels):
+def labelSetContingencyTable(labels, predicted_labels, excluded_classes = []):
     
-    number_of_predicted_classes = numpy.unique(predicted_labels).shape[0]
-    number_of_examples = values.shape[0]
+    # Number of examples for each predicted class (rows) and class (columns)
+    # with excluded classes removed in one pass
     
-    if number_of_predicted_classes < 2 \
-        or number_of_predicted_classes > number_of_examples - 1:
-            return nan
+    labels = numpy.asarray(labels)
+    predicted_labels = numpy.asarray(predicted_labels)
     
-    sample_size = None
+    if len(excluded_classes) > 0:
+        included_indices = ~numpy.isin(labels, excluded_classes)
+        labels = labels[included_indices]
+        predicted_labels = predicted_labels[included_indices]
     
-    if number_of_examples \
-        > maximum_number_of_examples_before_sampling_silhouette_score:
-            sample_size \
-                = maximum_number_of_examples_before_sampling_silhouette_score
+    class_names, label_ids = numpy.unique(labels, return_inverse = True)
     
-    score = sklearn.metrics.silhouette_score(
-        X=values,
-        labels=predicted_labels,
-        sample_size=sample_size
-    )
+    table, predicted_class_names, _ = contingencyTable(
+        label_ids, predicted_labels, number_of_classes = len(class_names))
     
-    return score
+    return table, class_names, predicted_class_names
 
-def formatStatistics(statistics_sets, name = "Data set"):
-    
-    if type(statistics_sets) != list:
-        statistics_sets = [statistics_sets]
-    
-    name_width = len(name)
+def adjustedRandIndexFromContingencyTable(table):
     
-    for statistics_set in statistics_sets:
-        name_width = max(len(statistics_set["name"]), name_width)
+    # Pair-confusion formulation as in scikit-learn using Python integers
+    # to avoid overflow for large data sets
     
-    table_heading = "  ".join(["{:{}}".format(name, name_width),
-        " mean ", "std. dev. ", "dispersion",
-        " minimum ", " maximum ","sparsity"])
+    N = int(table.sum())
+    predicted_class_sizes = table.sum(axis = 1)
+    class_sizes = table.sum(axis = 0)
     
-    table_rows = [table_heading]
+    sum_of_squares = int((table.astype(numpy.int64) ** 2).sum())
     
-    for statistics_set in statistics_sets:
-        table_row_parts = [
-            "{:{}}".format(statistics_set["name"], name_width),
-            "{:<9.5g}".format(statistics_set["mean"]),
-            "{:<9.5g}".format(statistics_set["standard deviation"]),
-            "{:<9.5g}".format(statistics_set["dispersion"]),
-            "{:<11.5g}".format(statistics_set["minimum"]),
-            "{:<11.5g}".format(statistics_set["maximum"]),
-            "{:<7.5g}".format(statistics_set["sparsity"]),
-        ]
-        table_row = "  ".join(table_row_parts)
-        table_rows.append(table_row)
+    true_positives = sum_of_squares - N
+    false_positives = int(table.dot(class_sizes).sum()) - sum_of_squares
+    false_negatives = int(table.T.dot(predicted_class_sizes).sum()) \
+        - sum_of_squares
+    true_negatives = N ** 2 - false_positives - false_negatives \
+        - sum_of_squares
     
-    table = "\n".join(table_rows)
+    if false_negatives == 0 and false_positives == 0:
+        return 1.0
     
-    return table
+    return 2.0 * (true_positives * true_negatives
+        - false_negatives * false_positives) / (
+            (true_positives + false_negatives)
+            * (false_negatives + true_negatives)
+        + (true_positives + false_positives)
+            * (false_positives + true_negatives)
+    )
 
-def computeCountAccuracies(x, x_tilde, method = None):
-    """
-    Compute accuracies for every count in original data set
-    using reconstructed data set.
-    """
+def entropyFromCounts(counts):
     
-    # Setting up
+    counts = counts[counts > 0].astype(numpy.float64)
     
-    count_accuracies = {}
-    M, N = x.shape
+    if counts.size == 0:
+        return 1.0
     
-    ## Round data sets to be able to compare
-    x = numpy.round(x)
-    x_tilde = numpy.round(x_tilde)
+    total = counts.sum()
     
-    ## Compute the max count value
-    k_max = x.max().astype(int)
+    return -numpy.sum((counts / total) * (numpy.log(counts) - numpy.log(total)))
+
+def expectedMutualInformation(table):
     
-    if method == "orders of magnitude":
+    # Expected mutual information under the hypergeometric model of
+    # randomness with the terms for each row computed at once
+    
+    N = int(table.sum())
+    row_sums = table.sum(axis = 1).astype(numpy.int64)
+    column_sums = table.sum(axis = 0).astype(numpy.int64)
+    
+    column_sums = column_sums[column_sums > 0]
+    
+    log_N_factorial = scipy.special.gammaln(N + 1)
+    log_column_sums = numpy.log(column_sums)
+    log_column_factorials = scipy.special.gammaln(column_sums + 1) \
+        + scipy.special.gammaln(N - column_sums + 1)
+    
+    expected_mutual_information = 0.0
+    
+    for row_sum in row_sums[row_sums > 0]:
         
-        log_k_max_floored = numpy.floor(numpy.log10(k_max)).astype(int)
+        starts = numpy.maximum(row_sum + column_sums - N, 1)
+        ends = numpy.minimum(row_sum, column_sums) + 1
+        lengths = numpy.maximum(ends - starts, 0)
+        
+        if lengths.sum() == 0:
+            continue
+        
+        column_indices = numpy.repeat(numpy.arange(len(column_sums)), lengths)
+        offsets = numpy.arange(lengths.sum()) \
+            - numpy.repeat(numpy.cumsum(lengths) - lengths, lengths)
+        n = starts[column_indices] + offsets
+        b = column_sums[column_indices]
+        
+        log_terms = numpy.log(N) + numpy.log(n) - numpy.log(row_sum) \
+            - log_column_sums[column_indices]
+        
+        log_probabilities = scipy.special.gammaln(row_sum + 1) \
+            + scipy.special.gammaln(N - row_sum + 1) \
+            + log_column_factorials[column_indices] \
+            - log_N_factorial \
+            - scipy.special.gammaln(n + 1) \
+            - scipy.special.gammaln(row_sum - n + 1) \
+            - scipy.special.gammaln(b - n + 1) \
+            - scipy.special.gammaln(N - row_sum - b + n + 1)
+        
+        expected_mutual_information += numpy.sum(
+            n / N * log_terms * numpy.exp(log_probabilities))
+    
+    return expected_mutual_information
+
+def adjustedMutualInformationFromContingencyTable(table):
+    
+    # Arithmetic normalisation as the scikit-learn default
+    
+    number_of_predicted_classes, number_of_classes = table.shape
+    
+    if number_of_predicted_classes == number_of_classes == 1 \
+        or number_of_predicted_classes == number_of_classes == 0:
+            return 1.0
+    
+    N = table.sum()
+    predicted_class_sizes = table.sum(axis = 1)
+    class_sizes = table.sum(axis = 0)
+    
+    row_indices, column_indices = numpy.nonzero(table)
+    counts = table[row_indices, column_indices].astype(numpy.float64)
+    
+    mutual_information = counts / N * (
+        numpy.log(counts) - numpy.log(N)
+        - numpy.log(
+            predicted_class_sizes[row_indices].astype(numpy.float64)
+            * class_sizes[column_indices]
+        )
+        + 2 * numpy.log(N)
+    )
+    mutual_information[
+        numpy.abs(mutual_information) < numpy.finfo(numpy.float64).eps] = 0
+    mutual_information = max(mutual_information.sum(), 0)
+    
+    expected_mutual_information = expectedMutualInformation(table)
+    
+    normaliser = numpy.mean([
+        entropyFromCounts(class_sizes),
+        entropyFromCounts(predicted_class_sizes)
+    ])
+    
+    eps = numpy.finfo(numpy.float64).eps
+    denominator = normaliser - expected_mutual_information
+    
+    if denominator < 0:
+        denominator = min(denominator, -eps)
+    else:
+        denominator = max(denominator, eps)
+    
+    return (mutual_information - expected_mutual_information) / denominator
+
+def adjusted_rand_index(labels, predicted_labels, excluded_classes = []):
+    table, _, _ = labelSetContingencyTable(
+        labels, predicted_labels, excluded_classes)
+    return adjustedRandIndexFromContingencyTable(table)
+
+def adjusted_mutual_information(labels, predicted_labels, excluded_classes = []):
+    table, _, _ = labelSetContingencyTable(
+        labels, predicted_labels, excluded_classes)
+    return adjustedMutualInformationFromContingencyTable(table)
+
+def silhouetteScores(values, predicted_label_sets, sample_size = None,
+    random_state = None, block_size = None):
+    
+    # Silhouette scores for several sets of predicted labels sharing one
+    # pass over blocks of rows of the distance matrix. For each block, the
+    # summed distances to each predicted class are found by multiplying
+    # with one-hot encodings of the predicted labels.
+    
+    if block_size is None:
+        block_size = distance_block_size
+    
+    M = values.shape[0]
+    
+    scores = {}
+    label_id_sets = {}
+    
+    for name, predicted_labels in predicted_label_sets.items():
+        number_of_predicted_classes = numpy.unique(predicted_labels).shape[0]
+        if number_of_predicted_classes < 2 \
+            or number_of_predicted_classes > M - 1:
+                scores[name] = nan
+        else:
+            label_id_sets[name] = numpy.asarray(predicted_labels)
+    
+    if not label_id_sets:
+        return scores
+    
+    if sample_size is not None and sample_size < M:
+        random_state = numpy.random.RandomState(random_state)
+        sample_indices = random_state.permutation(M)[:sample_size]
+        values = values[sample_indices]
+        label_id_sets = {
+            name: predicted_labels[sample_indices]
+            for name, predicted_labels in label_id_sets.items()
+        }
+        M = sample_size
+    
+    one_hot_encodings = {}
+    class_sizes = {}
+    
+    for name in list(label_id_sets):
+        _, label_ids = numpy.unique(
+            label_id_sets[name], return_inverse = True)
+        K = label_ids.max() + 1
+        if K < 2 or K > M - 1:
+            scores[name] = nan
+            del label_id_sets[name]
+            continue
+        label_id_sets[name] = label_ids
+        one_hot_encodings[name] = scipy.sparse.csr_matrix(
+            (numpy.ones(M), (numpy.arange(M), label_ids)),
+            shape = (M, K)
+        )
+        class_sizes[name] = numpy.bincount(label_ids, minlength = K)
+    
+    silhouettes = {name: numpy.empty(M) for name in label_id_sets}
+    
+    for start in range(0, M, block_size):
         
-        for l in range(log_k_max_floored + 1):
+        block = slice(start, min(start + block_size, M))
+        
+        distances = sklearn.metrics.pairwise_distances(values[block], values)
+        
+        for name, label_ids in label_id_sets.items():
             
-            x_scaled_floored = numpy.floor(x / pow(10, l))
-            x_tilde_scaled_floored = numpy.floor(x_tilde / pow(10, l))
+            class_distances = (one_hot_encodings[name].T @ distances.T).T
+            class_distances = numpy.asarray(class_distances)
             
-            k_max_scaled_floored = x_scaled_floored.max().astype(int)
+            own_label_ids = label_ids[block]
+            rows = numpy.arange(len(own_label_ids))
             
-            k_start = 1
+            intra_class_distances = class_distances[rows, own_label_ids]
+            class_distances[rows, own_label_ids] = numpy.inf
+            inter_class_distances = (
+                class_distances / class_sizes[name]).min(axis = 1)
             
-            if l == 0:
-                k_start = 0
+            with numpy.errstate(divide = "ignore", invalid = "ignore"):
+                intra_class_distances = intra_class_distances \
+                    / (class_sizes[name][own_label_ids] - 1)
+                block_silhouettes = \
+                    (inter_class_distances - intra_class_distances) \
+                    / numpy.maximum(intra_class_distances,
+                        inter_class_distances)
             
-            for k in range(k_start, min(10, k_max_scaled_floored + 1)):
-                
-                with warnings.catch_warnings():
-                    warnings.simplefilter(
-                        "ignore",
-                        category = scipy.sparse.SparseEfficiencyWarning
-                    )
-                    k_indices = x_scaled_floored == k
-                
-                k_size = k_indices.sum()
-                
-                if scipy.sparse.issparse(x):
-                    k_indices = k_indices.tocoo()
-                    k_indices = (k_indices.row, k_indices.col)
-                
-                k_sum = (x_tilde_scaled_floored[k_indices] == k).sum()
-                
-                if k_size != 0:
-                    f = k_sum / k_size
-                else:
-                    f = numpy.nan
-                
-                k_real = k * pow(10, l)
-                
-                if l == 0:
-                    k_string = str(k_real)
-                else:
-                    k_real_end = min(k_max, k_real + pow(10, l) - 1)
-                    k_string = "{}-{}".format(k_real, k_real_end)
-                
-                count_accuracies[k_string] = f
+            silhouettes[name][block] = numpy.nan_to_num(block_silhouettes)
+    
+    for name in label_id_sets:
+        scores[name] = numpy.mean(silhouettes[name])
     
+    return scores
+
+def silhouette_score(values, predicted_labels):
+    
+    number_of_examples = values.shape[0]
+    
+    sample_size = None
+    
+    if number_of_examples \
+        > maximum_number_of_examples_before_sampling_silhouette_score:
+            sample_size \
+                = maximum_number_of_examples_before_sampling_silhouette_score
+    
+    scores = silhouetteScores(
+        values,
+        {"labels": predicted_labels},
+        sample_size = sample_size
+    )
+    
+    return scores["labels"]
+
+def formatStatistics(statistics_sets, name = "Data set"):
+    
+    if type(statistics_sets) != list:
+        statistics_sets = [statistics_sets]
+    
+    name_width = len(name)
+    
+    for statistics_set in statistics_sets:
+        name_width = max(len(statistics_set["name"]), name_width)
+    
+    table_heading = "  ".join(["{:{}}".format(name, name_width),
+        " mean ", "std. dev. ", "dispersion",
+        " minimum ", " maximum ","sparsity"])
+    
+    table_rows = [table_heading]
+    
+    for statistics_set in statistics_sets:
+        table_row_parts = [
+            "{:{}}".format(statistics_set["name"], name_width),
+            "{:<9.5g}".format(statistics_set["mean"]),
+            "{:<9.5g}".format(statistics_set["standard deviation"]),
+            "{:<9.5g}".format(statistics_set["dispersion"]),
+            "{:<11.5g}".format(statistics_set["minimum"]),
+            "{:<11.5g}".format(statistics_set["maximum"]),
+            "{:<7.5g}".format(statistics_set["sparsity"]),
+        ]
+        table_row = "  ".join(table_row_parts)
+        table_rows.append(table_row)
+    
+    table = "\n".join(table_rows)
+    
+    return table
+
+def computeCountAccuracies(x, x_tilde, method = None, block_size = None):
+    """
+    Compute accuracies for every count in original data set
+    using reconstructed data set.
+    
+    Counts are binned in a single pass over blocks of rows, so that the
+    reconstructed data set can be read from disk one block at a time.
+    For sparse original data sets, only stored values are gathered, and
+    implicit zeros are accounted for by counting zeros in each block.
+    """
+    
+    # Setting up
+    
+    if block_size is None:
+        block_size = count_accuracy_block_size
+    
+    count_accuracies = {}
+    M, N = x.shape
+    
+    if scipy.sparse.issparse(x):
+        x = scipy.sparse.csr_matrix(x)
+    
+    ## Compute the max count value
+    k_max = int(numpy.round(x.max()))
+    
+    if method == "orders of magnitude":
+        log_k_max_floored = numpy.floor(numpy.log10(k_max)).astype(int)
+        scales = [pow(10, l) for l in range(log_k_max_floored + 1)]
+        number_of_bins = [min(10, k_max // scale + 1) for scale in scales]
     else:
+        scales = [1]
+        number_of_bins = [k_max + 1]
+        
+    k_sizes = [numpy.zeros(B, numpy.int64) for B in number_of_bins]
+    k_sums = [numpy.zeros(B, numpy.int64) for B in number_of_bins]
         
-        for k in range(k_max + 1):
+    # Binning
             
-            with warnings.catch_warnings():
-                warnings.simplefilter(
-                    "ignore",
-                    category = scipy.sparse.SparseEfficiencyWarning
-                )
-                k_indices = x == k
+    for start in range(0, M, block_size):
+            
+        rows = slice(start, min(start + block_size, M))
+            
+        ## Round data sets to be able to compare
+        
+        x_tilde_block = x_tilde[rows]
+        
+        if scipy.sparse.issparse(x_tilde_block):
+            x_tilde_block = x_tilde_block.toarray()
+        
+        x_tilde_block = numpy.round(numpy.asarray(x_tilde_block))
+        
+        if scipy.sparse.issparse(x):
+            x_block = x[rows]
+            row_indices = numpy.repeat(
+                numpy.arange(x_block.shape[0]), numpy.diff(x_block.indptr))
+            x_values = numpy.round(x_block.data)
+            x_tilde_values = x_tilde_block[row_indices, x_block.indices]
+            number_of_implicit_zeros = x_block.shape[0] * N - x_block.nnz
+        else:
+            x_values = numpy.round(numpy.asarray(x[rows])).reshape(-1)
+            x_tilde_values = x_tilde_block.reshape(-1)
+            number_of_implicit_zeros = 0
+        
+        ## Counts beyond the last bin are collected in an extra bin
+        
+        for scale, B, k_size, k_sum in zip(
+            scales, number_of_bins, k_sizes, k_sums):
             
-            k_size = k_indices.sum()
+            x_scaled_floored = numpy.floor(x_values / scale)
+            x_tilde_scaled_floored = numpy.floor(x_tilde_values / scale)
             
-            if scipy.sparse.issparse(x):
-                k_indices = k_indices.tocoo()
-                k_indices = (k_indices.row, k_indices.col)
+            k_values = numpy.minimum(x_scaled_floored, B).astype(numpy.int64)
+            matches = x_scaled_floored == x_tilde_scaled_floored
+            
+            k_size += numpy.bincount(k_values, minlength = B + 1)[:B]
+            k_sum += numpy.bincount(k_values[matches], minlength = B + 1)[:B]
+            
+            if number_of_implicit_zeros > 0:
+                k_size[0] += number_of_implicit_zeros
+                k_sum[0] += \
+                    (numpy.floor(x_tilde_block / scale) == 0).sum() \
+                    - (x_tilde_scaled_floored == 0).sum()
+    
+    # Accuracies
+    
+    for l, (scale, k_size, k_sum) in enumerate(zip(scales, k_sizes, k_sums)):
+        
+        k_start = 0
+        
+        if method == "orders of magnitude" and l > 0:
+            k_start = 1
             
-            k_sum = (x_tilde[k_indices] == k).sum()
+        for k in range(k_start, len(k_size)):
             
-            if k_size != 0:
-                f = k_sum / k_size
+            if k_size[k] != 0:
+                f = k_sum[k] / k_size[k]
             else:
                 f = numpy.nan
             
-            count_accuracies[str(k)] = f
+            k_real = k * scale
+            
+            if l == 0:
+                k_string = str(k_real)
+            else:
+                k_real_end = min(k_max, k_real + scale - 1)
+                k_string = "{}-{}".format(k_real, k_real_end)
+            
+            count_accuracies[k_string] = f
     
     return count_accuracies
 
@@ -2739,23 +3369,28 @@ def formatCountAccuracies(count_accuracies):
     
     return table
 
+# Supervised metrics are computed from a contingency table, and
+# unsupervised metrics from values and several sets of predicted labels
 clustering_metrics = {
     "adjusted Rand index": {
         "kind": "supervised",
-        "function": adjusted_rand_index
+        "function": adjustedRandIndexFromContingencyTable
     },
     "adjusted mutual information": {
         "kind": "supervised",
-        "function": adjusted_mutual_information
+        "function": adjustedMutualInformationFromContingencyTable
     },
     "silhouette score": {
         "kind": "unsupervised",
-        "function": silhouette_score
+        "function": silhouetteScores
     }
 }
 
 def computeClusteringMetrics(evaluation_set):
     
+    # Each contingency table and the distances between examples are only
+    # computed once for all metrics of each kind
+    
     clustering_metric_values = {
         metric: {
             "clusters": None,
@@ -2766,70 +3401,196 @@ def computeClusteringMetrics(evaluation_set):
         for metric in clustering_metrics
     }
     
-    for metric_name, metric_attributes in clustering_metrics.items():
+    supervised_metric_names = [
+        metric_name
+        for metric_name, metric_attributes in clustering_metrics.items()
+        if metric_attributes["kind"] == "supervised"
+    ]
+    unsupervised_metric_names = [
+        metric_name
+        for metric_name, metric_attributes in clustering_metrics.items()
+        if metric_attributes["kind"] == "unsupervised"
+    ]
         
-        metric_values = clustering_metric_values[metric_name]
-        metric_kind = metric_attributes["kind"]
-        metric_function = metric_attributes["function"]
+    ## Supervised metrics
         
-        if metric_kind == "supervised":
+    supervised_time_start = time()
             
-            if evaluation_set.has_labels:
+    label_set_pairs = {}
                 
-                if evaluation_set.has_predicted_cluster_ids:
-                    metric_values["clusters"] = metric_function(
-                        evaluation_set.labels,
-                        evaluation_set.predicted_cluster_ids,
-                        evaluation_set.excluded_classes
-                    )
+    if evaluation_set.has_labels:
                 
-                if evaluation_set.has_predicted_labels:
-                    metric_values["labels"] = metric_function(
-                        evaluation_set.labels,
-                        evaluation_set.predicted_labels,
-                        evaluation_set.excluded_classes
-                    )
+        if evaluation_set.has_predicted_cluster_ids:
+            label_set_pairs["clusters"] = (
+                evaluation_set.labels,
+                evaluation_set.predicted_cluster_ids,
+                evaluation_set.excluded_classes
+            )
             
-            if evaluation_set.has_superset_labels:
+        if evaluation_set.has_predicted_labels:
+            label_set_pairs["labels"] = (
+                evaluation_set.labels,
+                evaluation_set.predicted_labels,
+                evaluation_set.excluded_classes
+            )
                 
-                if evaluation_set.has_predicted_cluster_ids:
-                    metric_values["clusters; superset"] = metric_function(
-                        evaluation_set.superset_labels,
-                        evaluation_set.predicted_cluster_ids,
-                        evaluation_set.excluded_superset_classes
-                    )
+    if evaluation_set.has_superset_labels:
                 
-                if evaluation_set.has_predicted_superset_labels:
-                    metric_values["labels; superset"] = metric_function(
-                        evaluation_set.superset_labels,
-                        evaluation_set.predicted_superset_labels,
-                        evaluation_set.excluded_superset_classes
-                    )
+        if evaluation_set.has_predicted_cluster_ids:
+            label_set_pairs["clusters; superset"] = (
+                evaluation_set.superset_labels,
+                evaluation_set.predicted_cluster_ids,
+                evaluation_set.excluded_superset_classes
+            )
         
-        elif metric_kind == "unsupervised":
+        if evaluation_set.has_predicted_superset_labels:
+            label_set_pairs["labels; superset"] = (
+                evaluation_set.superset_labels,
+                evaluation_set.predicted_superset_labels,
+                evaluation_set.excluded_superset_classes
+            )
             
-            if evaluation_set.has_predicted_cluster_ids:
-                metric_values["clusters"] = metric_function(
-                    evaluation_set.values,
-                    evaluation_set.predicted_cluster_ids
-                )
+    if supervised_metric_names:
+        for name, (labels, predicted_labels, excluded_classes) \
+            in label_set_pairs.items():
             
-            if evaluation_set.has_predicted_labels:
-                metric_values["labels"] = metric_function(
-                    evaluation_set.values,
-                    evaluation_set.predicted_labels
-                )
+            table, _, _ = labelSetContingencyTable(
+                labels, predicted_labels, excluded_classes)
             
-            if evaluation_set.has_predicted_superset_labels:
-                metric_values["labels; superset"] = metric_function(
-                    evaluation_set.values,
-                    evaluation_set.predicted_superset_labels
-                )
+            for metric_name in supervised_metric_names:
+                metric_function = clustering_metrics[metric_name]["function"]
+                clustering_metric_values[metric_name][name] \
+                    = metric_function(table)
+    
+    if label_set_pairs:
+        supervised_duration = time() - supervised_time_start
+        print("    Supervised clustering metrics for {} computed ({})."\
+            .format(
+                enumerateListOfStrings(list(label_set_pairs)),
+                formatDuration(supervised_duration)
+        ))
+    
+    ## Unsupervised metrics
+    
+    unsupervised_time_start = time()
+    
+    predicted_label_sets = {}
+    
+    if evaluation_set.has_predicted_cluster_ids:
+        predicted_label_sets["clusters"] = evaluation_set.predicted_cluster_ids
+    
+    if evaluation_set.has_predicted_labels:
+        predicted_label_sets["labels"] = evaluation_set.predicted_labels
+    
+    if evaluation_set.has_predicted_superset_labels:
+        predicted_label_sets["labels; superset"] \
+            = evaluation_set.predicted_superset_labels
+    
+    if unsupervised_metric_names and predicted_label_sets:
+        
+        sample_size = None
+        
+        if evaluation_set.number_of_examples \
+            > maximum_number_of_examples_before_sampling_silhouette_score:
+                sample_size \
+                    = maximum_number_of_examples_before_sampling_silhouette_score
+        
+        for metric_name in unsupervised_metric_names:
+            
+            metric_function = clustering_metrics[metric_name]["function"]
+            metric_values = metric_function(
+                evaluation_set.values,
+                predicted_label_sets,
+                sample_size = sample_size
+            )
+            
+            for name, value in metric_values.items():
+                clustering_metric_values[metric_name][name] = value
+        
+        unsupervised_duration = time() - unsupervised_time_start
+        print("    Unsupervised clustering metrics for {} computed ({})."\
+            .format(
+                enumerateListOfStrings(list(predicted_label_sets)),
+                formatDuration(unsupervised_duration)
+        ))
     
     return clustering_metric_values
 
-def computePairwiseDistances(values, metric="euclidean"):
-    return sklearn.metrics.pairwise_distances(values, metric=metric)
+def rowSquaredNorms(values):
+    
+    if scipy.sparse.issparse(values):
+        values = values.astype(numpy.float32)
+        squared_norms = numpy.asarray(
+            values.multiply(values).sum(axis = 1)).reshape(-1)
+    else:
+        values = numpy.asarray(values, dtype = numpy.float32)
+        squared_norms = numpy.einsum("ij,ij->i", values, values)
+    
+    return squared_norms.astype(numpy.float32)
+
+def computePairwiseDistances(values, metric = "euclidean",
+    squared_norms = None, block_size = None, number_of_workers = None):
+    
+    # Distances are computed from inner products of blocks of rows with all
+    # rows in single precision, using that
+    #     |a - b|^2 = |a|^2 + |b|^2 - 2 a . b and
+    #     cos(a, b) = a . b / (|a| |b|).
+    
+    if metric not in ["euclidean", "cosine"]:
+        return sklearn.metrics.pairwise_distances(values, metric = metric)
+    
+    if scipy.sparse.issparse(values):
+        values = scipy.sparse.csr_matrix(values, dtype = numpy.float32)
+    else:
+        values = numpy.asarray(values, dtype = numpy.float32)
+    
+    if squared_norms is None:
+        squared_norms = rowSquaredNorms(values)
+    
+    if block_size is None:
+        block_size = distance_block_size
+    
+    if number_of_workers is None:
+        number_of_workers = os.cpu_count()
+    
+    M = values.shape[0]
+    distances = numpy.empty((M, M), numpy.float32)
+    
+    if metric == "cosine":
+        norms = numpy.sqrt(squared_norms)
+        norms[norms == 0] = 1
+    
+    values_transposed = values.T
+    
+    def computeDistanceBlock(start):
+        
+        stop = min(start + block_size, M)
+        
+        products = values[start:stop] @ values_transposed
+        
+        if scipy.sparse.issparse(products):
+            products = products.toarray()
+        
+        if metric == "euclidean":
+            block_distances = squared_norms[start:stop, numpy.newaxis] \
+                + squared_norms[numpy.newaxis] - 2 * products
+            numpy.maximum(block_distances, 0, out = block_distances)
+            numpy.sqrt(block_distances, out = block_distances)
+        
+        elif metric == "cosine":
+            block_distances = 1 - products \
+                / norms[start:stop, numpy.newaxis] / norms[numpy.newaxis]
+            numpy.clip(block_distances, 0, 2, out = block_distances)
+        
+        distances[start:stop] = block_distances
+    
+    with ThreadPoolExecutor(max_workers = number_of_workers) as executor:
+        list(executor.map(computeDistanceBlock, range(0, M, block_size)))
+    
+    # Remove rounding errors on the diagonal as for exact distances
+    numpy.fill_diagonal(distances, 0)
+    
+    return distances
 
 def plotClassHistogram(labels, class_names = None, class_palette = None,
     normed = False, scale = "linear", label_sorter = None, name = None):
@@ -3464,6 +4225,25 @@ def plotEvolutionOfCentroidProbabilities(probabilities, distribution, figure = N
     
     return figure_new, figure_name
 
+def plotEvolutionOfPriorAndPosteriorCentroidProbabilities(prior_probabilities,
+    posterior_probabilities, name = None):
+    
+    figure, figure_name = plotEvolutionOfCentroidProbabilities(
+        prior_probabilities,
+        distribution = "prior",
+        linestyle = "dashed",
+        name = name
+    )
+    figure, figure_name = plotEvolutionOfCentroidProbabilities(
+        posterior_probabilities,
+        distribution = "posterior",
+        figure = figure,
+        linestyle = "solid",
+        name = name
+    )
+    
+    return figure, figure_name
+
 def plotEvolutionOfCentroidMeans(means, distribution, decomposed = False,
     name = None):
     
@@ -3819,10 +4599,62 @@ def plotProfileComparison(observed_series, expected_series,
         
     return figure, figure_name
 
+def poolHeatMapValues(values, row_indices, column_indices,
+    number_of_row_bins, number_of_column_bins, pooling="mean",
+    normalisation=None, normalisation_constants=None):
+    """Pool reordered values into bins of consecutive rows and columns.
+    
+    Rows are densified and normalised one row bin at a time, so neither
+    sparse values nor the normalised values are made dense all at once.
+    """
+    
+    if pooling == "mean":
+        reduce = numpy.add.reduceat
+    elif pooling == "max":
+        reduce = numpy.maximum.reduceat
+    else:
+        raise ValueError("Pooling method `{}` not found.".format(pooling))
+    
+    row_boundaries = numpy.linspace(
+        0, len(row_indices), number_of_row_bins + 1).round().astype(int)
+    column_boundaries = numpy.linspace(
+        0, len(column_indices), number_of_column_bins + 1).round().astype(int)
+    column_bin_sizes = numpy.diff(column_boundaries)
+    
+    pooled_values = numpy.empty((number_of_row_bins, number_of_column_bins))
+    
+    for i in range(number_of_row_bins):
+        
+        rows = row_indices[row_boundaries[i]:row_boundaries[i + 1]]
+        
+        block = values[rows]
+        
+        if scipy.sparse.issparse(block):
+            block = block.toarray()
+        
+        block = numpy.asarray(block, dtype=numpy.float64)[:, column_indices]
+        
+        if normalisation:
+            block = normalisation["function"](
+                block, normalisation_constants[rows])
+        
+        if pooling == "mean":
+            pooled_row = block.mean(axis=0)
+        elif pooling == "max":
+            pooled_row = block.max(axis=0)
+        
+        pooled_values[i] = reduce(pooled_row, column_boundaries[:-1])
+        
+        if pooling == "mean":
+            pooled_values[i] /= column_bin_sizes
+    
+    return pooled_values
+
 def plotHeatMap(values, x_name, y_name,
     z_name=None, z_symbol=None, z_min=None, z_max=None,
     symmetric=False, labels=None, label_kind=None, center=None,
-    normalisation=None, normalisation_constants=None, name=None):
+    normalisation=None, normalisation_constants=None, pooling="mean",
+    name=None):
     
     figure_name = figureName("heat_map", name)
     
@@ -3837,27 +4669,15 @@ def plotHeatMap(values, x_name, y_name,
     figure = pyplot.figure()
     axis = figure.add_subplot(1, 1, 1)
     
-    if not z_min:
-        z_min = values.min()
-    
-    if not z_max:
-        z_max = values.max()
-    
     if z_symbol:
         z_name = "$" + z_symbol + "$"
     
     if normalisation:
-        values = normalisation["function"](values, normalisation_constants)
         if z_symbol:
             z_name = normalisation["label"](z_symbol)
         elif z_name:
             z_name = "Normalised " + z_name.lower()
     
-    cbar_dict = {}
-    
-    if z_name:
-        cbar_dict["label"] = z_name
-    
     if not symmetric:
         aspect_ratio = M / N
         square_cells = 1/5 < aspect_ratio and aspect_ratio < 5
@@ -3878,25 +4698,55 @@ def plotHeatMap(values, x_name, y_name,
     else:
         y_indices = numpy.arange(N)
     
-    seaborn.set(style = "white")
+    # Pool sorted values to at most one bin per pixel
     
-    seaborn.heatmap(
-        values[x_indices][:, y_indices],
-        vmin = z_min, vmax = z_max, center = center, 
-        xticklabels = False, yticklabels = False,
-        cbar = True, cbar_kws = cbar_dict, cmap = standard_colour_map,
-        square = square_cells, ax = axis
+    pooled_values = poolHeatMapValues(
+        values, x_indices, y_indices,
+        number_of_row_bins=min(M, maximum_number_of_heat_map_rows),
+        number_of_column_bins=min(N, maximum_number_of_heat_map_columns),
+        pooling=pooling,
+        normalisation=normalisation,
+        normalisation_constants=normalisation_constants
     )
     
-    reset_plot_look()
+    if not z_min:
+        z_min = pooled_values.min()
     
-    axis.set_xlabel(x_name)
-    axis.set_ylabel(y_name)
+    if not z_max:
+        z_max = pooled_values.max()
     
-    return figure, figure_name
-
-def plotELBOHeatMap(data_frame, x_label, y_label, z_label = None, z_symbol = None,
-    z_min = None, z_max = None, name = None):
+    if center is not None:
+        z_range = max(z_max - center, center - z_min)
+        z_min = center - z_range
+        z_max = center + z_range
+    
+    seaborn.set(style = "white")
+    
+    image = axis.imshow(
+        pooled_values,
+        vmin = z_min, vmax = z_max, cmap = standard_colour_map,
+        extent = (0, N, M, 0),
+        aspect = "equal" if square_cells else "auto",
+        interpolation = "nearest"
+    )
+    
+    colour_bar = figure.colorbar(image, ax = axis)
+    
+    if z_name:
+        colour_bar.set_label(z_name)
+    
+    reset_plot_look()
+    
+    axis.set_xticks([])
+    axis.set_yticks([])
+    
+    axis.set_xlabel(x_name)
+    axis.set_ylabel(y_name)
+    
+    return figure, figure_name
+
+def plotELBOHeatMap(data_frame, x_label, y_label, z_label = None, z_symbol = None,
+    z_min = None, z_max = None, name = None):
     
     figure_name = figureName("ELBO_heat_map", name)
     
@@ -4493,10 +5343,57 @@ def plotModelMetricSets(
     
     return figure, figure_name
 
+colouring_attributes = [
+    "labels", "class_names", "number_of_classes",
+    "class_palette", "label_sorter",
+    "superset_labels", "superset_class_names", "number_of_superset_classes",
+    "superset_class_palette", "superset_label_sorter",
+    "predicted_cluster_ids",
+    "predicted_labels", "predicted_class_names",
+    "number_of_predicted_classes", "predicted_class_palette",
+    "predicted_label_sorter",
+    "predicted_superset_labels", "predicted_superset_class_names",
+    "number_of_predicted_superset_classes", "predicted_superset_class_palette",
+    "predicted_superset_label_sorter",
+    "count_sum", "tags"
+]
+
+class ColouringData(object):
+    """Attributes of a data set used for colouring plots of values.
+    
+    Plotting jobs are sent to the figure executor with this instead of the
+    data set, so that they do not include its values. Values of a single
+    feature are included, if its index is given.
+    """
+    def __init__(self, data_set, feature_index = None):
+        
+        for attribute in colouring_attributes:
+            setattr(self, attribute, getattr(data_set, attribute, None))
+        
+        self.feature_index = feature_index
+        
+        if feature_index is not None:
+            
+            if feature_index > data_set.number_of_features:
+                raise ValueError(
+                    "Feature number higher than number of features.")
+            
+            self.feature_name = data_set.feature_names[feature_index]
+            
+            feature_values = data_set.values[:, feature_index]
+            if scipy.sparse.issparse(feature_values):
+                feature_values = feature_values.A
+            self.feature_values = numpy.asarray(feature_values).squeeze()
+        
+        else:
+            self.feature_name = None
+            self.feature_values = None
+
 def plotValues(values, colour_coding = None, colouring_data_set = None,
     centroids = None, class_name = None, feature_index = None,
     figure_labels = None, prediction_details = None,
-    axis_limits = None, example_tag = None, name = "scatter"):
+    axis_limits = None, example_tag = None, raster = None,
+    name = "scatter"):
     
     # Setup
     
@@ -4529,13 +5426,22 @@ def plotValues(values, colour_coding = None, colouring_data_set = None,
     
     # Values
     
-    values = values.copy()
-    
-    # Randomise examples in values to remove any prior order
     M, N = values.shape
-    random_state = numpy.random.RandomState(117)
-    shuffled_indices = random_state.permutation(M)
-    values = values[shuffled_indices]
+    
+    # Large sets are binned on a grid of pixels instead of being drawn
+    # point by point
+    if raster is None:
+        raster = M > maximum_number_of_examples_for_scatter_plots
+    
+    if raster:
+        # The order of examples does not matter when binned
+        shuffled_indices = numpy.arange(M)
+    else:
+        # Randomise examples in values to remove any prior order
+        values = values.copy()
+        random_state = numpy.random.RandomState(117)
+        shuffled_indices = random_state.permutation(M)
+        values = values[shuffled_indices]
     
     if axis_limits:
         
@@ -4564,21 +5470,24 @@ def plotValues(values, colour_coding = None, colouring_data_set = None,
         else:
             y_max = original_y_max
         
-        include_indices = []
-        outlier_indices = []
-    
-        for i in range(M):
-            if values[i, 0] < x_min or values[i, 0] > x_max \
-                or values[i, 1] < y_min or values[i, 1] > y_max:
-                outlier_indices.append(i)
-            else:
-                include_indices.append(i)
+        include_indices = (values[:, 0] >= x_min) \
+            & (values[:, 0] <= x_max) \
+            & (values[:, 1] >= y_min) \
+            & (values[:, 1] <= y_max)
     
         values = values[include_indices]
         shuffled_indices = shuffled_indices[include_indices]
         
-        outliers_string = "{} {}s not shown".format(len(outlier_indices),
-            example_tag)
+        outliers_string = "{} {}s not shown".format(
+            (~include_indices).sum(), example_tag)
+    
+    if raster:
+        raster_options = dict(
+            extent = rasterExtent(values),
+            origin = "lower",
+            aspect = "auto",
+            interpolation = "nearest"
+        )
     
     # Figure
     
@@ -4646,20 +5555,44 @@ def plotValues(values, colour_coding = None, colouring_data_set = None,
         labels = labels[shuffled_indices]
         
         if "labels" in colour_coding or "ids" in colour_coding:
-            colours = []
-            classes = set()
         
-            for i, label in enumerate(labels):
-                colour = class_palette[label]
-                colours.append(colour)
+            if raster:
             
-                # Plot one example for each class to add labels
-                if label not in classes:
-                    classes.add(label)
-                    axis.scatter(values[i, 0], values[i, 1], c = colour,
+                label_classes, label_indices = numpy.unique(
+                    labels, return_inverse = True)
+                class_colours = numpy.array([
+                    matplotlib.colors.to_rgb(class_palette[label])
+                    for label in label_classes
+                ])
+                
+                axis.imshow(
+                    rasteriseColours(
+                        values, class_colours[label_indices],
+                        raster_options["extent"]
+                    ),
+                    **raster_options
+                )
+                
+                # Empty plots for each class to add labels
+                for label in label_classes:
+                    axis.scatter([], [], color = class_palette[label],
                         label = label)
             
-            axis.scatter(values[:, 0], values[:, 1], c = colours)
+            else:
+                colours = []
+                classes = set()
+                
+                for i, label in enumerate(labels):
+                    colour = class_palette[label]
+                    colours.append(colour)
+                    
+                    # Plot one example for each class to add labels
+                    if label not in classes:
+                        classes.add(label)
+                        axis.scatter(values[i, 0], values[i, 1], c = colour,
+                            label = label)
+                
+                axis.scatter(values[:, 0], values[:, 1], c = colours)
             
             class_handles, class_labels = axis.get_legend_handles_labels()
             
@@ -4690,6 +5623,40 @@ def plotValues(values, colour_coding = None, colouring_data_set = None,
                         # fontsize = "x-small"
                     )
         
+        elif "class" in colour_coding and raster:
+            
+            figure_name += "-" + normaliseString(str(class_name))
+            
+            class_indices = labels == class_name
+            
+            for label, indices, colour, z_order in [
+                ("Remaining", ~class_indices, neutral_colour, 0),
+                (str(class_name), class_indices, class_palette[class_name], 1)
+            ]:
+                axis.imshow(
+                    rasteriseColours(
+                        values[indices],
+                        matplotlib.colors.to_rgb(colour),
+                        raster_options["extent"]
+                    ),
+                    zorder = z_order,
+                    **raster_options
+                )
+                axis.scatter([], [], color = colour, label = label)
+            
+            handles, labels = axis.get_legend_handles_labels()
+            labels, handles = zip(*sorted(zip(labels, handles),
+                key = lambda t: label_sorter(t[0])))
+            legend = axis.legend(
+                handles,
+                labels, 
+                bbox_to_anchor = (-0.1, 1.05, 1.1, 0.95),
+                loc = "lower left",
+                ncol = 2,
+                mode = "expand",
+                borderaxespad = 0.
+            )
+        
         elif "class" in colour_coding:
             colours = []
             
@@ -4739,8 +5706,15 @@ def plotValues(values, colour_coding = None, colouring_data_set = None,
     elif colour_coding == "count_sum":
         
         n = colouring_data_set.count_sum[shuffled_indices].flatten()
-        scatter_plot = axis.scatter(values[:, 0], values[:, 1], c = n,
-            cmap = colour_map)
+        
+        if raster:
+            image, scatter_plot = rasteriseScalars(
+                values, n, raster_options["extent"], colour_map)
+            axis.imshow(image, **raster_options)
+        else:
+            scatter_plot = axis.scatter(values[:, 0], values[:, 1], c = n,
+                cmap = colour_map)
+        
         colour_bar = figure.colorbar(scatter_plot)
         colour_bar.outline.set_linewidth(0)
         colour_bar.set_label("Total number of {}s per {}".format(
@@ -4753,24 +5727,34 @@ def plotValues(values, colour_coding = None, colouring_data_set = None,
         if feature_index is None:
             raise ValueError("Feature number not given.")
         
-        if feature_index > colouring_data_set.number_of_features:
-            raise ValueError("Feature number higher than number of features.")
+        if getattr(colouring_data_set, "feature_index", None) \
+            != feature_index:
+            colouring_data_set = ColouringData(
+                colouring_data_set, feature_index = feature_index)
         
-        feature_name = colouring_data_set.feature_names[feature_index]
+        feature_name = colouring_data_set.feature_name
         figure_name += "-{}".format(normaliseString(feature_name))
         
-        f = colouring_data_set.values[shuffled_indices,
-            feature_index]
-        if scipy.sparse.issparse(f):
-            f = f.A
-        f = f.squeeze()
+        f = colouring_data_set.feature_values[shuffled_indices]
+        
+        if raster:
+            image, scatter_plot = rasteriseScalars(
+                values, f, raster_options["extent"], colour_map)
+            axis.imshow(image, **raster_options)
+        else:
+            scatter_plot = axis.scatter(values[:, 0], values[:, 1], c = f,
+                cmap = colour_map)
         
-        scatter_plot = axis.scatter(values[:, 0], values[:, 1], c = f,
-            cmap = colour_map)
         colour_bar = figure.colorbar(scatter_plot)
         colour_bar.outline.set_linewidth(0)
         colour_bar.set_label(feature_name)
     
+    elif raster:
+        axis.imshow(
+            rasteriseColours(values, neutral_colour, raster_options["extent"]),
+            **raster_options
+        )
+    
     else:
         axis.scatter(values[:, 0], values[:, 1], color = neutral_colour)
     
@@ -4812,6 +5796,105 @@ def plotValues(values, colour_coding = None, colouring_data_set = None,
     
     return figure, figure_name
 
+def rasterExtent(values):
+    
+    x_min, y_min = values[:, :2].min(axis = 0)
+    x_max, y_max = values[:, :2].max(axis = 0)
+    
+    if x_min == x_max:
+        x_min, x_max = x_min - 0.5, x_max + 0.5
+    
+    if y_min == y_max:
+        y_min, y_max = y_min - 0.5, y_max + 0.5
+    
+    return (x_min, x_max, y_min, y_max)
+
+def rasterPixelIndices(values, extent, grid_size):
+    
+    x_min, x_max, y_min, y_max = extent
+    
+    x_indices = numpy.floor(
+        (values[:, 0] - x_min) / (x_max - x_min) * grid_size).astype(int)
+    y_indices = numpy.floor(
+        (values[:, 1] - y_min) / (y_max - y_min) * grid_size).astype(int)
+    
+    x_indices = numpy.clip(x_indices, 0, grid_size - 1)
+    y_indices = numpy.clip(y_indices, 0, grid_size - 1)
+    
+    return y_indices * grid_size + x_indices
+
+def rasterOpacities(counts):
+    
+    # Opacity increases logarithmically with the number of examples in each
+    # pixel, so sparse regions remain visible
+    
+    opacities = numpy.zeros(counts.shape)
+    
+    if counts.max() > 0:
+        occupied = counts > 0
+        opacities[occupied] = 0.3 + 0.7 * numpy.log1p(counts[occupied]) \
+            / numpy.log1p(counts.max())
+    
+    return opacities
+
+def rasteriseColours(values, colours, extent, grid_size = None):
+    
+    # Mean colour of the examples in each pixel of a grid, which for colours
+    # of classes accumulates the classes in each pixel
+    
+    if grid_size is None:
+        grid_size = raster_grid_size
+    
+    G = grid_size
+    
+    pixel_indices = rasterPixelIndices(values, extent, G)
+    colours = numpy.broadcast_to(
+        numpy.asarray(colours, dtype = float), (len(pixel_indices), 3))
+    
+    counts = numpy.bincount(pixel_indices, minlength = G * G)
+    
+    image = numpy.zeros((G * G, 4))
+    
+    with numpy.errstate(divide = "ignore", invalid = "ignore"):
+        for c in range(3):
+            image[:, c] = numpy.bincount(
+                pixel_indices, weights = colours[:, c], minlength = G * G
+            ) / counts
+    
+    image[:, 3] = rasterOpacities(counts)
+    image[counts == 0, :3] = 0
+    
+    return image.reshape(G, G, 4)
+
+def rasteriseScalars(values, scalars, extent, colour_map, grid_size = None):
+    
+    # Mean scalar of the examples in each pixel of a grid mapped to colours
+    # together with a mappable for a colour bar
+    
+    if grid_size is None:
+        grid_size = raster_grid_size
+    
+    G = grid_size
+    
+    pixel_indices = rasterPixelIndices(values, extent, G)
+    
+    counts = numpy.bincount(pixel_indices, minlength = G * G)
+    
+    with numpy.errstate(divide = "ignore", invalid = "ignore"):
+        mean_scalars = numpy.bincount(
+            pixel_indices, weights = scalars, minlength = G * G) / counts
+    
+    norm = matplotlib.colors.Normalize(
+        vmin = numpy.min(scalars), vmax = numpy.max(scalars))
+    
+    image = colour_map(norm(numpy.nan_to_num(mean_scalars)))
+    image[:, 3] = rasterOpacities(counts)
+    
+    mappable = matplotlib.cm.ScalarMappable(norm = norm, cmap = colour_map)
+    mappable.set_array([])
+    
+    return image.reshape(G, G, 4), mappable
+
 def plotProbabilities(posterior_probabilities, prior_probabilities, 
     x_label = None, y_label = None,
     palette = None, uniform = False, name = None):
@@ -4999,6 +6082,7 @@ def saveFigure(figure, figure_name, export_options, results_directory):
     
     figure_path = figure_path_base + figure_extension
     figure.savefig(figure_path)
+    figure_paths = [figure_path]
     
     if "publication" in export_options:
         
@@ -5027,8 +6111,741 @@ def saveFigure(figure, figure_name, export_options, results_directory):
             ]) + publication_figure_extension
             
             figure.savefig(figure_path)
+            figure_paths.append(figure_path)
+    
+    pyplot.close(figure)
+    
+    return figure_paths
+
+def saveFrames(figure, figure_name, number_of_frames, results_directory):
+    """Save frames of a figure with lines growing one point per frame.
+    
+    The figure is drawn once with the full lines, which also fixes the
+    axis limits, and each frame only truncates the line data. Frames are
+    streamed to a video, if FFmpeg is available, or an animated image,
+    if Pillow is, and otherwise saved as separate images.
+    """
+    
+    if not os.path.exists(results_directory):
+        os.makedirs(results_directory)
+    
+    figure_path_base = os.path.join(results_directory, figure_name)
+    
+    lines = [line for axis in figure.get_axes() for line in axis.get_lines()]
+    line_data = [(line.get_xdata(), line.get_ydata()) for line in lines]
+    
+    figure.set_tight_layout(True)
+    adjustFigureForLegend(figure)
+    
+    def updateFrame(frame):
+        for line, (x, y) in zip(lines, line_data):
+            line.set_data(x[:frame + 1], y[:frame + 1])
+    
+    if matplotlib.animation.writers.is_available("ffmpeg"):
+        writer = matplotlib.animation.writers["ffmpeg"](fps = video_frame_rate)
+        figure_path = figure_path_base + video_extension
+    elif matplotlib.animation.writers.is_available("pillow"):
+        writer = matplotlib.animation.writers["pillow"](fps = video_frame_rate)
+        figure_path = figure_path_base + animation_extension
+    else:
+        writer = None
+    
+    if writer:
+        with writer.saving(figure, figure_path, figure.get_dpi()):
+            for frame in range(number_of_frames):
+                updateFrame(frame)
+                writer.grab_frame()
+        figure_paths = [figure_path]
+    
+    else:
+        frame_number_width = len(str(number_of_frames))
+        figure_paths = []
+        for frame in range(number_of_frames):
+            updateFrame(frame)
+            figure_path = "{}-epoch-{:0{}d}{}".format(
+                figure_path_base, frame + 1, frame_number_width,
+                figure_extension
+            )
+            figure.savefig(figure_path)
+            figure_paths.append(figure_path)
     
     pyplot.close(figure)
+    
+    return figure_paths
+
+# Figure rendering
+
+# Figures with larger arrays as arguments are rendered in this process, so
+# that their arguments are not copied to the figure executor
+maximum_figure_job_size = 64 * 1024 ** 2 # bytes
+
+figure_executor = None
+figure_jobs = []
+figure_reports = []
+
+def startFigureExecutor(number_of_workers = None):
+    
+    global figure_executor
+    
+    finishFigureExecutor()
+    
+    if not number_of_workers:
+        number_of_workers = os.cpu_count()
+    
+    # Workers are spawned rather than forked to not inherit the state of
+    # TensorFlow sessions in the main process
+    figure_executor = ProcessPoolExecutor(
+        max_workers = number_of_workers,
+        mp_context = multiprocessing.get_context("spawn"),
+        initializer = initialiseFigureWorker
+    )
+    
+    atexit.register(finishFigureExecutor)
+    
+    print("Rendering figures using {} worker processes.".format(
+        number_of_workers))
+    print()
+
+def initialiseFigureWorker():
+    pyplot.switch_backend("Agg")
+
+def renderFigure(plotting_function, plotting_arguments, export_options,
+    results_directory, cache_key = None, cache_directory = None):
+    
+    render_time_start = time()
+    
+    figure, figure_name = plotting_function(**plotting_arguments)
+    figure_paths = saveFigure(
+        figure, figure_name, export_options, results_directory)
+    
+    if cache_key:
+        saveCachedFigure(cache_key, figure_paths, cache_directory)
+    
+    render_duration = time() - render_time_start
+    
+    return os.path.join(results_directory, figure_name), render_duration
+
+def renderFrames(plotting_function, plotting_arguments, number_of_frames,
+    results_directory):
+    
+    render_time_start = time()
+    
+    figure, figure_name = plotting_function(**plotting_arguments)
+    saveFrames(figure, figure_name, number_of_frames, results_directory)
+    
+    render_duration = time() - render_time_start
+    
+    return os.path.join(results_directory, figure_name), render_duration
+
+def renderPickledFigure(figure_job, cache_key = None, cache_directory = None):
+    return renderFigure(*pickle.loads(figure_job),
+        cache_key = cache_key, cache_directory = cache_directory)
+
+def renderPickledFrames(frames_job):
+    return renderFrames(*pickle.loads(frames_job))
+
+def addFigureJob(figure_job):
+    # Jobs are stored with their submission time to be able to report
+    # the figures of each analysis
+    figure_jobs.append((time(), figure_job))
+
+def figureJobTiming(figure_job):
+    if hasattr(figure_job, "result"):
+        return figure_job.result()
+    else:
+        return figure_job
+
+def reportFigures(description, time_start):
+    """Report the time spent on figures submitted since `time_start`.
+    
+    Figures rendered in this process are reported at once. Figures
+    rendered by the figure executor are reported with their render times,
+    when the executor is finished.
+    """
+    
+    if figure_executor is None:
+        print("{} plotted and saved ({}).".format(
+            description, formatDuration(time() - time_start)))
+        return
+    
+    section_figure_jobs = [
+        figure_job for submission_time, figure_job in figure_jobs
+        if submission_time >= time_start
+    ]
+    
+    figure_reports.append((description, section_figure_jobs))
+    
+    print("{} submitted for rendering ({} figures).".format(
+        description, len(section_figure_jobs)))
+
+def figureArgumentSize(argument):
+    
+    # Size of arrays in argument without pickling it
+    
+    if isinstance(argument, numpy.ndarray):
+        return argument.nbytes
+    elif scipy.sparse.issparse(argument):
+        return sum(
+            getattr(argument, array_name).nbytes
+            for array_name in ["data", "indices", "indptr", "row", "col"]
+            if hasattr(argument, array_name)
+        )
+    elif isinstance(argument, (list, tuple)):
+        return sum(map(figureArgumentSize, argument))
+    elif isinstance(argument, dict):
+        return sum(map(figureArgumentSize, argument.values()))
+    elif isinstance(argument, ColouringData):
+        return figureArgumentSize(vars(argument))
+    else:
+        return 0
+
+def submitFigure(plotting_function, plotting_arguments, export_options,
+    results_directory, cache_key = None):
+    
+    figure_job = (
+        plotting_function, plotting_arguments,
+        export_options, results_directory
+    )
+    
+    # Only figures with a cache key (see `analysisCacheKey`) are cached
+    if analysis_cache_directory is None:
+        cache_key = None
+    
+    if cache_key and restoreCachedFigure(cache_key, results_directory):
+        return cache_key
+    
+    if figure_executor is None:
+        renderFigure(*figure_job, cache_key = cache_key,
+            cache_directory = analysis_cache_directory)
+        return cache_key
+    
+    if figureArgumentSize(plotting_arguments) > maximum_figure_job_size:
+        addFigureJob(renderFigure(*figure_job, cache_key = cache_key,
+            cache_directory = analysis_cache_directory))
+        return cache_key
+    
+    # Arguments are pickled here, so that later changes to them do not
+    # affect the figure, and so that figures with arguments that cannot be
+    # pickled are rendered in this process instead
+    try:
+        pickled_figure_job = pickle.dumps(
+            figure_job, protocol = pickle.HIGHEST_PROTOCOL)
+    except (pickle.PicklingError, AttributeError, TypeError):
+        pickled_figure_job = None
+    
+    if pickled_figure_job:
+        addFigureJob(figure_executor.submit(
+            renderPickledFigure, pickled_figure_job,
+            cache_key = cache_key,
+            cache_directory = analysis_cache_directory
+        ))
+    else:
+        addFigureJob(renderFigure(*figure_job, cache_key = cache_key,
+            cache_directory = analysis_cache_directory))
+    
+    return cache_key
+
+def submitFrames(plotting_function, plotting_arguments, number_of_frames,
+    results_directory):
+    
+    frames_job = (
+        plotting_function, plotting_arguments,
+        number_of_frames, results_directory
+    )
+    
+    if figure_executor is None:
+        renderFrames(*frames_job)
+        return
+    
+    # Rendered in this process, if the arguments cannot be pickled as for
+    # other figures
+    try:
+        pickled_frames_job = pickle.dumps(
+            frames_job, protocol = pickle.HIGHEST_PROTOCOL)
+    except (pickle.PicklingError, AttributeError, TypeError):
+        pickled_frames_job = None
+    
+    if pickled_frames_job:
+        addFigureJob(figure_executor.submit(
+            renderPickledFrames, pickled_frames_job))
+    else:
+        addFigureJob(renderFrames(*frames_job))
+
+def finishFigureExecutor():
+    
+    global figure_executor, figure_jobs, figure_reports
+    
+    if figure_executor is None:
+        return
+    
+    print("Waiting for {} figures to be rendered and saved.".format(
+        len(figure_jobs)))
+    waiting_time_start = time()
+    
+    figure_timings = [
+        figureJobTiming(figure_job) for _, figure_job in figure_jobs
+    ]
+    
+    figure_executor.shutdown()
+    figure_executor = None
+    
+    waiting_duration = time() - waiting_time_start
+    
+    reports = figure_reports
+    figure_jobs = []
+    figure_reports = []
+    
+    if not figure_timings:
+        return
+    
+    print("Render times of analyses:")
+    for description, section_figure_jobs in reports:
+        section_render_duration = sum(
+            figureJobTiming(figure_job)[1]
+            for figure_job in section_figure_jobs
+        )
+        print("    {} plotted and saved ({}).".format(
+            description, formatDuration(section_render_duration)))
+    print()
+    
+    figure_timings.sort(key = lambda timing: timing[1], reverse = True)
+    total_render_duration = sum(duration for _, duration in figure_timings)
+    
+    print("{} figures rendered and saved ({} in total, {} spent waiting)."\
+        .format(
+            len(figure_timings),
+            formatDuration(total_render_duration),
+            formatDuration(waiting_duration)
+    ))
+    
+    print("Slowest figures:")
+    for figure_path, duration in \
+        figure_timings[:maximum_number_of_figure_timings_shown]:
+        print("    {}: {}.".format(figure_path, formatDuration(duration)))
+    
+    print()
+
+# Metrics store
+
+# Metrics and prediction records are also appended to a store in the root
+# of the results directory, so that they can be cross-analysed without
+# walking the results directory and loading every pickle.
+
+metrics_store_results_directory = None
+
+def enableMetricsStore(results_directory):
+    global metrics_store_results_directory
+    metrics_store_results_directory = results_directory
+
+def disableMetricsStore():
+    global metrics_store_results_directory
+    metrics_store_results_directory = None
+
+def appendToEnabledMetricsStore(directory, evaluation_set, record_kind,
+    record, prediction_name = ""):
+    
+    if metrics_store_results_directory is None:
+        return
+    
+    appendToMetricsStore(
+        metricsStorePath(metrics_store_results_directory),
+        directory = directory,
+        results_directory = metrics_store_results_directory,
+        evaluation_set = evaluation_set,
+        record_kind = record_kind,
+        record = record,
+        prediction_name = prediction_name
+    )
+
+# Analysis cache
+
+# Cached analyses are stored by a hash of the identities of the data sets
+# they are computed from and their parameters together with the source code
+# of the analysis and decomposition modules, so that entries are never
+# reused when anything they depend on has changed. The identities include a
+# hash of the values of the data sets, and data sets derived from a model
+# are also identified by the checkpoint of the model they were evaluated
+# with, since a model can be retrained without changing their names.
+
+analysis_cache_directory = None
+analysis_checkpoint_fingerprint = None
+analysis_code_fingerprint = None
+maximum_analysis_cache_size = 2 * 1024 ** 3 # bytes
+analysis_cache_extension = ".pkl.gz"
+
+def enableAnalysisCache(directory, maximum_size = None):
+    
+    global analysis_cache_directory, analysis_code_fingerprint, \
+        maximum_analysis_cache_size
+    
+    if analysis_code_fingerprint is None:
+        code_hash = hashlib.sha256()
+        for source_path in [__file__, inspect.getsourcefile(decompose)]:
+            with open(source_path, "rb") as source_file:
+                code_hash.update(source_file.read())
+        analysis_code_fingerprint = code_hash.digest()
+    
+    if maximum_size is not None:
+        maximum_analysis_cache_size = maximum_size
+    
+    analysis_cache_directory = directory
+    
+    trimAnalysisCache()
+    atexit.register(finishAnalysisCache)
+
+def disableAnalysisCache():
+    global analysis_cache_directory
+    analysis_cache_directory = None
+
+def finishAnalysisCache():
+    # Figures rendered by worker processes are cached by them
+    finishFigureExecutor()
+    trimAnalysisCache()
+
+def trimAnalysisCache():
+    
+    # Least recently used entries are removed until the cache is within its
+    # maximum size
+    
+    if analysis_cache_directory is None \
+        or not os.path.exists(analysis_cache_directory):
+            return
+    
+    cache_entries = []
+    
+    for directory, _, filenames in os.walk(analysis_cache_directory):
+        for filename in filenames:
+            if not filename.endswith(analysis_cache_extension):
+                continue
+            cache_path = os.path.join(directory, filename)
+            try:
+                cache_status = os.stat(cache_path)
+            except OSError:
+                continue
+            cache_entries.append(
+                (cache_status.st_mtime, cache_status.st_size, cache_path))
+    
+    cache_size = sum(size for _, size, _ in cache_entries)
+    
+    if cache_size <= maximum_analysis_cache_size:
+        return
+    
+    cache_entries.sort()
+    number_of_removed_entries = 0
+    
+    for _, size, cache_path in cache_entries:
+        if cache_size <= maximum_analysis_cache_size:
+            break
+        try:
+            os.remove(cache_path)
+        except OSError:
+            continue
+        cache_size -= size
+        number_of_removed_entries += 1
+    
+    print("Removed {} least recently used entries from analysis cache."\
+        .format(number_of_removed_entries))
+    print()
+
+def modelCheckpointFingerprint(model, run_id = None, early_stopping = False,
+    best_model = False):
+    
+    # Log directory of model together with the content and modification time
+    # of its checkpoint state, which names the latest checkpoint by its
+    # global step
+    
+    log_directory = model.logDirectory(
+        run_id = run_id,
+        early_stopping = early_stopping,
+        best_model = best_model
+    )
+    
+    checkpoint_state_path = os.path.join(log_directory, "checkpoint")
+    
+    if not os.path.exists(checkpoint_state_path):
+        return None
+    
+    with open(checkpoint_state_path, "r") as checkpoint_state_file:
+        checkpoint_state = checkpoint_state_file.read()
+    
+    return (
+        os.path.abspath(log_directory),
+        checkpoint_state,
+        os.path.getmtime(checkpoint_state_path)
+    )
+
+def cacheIdentity(data_set):
+    
+    # Identity of data set for the analysis cache, which is not available
+    # for data sets derived from a model without a checkpoint (see above)
+    
+    if data_set is None:
+        return None
+    
+    if data_set.version != "original":
+        if analysis_checkpoint_fingerprint is None:
+            raise ValueError("Data set depends on unknown model checkpoint.")
+        checkpoint_fingerprint = analysis_checkpoint_fingerprint
+    else:
+        checkpoint_fingerprint = None
+    
+    feature_names = numpy.asarray(data_set.feature_names)
+    feature_name_hash = hashlib.sha1(
+        feature_names.astype("U").tobytes()).hexdigest()
+    
+    # Predictions are added to data sets after they have been loaded
+    if data_set.predicted_cluster_ids is not None:
+        predicted_cluster_id_hash = hashValues(
+            numpy.asarray(data_set.predicted_cluster_ids)).hexdigest()
+    else:
+        predicted_cluster_id_hash = None
+    
+    if data_set.predicted_labels is not None:
+        predicted_labels = numpy.asarray(data_set.predicted_labels)
+        predicted_label_hash = hashlib.sha1(
+            predicted_labels.astype("U").tobytes()).hexdigest()
+    else:
+        predicted_label_hash = None
+    
+    return dataSetIdentity(data_set) + (
+        feature_name_hash,
+        valuesHash(data_set.values),
+        predicted_cluster_id_hash,
+        predicted_label_hash,
+        checkpoint_fingerprint
+    )
+
+# Hashes of values by their ID together with a weak reference to them, so
+# that values are only hashed once while they exist
+values_hashes = {}
+
+def valuesHash(values):
+    
+    values_reference, values_hash = values_hashes.get(
+        id(values), (None, None))
+    
+    if values_reference is not None and values_reference() is values:
+        return values_hash
+    
+    values_ID = id(values)
+    values_hash = hashValues(values).hexdigest()
+    values_hashes[values_ID] = (
+        weakref.ref(values, lambda _: values_hashes.pop(values_ID, None)),
+        values_hash
+    )
+    
+    return values_hash
+
+def canonicalCacheInput(cache_input):
+    
+    # Containers are converted to tuples with sets and dictionaries sorted,
+    # so that their representation is the same across processes; any other
+    # kind of input raises a `TypeError`, so that large values, such as
+    # arrays, are never hashed
+    
+    if cache_input is None \
+        or isinstance(cache_input, (str, bytes, bool, int, float)):
+            return cache_input
+    elif isinstance(cache_input, numpy.generic):
+        return cache_input.item()
+    elif isinstance(cache_input, (list, tuple)):
+        return tuple(map(canonicalCacheInput, cache_input))
+    elif isinstance(cache_input, (set, frozenset)):
+        return tuple(sorted(map(canonicalCacheInput, cache_input), key = repr))
+    elif isinstance(cache_input, dict):
+        return tuple(sorted(
+            (
+                (canonicalCacheInput(key), canonicalCacheInput(value))
+                for key, value in cache_input.items()
+            ),
+            key = repr
+        ))
+    else:
+        raise TypeError("Cannot use `{}` in analysis cache key.".format(
+            type(cache_input).__name__))
+
+def analysisCacheKey(*inputs):
+    
+    if analysis_cache_directory is None:
+        return None
+    
+    try:
+        canonical_inputs = canonicalCacheInput(inputs)
+    except TypeError:
+        return None
+    
+    cache_hash = hashlib.sha256(analysis_code_fingerprint)
+    cache_hash.update(repr(canonical_inputs).encode())
+    
+    return cache_hash.hexdigest()
+
+def figureCacheKey(base_cache_key, plotting_function, plotting_arguments):
+    
+    # Plotting arguments that cannot be part of a cache key, such as arrays,
+    # have to be derived from what is identified by the base cache key
+    
+    if not base_cache_key:
+        return None
+    
+    key_arguments = {}
+    
+    for argument_name, argument in plotting_arguments.items():
+        try:
+            key_arguments[argument_name] = canonicalCacheInput(argument)
+        except TypeError:
+            key_arguments[argument_name] = type(argument).__name__
+    
+    return analysisCacheKey(
+        base_cache_key, plotting_function.__name__, key_arguments)
+
+def analysisCachePath(cache_key, cache_directory = None):
+    
+    if cache_directory is None:
+        cache_directory = analysis_cache_directory
+    
+    return os.path.join(
+        cache_directory, cache_key[:2], cache_key + analysis_cache_extension)
+
+def loadCachedAnalysis(cache_key, cache_directory = None):
+    
+    if not cache_key:
+        return None
+    
+    cache_path = analysisCachePath(cache_key, cache_directory)
+    
+    if not os.path.exists(cache_path):
+        return None
+    
+    try:
+        with gzip.open(cache_path, "rb") as cache_file:
+            analysis = pickle.load(cache_file)
+    except (OSError, EOFError, pickle.UnpicklingError):
+        return None
+    
+    # Marked as recently used for trimming
+    try:
+        os.utime(cache_path)
+    except OSError:
+        pass
+    
+    return analysis
+
+def saveCachedAnalysis(cache_key, analysis, cache_directory = None):
+    
+    if not cache_key:
+        return
+    
+    cache_path = analysisCachePath(cache_key, cache_directory)
+    cache_entry_directory = os.path.dirname(cache_path)
+    
+    if not os.path.exists(cache_entry_directory):
+        os.makedirs(cache_entry_directory, exist_ok = True)
+    
+    # Written to a temporary file first, so that concurrent readers never
+    # see a partial entry
+    temporary_cache_path = "{}.{}.tmp".format(cache_path, os.getpid())
+    
+    with gzip.open(temporary_cache_path, "wb") as cache_file:
+        pickle.dump(analysis, cache_file, protocol = pickle.HIGHEST_PROTOCOL)
+    
+    os.replace(temporary_cache_path, cache_path)
+
+def saveCachedFigure(cache_key, figure_paths, cache_directory = None):
+    
+    figure_files = {}
+    
+    for figure_path in figure_paths:
+        with open(figure_path, "rb") as figure_file:
+            figure_files[os.path.basename(figure_path)] = figure_file.read()
+    
+    saveCachedAnalysis(cache_key, figure_files, cache_directory)
+
+def restoreCachedFigure(cache_key, results_directory):
+    
+    figure_files = loadCachedAnalysis(cache_key)
+    
+    if figure_files is None:
+        return False
+    
+    if not os.path.exists(results_directory):
+        os.makedirs(results_directory)
+    
+    for figure_filename, figure_content in figure_files.items():
+        
+        figure_path = os.path.join(results_directory, figure_filename)
+        
+        if os.path.exists(figure_path):
+            with open(figure_path, "rb") as figure_file:
+                if figure_file.read() == figure_content:
+                    continue
+        
+        with open(figure_path, "wb") as figure_file:
+            figure_file.write(figure_content)
+    
+    return True
+
+def restoreCachedFigures(cache_key, results_directory):
+    
+    # Figures saved together, such as those of one analysis, are cached as
+    # a list of the cache keys of the figures
+    
+    figure_cache_keys = loadCachedAnalysis(cache_key)
+    
+    if not figure_cache_keys:
+        return False
+    
+    for figure_cache_key in figure_cache_keys:
+        if not loadCachedAnalysis(figure_cache_key):
+            return False
+    
+    for figure_cache_key in figure_cache_keys:
+        restoreCachedFigure(figure_cache_key, results_directory)
+    
+    return True
+
+def cachedDecompose(values, other_value_sets = [], centroids = {},
+    method = None, number_of_components = None, data_sets = None):
+    
+    # Decompositions of data sets are shared for the rest of the run, and
+    # they are also cached on disk, when the analysis cache is enabled
+    
+    if data_sets is not None:
+        registry_key = decompositionRegistryKey(
+            data_sets, method, number_of_components, bool(centroids))
+    else:
+        registry_key = None
+    
+    if registry_key in decomposition_registry:
+        return decomposition_registry[registry_key]
+    
+    if data_sets is not None:
+        try:
+            cache_key = analysisCacheKey(
+                "decomposition",
+                [cacheIdentity(data_set) for data_set in data_sets],
+                method, number_of_components, bool(centroids)
+            )
+        except ValueError:
+            cache_key = None
+    else:
+        cache_key = None
+    
+    decomposition = loadCachedAnalysis(cache_key)
+    
+    if decomposition is None:
+        decomposition = decompose(
+            values,
+            other_value_sets = other_value_sets,
+            centroids = centroids,
+            method = method,
+            number_of_components = number_of_components
+        )
+        saveCachedAnalysis(cache_key, decomposition)
+    
+    if registry_key is not None:
+        decomposition_registry[registry_key] = decomposition
+    
+    return decomposition
 
 def adjustFigureForLegend(figure):
     
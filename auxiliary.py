@@ -565,6 +565,99 @@ def loadKLDivergences(model, run_id = None, early_stopping = False,
 
 ScalarEvent = namedtuple('ScalarEvent', ['wall_time', 'step', 'value'])
 
+SCALAR_INDEX_FILENAME = "scalar_index.npz"
+
+scalar_indices = {}
+
+def eventFilesFingerprint(data_set_log_directory):
+    
+    fingerprint = []
+    
+    for filename in sorted(os.listdir(data_set_log_directory)):
+        if filename.startswith("event"):
+            status = os.stat(os.path.join(data_set_log_directory, filename))
+            fingerprint.append("{}:{}:{}".format(
+                filename, status.st_size, status.st_mtime_ns))
+    
+    return numpy.array(fingerprint, dtype = str)
+
+def buildScalarIndex(data_set_log_directory):
+    
+    tag_ids = {}
+    tag_indices = []
+    steps = []
+    wall_times = []
+    values = []
+    
+    for filename in sorted(os.listdir(data_set_log_directory)):
+        if filename.startswith("event"):
+            events_path = os.path.join(data_set_log_directory, filename)
+            for event in tensorflow.train.summary_iterator(events_path):
+                for value in event.summary.value:
+                    tag_index = tag_ids.setdefault(value.tag, len(tag_ids))
+                    tag_indices.append(tag_index)
+                    steps.append(event.step)
+                    wall_times.append(event.wall_time)
+                    values.append(value.simple_value)
+    
+    tags = sorted(tag_ids, key = tag_ids.get)
+    
+    scalar_index = {
+        "tags": numpy.array(tags, dtype = str),
+        "tag_indices": numpy.array(tag_indices, dtype = numpy.int32),
+        "steps": numpy.array(steps, dtype = numpy.int64),
+        "wall_times": numpy.array(wall_times, dtype = numpy.float64),
+        "values": numpy.array(values, dtype = numpy.float32)
+    }
+    
+    return scalar_index
+
+def loadScalarIndex(data_set_log_directory):
+    
+    # Scalar index of all summary values in the event files of a log
+    # directory, cached in memory and as a sidecar file next to the event
+    # files, and rebuilt if any event file has changed.
+    
+    fingerprint = eventFilesFingerprint(data_set_log_directory)
+    
+    cached_index = scalar_indices.get(data_set_log_directory)
+    
+    if cached_index is not None \
+        and numpy.array_equal(cached_index["fingerprint"], fingerprint):
+        return cached_index
+    
+    index_path = os.path.join(data_set_log_directory, SCALAR_INDEX_FILENAME)
+    
+    scalar_index = None
+    
+    if os.path.exists(index_path):
+        try:
+            with numpy.load(index_path) as index_file:
+                if numpy.array_equal(index_file["fingerprint"], fingerprint):
+                    scalar_index = {
+                        name: index_file[name] for name in index_file.files}
+        except (OSError, KeyError, ValueError):
+            scalar_index = None
+    
+    if scalar_index is None:
+        
+        scalar_index = buildScalarIndex(data_set_log_directory)
+        scalar_index["fingerprint"] = fingerprint
+        
+        temporary_index_path = index_path + ".tmp"
+        
+        try:
+            with open(temporary_index_path, "wb") as index_file:
+                numpy.savez(index_file, **scalar_index)
+            os.replace(temporary_index_path, index_path)
+        except OSError:
+            if os.path.exists(temporary_index_path):
+                os.remove(temporary_index_path)
+    
+    scalar_indices[data_set_log_directory] = scalar_index
+    
+    return scalar_index
+
 def summary_reader(log_directory, data_set_kinds, tag_searches):
 
     if not isinstance(data_set_kinds, list):
@@ -584,27 +677,36 @@ def summary_reader(log_directory, data_set_kinds, tag_searches):
 
                 data_set_scalars = {}
 
-                for filename in sorted(os.listdir(data_set_log_directory)):
-                    if filename.startswith("event"):
-                        events_path = os.path.join(
-                            data_set_log_directory,
-                            filename
-                        )
-                        events = tensorflow.train.summary_iterator(
-                            events_path)
-                        for event in events:
-                            for value in event.summary.value:
-                                for tag_search in tag_searches:
-                                    if tag_search in value.tag:
-                                        tag = value.tag
-                                        scalar = ScalarEvent(
-                                            wall_time=event.wall_time,
-                                            step=event.step,
-                                            value=value.simple_value
-                                        )
-                                        if tag not in data_set_scalars:
-                                            data_set_scalars[tag] = []
-                                        data_set_scalars[tag].append(scalar)
+                scalar_index = loadScalarIndex(data_set_log_directory)
+                tags = scalar_index["tags"]
+
+                # Match searches against unique tags only, then select all
+                # scalars for matching tags at once
+                tag_matches = numpy.array([
+                    any(tag_search in tag for tag_search in tag_searches)
+                    for tag in tags
+                ], dtype = bool)
+
+                if tag_matches.any():
+
+                    scalar_matches = tag_matches[scalar_index["tag_indices"]]
+
+                    tag_indices = scalar_index["tag_indices"][scalar_matches]
+                    wall_times = scalar_index["wall_times"][scalar_matches]
+                    steps = scalar_index["steps"][scalar_matches]
+                    values = scalar_index["values"][scalar_matches]
+
+                    for tag_index in numpy.flatnonzero(tag_matches):
+                        tag_scalar_indices = numpy.flatnonzero(
+                            tag_indices == tag_index)
+                        data_set_scalars[str(tags[tag_index])] = [
+                            ScalarEvent(
+                                wall_time = float(wall_times[i]),
+                                step = int(steps[i]),
+                                value = float(values[i])
+                            )
+                            for i in tag_scalar_indices
+                        ]
             else:
                 data_set_scalars = None
 
@@ -31,8 +31,10 @@ import re
 import textwrap
 
 from itertools import product
+from concurrent.futures import ThreadPoolExecutor
 from string import ascii_uppercase
 from math import inf
+from time import time
 from scipy.stats import pearsonr
 
 import argparse
@@ -44,10 +46,14 @@ from analysis import (
     clustering_metrics
 )
 from auxiliary import (
-    formatTime, capitaliseString,
+    formatTime, formatDuration, capitaliseString,
     title, subtitle, heading, subheading,
     prod
 )
+from miscellaneous.metrics_store import (
+    metricsStorePath, loadFromMetricsStore, appendRecordsToMetricsStore,
+    storedRecordKeys
+)
 
 metrics_basename = "test-metrics"
 prediction_basename = "test-prediction"
@@ -127,6 +133,8 @@ LIKELIHOOD_DISRIBUTION_ORDER = [
 FACTOR_ANALYSIS_MODEL_TYPE = "VAE(G, g: LFM)"
 FACTOR_ANALYSIS_MODEL_TYPE_ALIAS = "FA"
 
+METRICS_STORE_IMPORT_BATCH_SIZE = 1000
+
 def main(log_directory = None, results_directory = None,
     data_set_included_strings = [], 
     data_set_excluded_strings = [], 
@@ -137,7 +145,10 @@ def main(log_directory = None, results_directory = None,
     epoch_cut_off = inf,
     export_options = [],
     show_baselines = True,
-    log_summary = False):
+    log_summary = False,
+    use_metrics_store = True,
+    import_into_metrics_store = False,
+    number_of_workers = None):
     
     search_strings_sets = [
         {
@@ -250,13 +261,32 @@ def main(log_directory = None, results_directory = None,
         if log_summary:
             log_string_parts = [explanation_string + "\n"]
         
-        metrics_sets = metricsSetsInResultsDirectory(
-            results_directory,
-            data_set_included_strings,
-            data_set_excluded_strings,
-            model_included_strings,
-            model_excluded_strings
-        )
+        metrics_store_path = metricsStorePath(results_directory)
+        
+        if import_into_metrics_store:
+            importIntoMetricsStore(
+                results_directory,
+                metrics_store_path,
+                number_of_workers = number_of_workers
+            )
+        
+        if use_metrics_store and os.path.exists(metrics_store_path):
+            metrics_sets = metricsSetsInMetricsStore(
+                metrics_store_path,
+                data_set_included_strings,
+                data_set_excluded_strings,
+                model_included_strings,
+                model_excluded_strings
+            )
+        else:
+            metrics_sets = metricsSetsInResultsDirectory(
+                results_directory,
+                data_set_included_strings,
+                data_set_excluded_strings,
+                model_included_strings,
+                model_excluded_strings,
+                number_of_workers = number_of_workers
+            )
         
         model_IDs = modelID()
         
@@ -411,7 +441,8 @@ def main(log_directory = None, results_directory = None,
                         data_set_path
                     ),
                     prediction_included_strings = prediction_included_strings,
-                    prediction_excluded_strings = prediction_excluded_strings
+                    prediction_excluded_strings = prediction_excluded_strings,
+                    number_of_workers = number_of_workers
                 )
             else:
                 set_baselines = None
@@ -1154,13 +1185,28 @@ def main(log_directory = None, results_directory = None,
             with open(log_path, "w") as log_file:
                 log_file.write(log_string)
 
-def metricsSetsInResultsDirectory(results_directory,
-    data_set_included_strings, data_set_excluded_strings,
-    model_included_strings, model_excluded_strings):
+def loadZippedPickle(path):
+    
+    # Reading and decompressing release the GIL, so files are loaded
+    # concurrently in threads
+    with open(path, "rb") as zipped_pickle_file:
+        return pickle.loads(gzip.decompress(zipped_pickle_file.read()))
+
+def loadZippedPickles(paths, number_of_workers = None):
+    with ThreadPoolExecutor(number_of_workers) as executor:
+        return list(executor.map(loadZippedPickle, paths))
+
+def resultPathsInResultsDirectory(results_directory,
+    data_set_included_strings = [], data_set_excluded_strings = [],
+    model_included_strings = [], model_excluded_strings = []):
+    
+    # Paths of metrics and predictions together with their record keys (data
+    # set, model, run, and version) as in the metrics store
     
     metrics_filename = metrics_basename + zipped_pickle_extension
     
-    metrics_set = {}
+    metrics_paths = []
+    prediction_paths = []
     
     for path, _, filenames in os.walk(results_directory):
         
@@ -1206,21 +1252,10 @@ def metricsSetsInResultsDirectory(results_directory,
                 run = model_parts[3]
                 version = model_parts[4]
             
-            if not data_set in metrics_set:
-                metrics_set[data_set] = {}
-            
-            if not model in metrics_set[data_set]:
-                metrics_set[data_set][model] = {}
-            
-            if not run in metrics_set[data_set][model]:
-                metrics_set[data_set][model][run] = {}
-            
-            metrics_path = os.path.join(path, metrics_filename)
-            
-            with gzip.open(metrics_path, "r") as metrics_file:
-                metrics_data = pickle.load(metrics_file)
+            record_keys = (data_set, model, run, version)
             
-            predictions = {}
+            metrics_paths.append(
+                (record_keys, os.path.join(path, metrics_filename)))
             
             for filename in filenames:
                 if filename.startswith(prediction_basename) \
@@ -1231,27 +1266,160 @@ def metricsSetsInResultsDirectory(results_directory,
                         .replace(prediction_basename, "")\
                         .replace("-", "")
                     
-                    prediction_path = os.path.join(path, filename)
-                    
-                    with gzip.open(prediction_path, "r") as \
-                        prediction_file:
-                        
-                        prediction_data = pickle.load(
-                            prediction_file)
-                    
-                    predictions[prediction_name] = prediction_data
-            
-            if predictions:
-                metrics_data["predictions"] = predictions
-            
-            metrics_set[data_set][model][run][version] = \
-                metrics_data
+                    prediction_paths.append((
+                        record_keys, prediction_name,
+                        os.path.join(path, filename)
+                    ))
+    
+    return metrics_paths, prediction_paths
+
+def metricsSetsInResultsDirectory(results_directory,
+    data_set_included_strings, data_set_excluded_strings,
+    model_included_strings, model_excluded_strings,
+    number_of_workers = None):
+    
+    metrics_paths, prediction_paths = resultPathsInResultsDirectory(
+        results_directory,
+        data_set_included_strings,
+        data_set_excluded_strings,
+        model_included_strings,
+        model_excluded_strings
+    )
+    
+    # Load metrics and predictions
+    
+    metrics_data_sets = loadZippedPickles(
+        [metrics_path for _, metrics_path in metrics_paths],
+        number_of_workers = number_of_workers
+    )
+    prediction_data_sets = loadZippedPickles(
+        [prediction_path for _, _, prediction_path in prediction_paths],
+        number_of_workers = number_of_workers
+    )
+    
+    metrics_set = {}
+    
+    for (record_keys, _), metrics_data in zip(
+        metrics_paths, metrics_data_sets):
+        
+        data_set, model, run, version = record_keys
+        metrics_set.setdefault(data_set, {})
+        metrics_set[data_set].setdefault(model, {})
+        metrics_set[data_set][model].setdefault(run, {})
+        metrics_set[data_set][model][run][version] = metrics_data
+    
+    for (record_keys, prediction_name, _), prediction_data in zip(
+        prediction_paths, prediction_data_sets):
+        
+        data_set, model, run, version = record_keys
+        metrics_set[data_set][model][run][version].setdefault(
+            "predictions", {})
+        metrics_set[data_set][model][run][version]["predictions"]\
+            [prediction_name] = prediction_data
     
     return metrics_set
 
+def metricsSetsInMetricsStore(metrics_store_path,
+    data_set_included_strings, data_set_excluded_strings,
+    model_included_strings, model_excluded_strings):
+    
+    records = loadFromMetricsStore(
+        metrics_store_path,
+        evaluation_set = "test",
+        data_set_included_strings = data_set_included_strings,
+        data_set_excluded_strings = data_set_excluded_strings,
+        model_included_strings = model_included_strings,
+        model_excluded_strings = model_excluded_strings
+    )
+    
+    metrics_set = {}
+    predictions = {}
+    
+    for data_set, model, run, version, record_kind, prediction_name, \
+        record in records:
+        
+        if record_kind == "metrics":
+            metrics_set.setdefault(data_set, {})
+            metrics_set[data_set].setdefault(model, {})
+            metrics_set[data_set][model].setdefault(run, {})
+            metrics_set[data_set][model][run][version] = record
+        
+        elif record_kind == "prediction":
+            predictions.setdefault((data_set, model, run, version), {})
+            predictions[(data_set, model, run, version)][prediction_name] = \
+                record
+    
+    # Predictions are only included for versions with metrics as when
+    # walking the results directory
+    
+    for (data_set, model, run, version), version_predictions \
+        in predictions.items():
+        
+        metrics_data = metrics_set.get(data_set, {}).get(model, {})\
+            .get(run, {}).get(version, None)
+        
+        if metrics_data is not None:
+            metrics_data["predictions"] = version_predictions
+    
+    return metrics_set
+
+def importIntoMetricsStore(results_directory, metrics_store_path,
+    number_of_workers = None):
+    
+    # Results saved before the metrics store was created are added to it
+    # once, so that later cross-analyses only read the store
+    
+    print("Importing results into metrics store.")
+    start_time = time()
+    
+    metrics_paths, prediction_paths = resultPathsInResultsDirectory(
+        results_directory)
+    
+    stored_record_keys = storedRecordKeys(
+        metrics_store_path, evaluation_set = "test")
+    
+    unstored_results = [
+        (record_keys, "metrics", "", metrics_path)
+        for record_keys, metrics_path in metrics_paths
+        if (record_keys, "metrics", "") not in stored_record_keys
+    ] + [
+        (record_keys, "prediction", prediction_name, prediction_path)
+        for record_keys, prediction_name, prediction_path in prediction_paths
+        if (record_keys, "prediction", prediction_name)
+            not in stored_record_keys
+    ]
+    
+    for i in range(0, len(unstored_results), METRICS_STORE_IMPORT_BATCH_SIZE):
+        
+        batch = unstored_results[i:i + METRICS_STORE_IMPORT_BATCH_SIZE]
+        
+        records = loadZippedPickles(
+            [path for _, _, _, path in batch],
+            number_of_workers = number_of_workers
+        )
+        
+        appendRecordsToMetricsStore(
+            metrics_store_path,
+            [
+                (record_keys, "test", record_kind, prediction_name, record)
+                for (record_keys, record_kind, prediction_name, _), record
+                in zip(batch, records)
+            ]
+        )
+    
+    duration = time() - start_time
+    print("{} results imported into metrics store, {} already in it ({})."\
+        .format(
+            len(unstored_results),
+            len(metrics_paths) + len(prediction_paths) - len(unstored_results),
+            formatDuration(duration)
+    ))
+    print()
+
 def baselinesForDataSet(data_set_directory,
                         prediction_included_strings = None,
-                        prediction_excluded_strings = None):
+                        prediction_excluded_strings = None,
+                        number_of_workers = None):
     
     baseline_directory = os.path.join(data_set_directory, "baseline")
     
@@ -1259,6 +1427,7 @@ def baselinesForDataSet(data_set_directory,
         return None
     
     baselines = {}
+    baseline_paths = []
     
     for path, directory_names, filenames in os.walk(baseline_directory):
         for filename in filenames:
@@ -1274,54 +1443,54 @@ def baselinesForDataSet(data_set_directory,
                 if not prediction_match:
                     continue
                 
-                baseline_path = os.path.join(path, filename)
+                baseline_paths.append(os.path.join(path, filename))
                 
-                with gzip.open(baseline_path, "r") as baseline_file:
-                    baseline = pickle.load(baseline_file)
+    for baseline in loadZippedPickles(
+        baseline_paths, number_of_workers = number_of_workers):
                 
-                method = baseline.get("prediction method", None)
-                clustering_metric_values = baseline.get(
-                    "clustering metric values", [])
+        method = baseline.get("prediction method", None)
+        clustering_metric_values = baseline.get(
+            "clustering metric values", [])
                 
-                for metric_name, metric_set \
-                    in clustering_metric_values.items():
+        for metric_name, metric_set \
+            in clustering_metric_values.items():
                     
-                    for metric_set_name, metric_value in metric_set.items():
-                        if metric_value is None:
-                            continue
-                        elif metric_set_name.startswith("clusters"):
+            for metric_set_name, metric_value in metric_set.items():
+                if metric_value is None:
+                    continue
+                elif metric_set_name.startswith("clusters"):
                             
-                            metric_details = clustering_metrics.get(
-                                metric_name, dict())
-                            metric_kind = metric_details.get("kind", None)
+                    metric_details = clustering_metrics.get(
+                        metric_name, dict())
+                    metric_kind = metric_details.get("kind", None)
                             
-                            if metric_kind and metric_kind == "supervised":
+                    if metric_kind and metric_kind == "supervised":
                                 
-                                set_name = "standard"
+                        set_name = "standard"
                                 
-                                if metric_set_name.endswith("superset"):
-                                    set_name = "superset"
+                        if metric_set_name.endswith("superset"):
+                            set_name = "superset"
                             
-                            elif metric_kind \
-                                and metric_kind == "unsupervised":
+                    elif metric_kind \
+                        and metric_kind == "unsupervised":
                                 
-                                set_name = "unsupervised"
+                        set_name = "unsupervised"
                             
-                            else:
-                                set_name = "unknown"
+                    else:
+                        set_name = "unknown"
                             
-                            baselines.setdefault(set_name, {})
-                            baselines[set_name].setdefault(method, {})
-                            baselines[set_name][method].setdefault(
-                                metric_name, []
-                            )
-                            baselines[set_name][method][metric_name].append(
-                                float(metric_value)
-                            )
+                    baselines.setdefault(set_name, {})
+                    baselines[set_name].setdefault(method, {})
+                    baselines[set_name][method].setdefault(
+                        metric_name, []
+                    )
+                    baselines[set_name][method][metric_name].append(
+                        float(metric_value)
+                    )
                     
-                    metric_value = metric_set.get("clusters", None)
-                    metric_value_superset = metric_set.get(
-                        "clusters; superset", None)
+            metric_value = metric_set.get("clusters", None)
+            metric_value_superset = metric_set.get(
+                "clusters; superset", None)
     
     return baselines
 
@@ -1333,9 +1502,7 @@ def parseMetricsForRunsAndVersionsOfModel(
         epoch_cut_off = inf
     ):
     
-    run_version_summary_metrics = {
-        key: {} for key in ["default", "multiple"]
-    }
+    summary_metrics_records = []
     correlation_sets = {}
     
     if log_summary:
@@ -1650,87 +1817,117 @@ def parseMetricsForRunsAndVersionsOfModel(
         for version_key, epoch_summary_metrics in \
             version_epoch_summary_metrics.items():
             
-            run_version_summary_metrics[run_key].setdefault(
-                version_key, {
-                    "runs": 0,
-                    "version": version_key
-                }
-            )
-            run_version_summary_metrics[run_key][version_key]["runs"] += 1
-            
             maximum_number_of_epochs = max(epoch_summary_metrics.keys())
             summary_metrics = epoch_summary_metrics[maximum_number_of_epochs]
             
-            for metric_key, metric_value in summary_metrics.items():
-                if run_key == "default":
-                    run_version_summary_metrics[run_key][version_key]\
-                        [metric_key] = metric_value
-                else:
-                    run_version_summary_metrics[run_key][version_key]\
-                        .setdefault(metric_key, [])
-                    run_version_summary_metrics[run_key][version_key]\
-                        [metric_key].append(metric_value)
+            summary_metrics_record = {
+                "run key": run_key,
+                "version key": version_key
+            }
+            summary_metrics_record.update(summary_metrics)
+            summary_metrics_records.append(summary_metrics_record)
     
     results = {
         "summary_metrics_sets": [],
         "correlation_sets": correlation_sets
     }
     
-    for run_key, version_summary_metrics in \
-        run_version_summary_metrics.items():
+    # Summary metrics for the default run and across multiple runs
+    
+    version_summary_metrics = []
+    
+    if summary_metrics_records:
+        
+        summary_metrics_records = pandas.DataFrame.from_records(
+            summary_metrics_records)
+        
+        # Default runs before multiple runs as when the runs are sorted
+        summary_metrics_records = summary_metrics_records.sort_values(
+            "run key", kind = "mergesort")
         
-        for version_key, summary_metrics in version_summary_metrics.items():
+        for (run_key, version_key), version_records in \
+            summary_metrics_records.groupby(
+                ["run key", "version key"], sort = False):
             
-            # Runs
+            # Metrics missing for all runs of a version are left out
+            version_records = version_records\
+                .drop(columns = ["run key", "version key"])\
+                .dropna(axis = "columns", how = "all")
             
             if run_key == "default":
+                summary_metrics = {
+                    metric_key: summaryMetricValue(metric_values.iloc[-1])
+                    for metric_key, metric_values in version_records.items()
+                }
                 runs = "default run"
             else:
-                runs = summary_metrics["runs"]
-                if isinstance(runs, int):
-                    runs = "{} runs".format(runs)
+                summary_metrics = {
+                    metric_key: [
+                        summaryMetricValue(metric_value)
+                        for metric_value in metric_values.dropna()
+                    ]
+                    for metric_key, metric_values in version_records.items()
+                }
+                runs = "{} runs".format(len(version_records))
             
             summary_metrics["runs"] = runs
+            summary_metrics["version"] = version_key
             
-            # Clustering
-            
-            clustering_field_names = []
-            
-            for field_name in summary_metrics:
-                if field_name.startswith("clustering"):
-                    clustering_field_names.append(field_name)
-            
-            clustering_metric_values = {}
-            
-            for field_name in clustering_field_names:
-                metric_value = summary_metrics.pop(field_name, None)
-                if metric_value:
-                    field_name_parts = field_name.split("; ")
-                    method = field_name_parts[1]
-                    name = field_name_parts[2]
-                    clustering_metric_values.setdefault(method, {})
-                    clustering_metric_values[method][name] = metric_value
+            version_summary_metrics.append(summary_metrics)
+    
+    for summary_metrics in version_summary_metrics:
+        
+        # Clustering
+        
+        clustering_field_names = []
+        
+        for field_name in summary_metrics:
+            if field_name.startswith("clustering"):
+                clustering_field_names.append(field_name)
+        
+        clustering_metric_values = {}
+        
+        for field_name in clustering_field_names:
+            metric_value = summary_metrics.pop(field_name, None)
+            if metric_value:
+                field_name_parts = field_name.split("; ")
+                method = field_name_parts[1]
+                name = field_name_parts[2]
+                clustering_metric_values.setdefault(method, {})
+                clustering_metric_values[method][name] = metric_value
+        
+        if clustering_metric_values:
+            original_summary_metrics = summary_metrics
             
-            if clustering_metric_values:
-                original_summary_metrics = summary_metrics
-                
-                for method in clustering_metric_values:
-                    summary_metrics = copy.deepcopy(
-                        original_summary_metrics
-                    )
-                    summary_metrics.update(clustering_metric_values[method])
-                    summary_metrics["clustering method"] = method
-                    results["summary_metrics_sets"].append(summary_metrics)
-            else:
-                results["summary_metrics_sets"].append(
-                    summary_metrics
+            for method in clustering_metric_values:
+                summary_metrics = copy.deepcopy(
+                    original_summary_metrics
                 )
+                summary_metrics.update(clustering_metric_values[method])
+                summary_metrics["clustering method"] = method
+                results["summary_metrics_sets"].append(summary_metrics)
+        else:
+            results["summary_metrics_sets"].append(
+                summary_metrics
+            )
     
     if log_summary:
         results["log_string_parts"] = log_string_parts
     
     return results
 
+def summaryMetricValue(value):
+    
+    # Missing values are None and NumPy scalars are converted to Python
+    # scalars as expected by the comparison table
+    
+    if value is None or pandas.isnull(value):
+        return None
+    elif isinstance(value, numpy.generic):
+        return value.item()
+    else:
+        return value
+
 def matchString(string, included_strings, excluded_strings):
     
     match = True
@@ -2170,6 +2367,32 @@ parser.add_argument(
     help = "do not log summary"
 )
 parser.set_defaults(log_summary = False)
+parser.add_argument(
+    "--use-metrics-store",
+    action = "store_true",
+    help = "load metrics only from metrics store in results directory, if "
+        "available"
+)
+parser.add_argument(
+    "--skip-metrics-store",
+    dest = "use_metrics_store",
+    action = "store_false",
+    help = "load metrics by walking results directory"
+)
+parser.set_defaults(use_metrics_store = True)
+parser.add_argument(
+    "--import-into-metrics-store",
+    action = "store_true",
+    help = "add results saved before metrics store was created to it by "
+        "walking results directory once"
+)
+parser.add_argument(
+    "--number-of-workers", "-w",
+    type = int,
+    nargs = "?",
+    help = "number of threads used to load results (default: as many as "
+        "Python chooses for the number of processors)"
+)
 
 if __name__ == '__main__':
     arguments = parser.parse_args()
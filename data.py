@@ -20,6 +20,7 @@ import os
 import gzip
 import tarfile
 import pickle
+import hashlib
 import struct
 import random
 
@@ -36,7 +37,8 @@ import scipy.io
 import sklearn.preprocessing
 import stemming.porter2 as stemming
 
-from functools import reduce
+from functools import reduce, partial
+from concurrent.futures import ThreadPoolExecutor
 
 import seaborn
 
@@ -61,8 +63,25 @@ preprocessed_extension = ".sparse.h5"
 
 maximum_duration_before_saving = 30 # seconds
 
+maximum_number_of_values_per_statistics_batch = 10000000
+
 subset_kinds = ["full", "training", "validation", "test"]
 
+# Module-level functions instead of lambda expressions, so that data sets
+# and plotting arguments can be pickled
+
+def macoskoHeatMapNormalisationLabel(symbol):
+    return "$\log ({} / n \\times 10^{{4}} + 1)$".format(symbol)
+
+def macoskoHeatMapNormalisation(values, normalisation):
+    return numpy.log(values / normalisation * 1e4 + 1)
+
+macosko_heat_map_normalisation = {
+    "name": "Macosko",
+    "label": macoskoHeatMapNormalisationLabel,
+    "function": macoskoHeatMapNormalisation
+}
+
 data_sets = {
     "Macosko-MRC": {
         "tags": {
@@ -160,13 +179,7 @@ data_sets = {
         "excluded superset classes": [
             "No class"
         ],
-        "heat map normalisation": {
-            "name": "Macosko",
-            "label": lambda symbol:
-                "$\log ({} / n \\times 10^{{4}} + 1)$".format(symbol),
-            "function": lambda values, normalisation:
-                numpy.log(values / normalisation * 1e4 + 1)
-        },
+        "heat map normalisation": macosko_heat_map_normalisation,
         "PCA limits": {
             "full": {
                 "PC1": {
@@ -579,13 +592,7 @@ data_sets = {
         "excluded superset classes": [
             "No class"
         ],
-        "heat map normalisation": {
-            "name": "Macosko",
-            "label": lambda symbol:
-                "$\log ({} / n \\times 10^{{4}} + 1)$".format(symbol),
-            "function": lambda values, normalisation:
-                numpy.log(values / normalisation * 1e4 + 1)
-        },
+        "heat map normalisation": macosko_heat_map_normalisation,
         "PCA limits": {
             "full": {
                 "PC1": {
@@ -644,6 +651,7 @@ class DataSet(object):
         preprocessing_methods = [], preprocessed = None,
         binarise_values = False,
         noisy_preprocessing_methods = [],
+        preprocessing_parameters = None,
         kind = "full", version = "original",
         directory = "data"):
         
@@ -806,6 +814,9 @@ class DataSet(object):
         if self.preprocessed:
             self.preprocessing_methods = data_set_preprocessing_methods
         
+        # Feature scales of preprocessing methods (see `preprocessValues`)
+        self.preprocessing_parameters = preprocessing_parameters
+        
         # Kind of data set (full, training, validation, test)
         self.kind = kind
         
@@ -877,6 +888,22 @@ class DataSet(object):
                     print("        ", preprocessing_method)
             print()
     
+    def __getstate__(self):
+        # The noisy preprocessing function is composed of lambda
+        # expressions, which cannot be pickled, so it is rebuilt instead
+        state = self.__dict__.copy()
+        state["noisy_preprocess"] = None
+        return state
+    
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        if self.noisy_preprocessing_methods:
+            self.noisy_preprocess = preprocessingFunctionForDataSet(
+                self.title, self.noisy_preprocessing_methods,
+                self.preprocessedPath,
+                noisy = True
+            )
+    
     @property
     def number_of_values(self):
         return self.number_of_examples * self.number_of_features
@@ -1199,6 +1226,7 @@ class DataSet(object):
         if not self.map_features and not self.preprocessing_methods \
             and not self.feature_selection and not self.example_filter:
             self.update(preprocessed_values = None)
+            self.preprocessing_parameters = None
             return
         
         sparse_path = self.preprocessedPath(
@@ -1210,16 +1238,24 @@ class DataSet(object):
             example_filter_parameters = self.example_filter_parameters
         )
         
+        data_dictionary = None
+        
         if os.path.isfile(sparse_path):
             print("Loading preprocessed data.")
             data_dictionary = loadDataDictionary(sparse_path)
             if "preprocessed values" not in data_dictionary:
                 data_dictionary["preprocessed values"] = None
-            if self.map_features:
+            if self.preprocessing_methods and not self.preprocessed \
+                and "feature scales" not in data_dictionary:
+                print("Preprocessed data saved without preprocessing "
+                    "parameters, so preprocessing again.")
+                data_dictionary = None
+            elif self.map_features:
                 self.features_mapped = True
                 self.tags = updateTagForMappedFeatures(self.tags)
             print()
-        else:
+        
+        if data_dictionary is None:
             
             preprocessing_time_start = time()
             
@@ -1250,12 +1286,13 @@ class DataSet(object):
                 print("Preprocessing values.")
                 start_time = time()
                 
-                preprocessing_function = preprocessingFunctionForDataSet(
-                    self.title,
-                    self.preprocessing_methods,
-                    self.preprocessedPath
-                )
-                preprocessed_values = preprocessing_function(values)
+                preprocessed_values, preprocessing_parameters = \
+                    preprocessValues(
+                        values,
+                        self.title,
+                        self.preprocessing_methods,
+                        self.preprocessedPath
+                    )
                 
                 duration = time() - start_time
                 print("Values preprocessed ({}).".format(formatDuration(duration)))
@@ -1264,19 +1301,27 @@ class DataSet(object):
             
             else:
                 preprocessed_values = None
+                preprocessing_parameters = {
+                    "feature scales": None,
+                    "binarised feature scales": None
+                }
             
             if self.feature_selection:
+                
+                # Feature scales are selected as values of a single example
                 values_dictionary, feature_names = selectFeatures(
                     {"original": values,
-                     "preprocessed": preprocessed_values},
+                     "preprocessed": preprocessed_values,
+                     **preprocessing_parameters},
                     self.feature_names,
                     self.feature_selection,
                     self.feature_selection_parameters,
                     self.preprocessedPath
                 )
                 
-                values = values_dictionary["original"]
-                preprocessed_values = values_dictionary["preprocessed"]
+                values = values_dictionary.pop("original")
+                preprocessed_values = values_dictionary.pop("preprocessed")
+                preprocessing_parameters = values_dictionary
             
                 print()
                 
@@ -1302,6 +1347,7 @@ class DataSet(object):
             data_dictionary = {
                 "values": values,
                 "preprocessed values": preprocessed_values,
+                **preprocessing_parameters
             }
             
             if self.features_mapped or self.feature_selection:
@@ -1349,6 +1395,9 @@ class DataSet(object):
             example_names = example_names,
             labels = labels
         )
+        
+        self.preprocessing_parameters = \
+            preprocessingParametersFromDataDictionary(data_dictionary)
     
     def binarise(self):
         
@@ -1442,14 +1491,22 @@ class DataSet(object):
             print("    fraction: {:.1f} %".format(100 * fraction))
         print()
         
+        split_data_dictionary = None
+        
         if os.path.isfile(sparse_path):
             print("Loading split data sets.")
             split_data_dictionary = loadDataDictionary(sparse_path)
-            if self.map_features:
+            if self.preprocessing_methods and not self.preprocessed \
+                and "feature scales" not in split_data_dictionary:
+                print("Split data sets saved without preprocessing "
+                    "parameters, so splitting again.")
+                split_data_dictionary = None
+            elif self.map_features:
                 self.features_mapped = True
                 self.tags = updateTagForMappedFeatures(self.tags)
             print()
-        else:
+        
+        if split_data_dictionary is None:
             
             if self.values is None:
                 self.load()
@@ -1470,6 +1527,9 @@ class DataSet(object):
                 fraction)
             splitting_duration = time() - splitting_time_start
             
+            if self.preprocessing_parameters:
+                split_data_dictionary.update(self.preprocessing_parameters)
+            
             print()
             
             if splitting_duration > maximum_duration_before_saving:
@@ -1490,6 +1550,9 @@ class DataSet(object):
                         split_data_dictionary[data_subset][data_subset_key] \
                             = SparseRowMatrix(values)
         
+        preprocessing_parameters = \
+            preprocessingParametersFromDataDictionary(split_data_dictionary)
+        
         training_set = DataSet(
             self.name,
             values = split_data_dictionary["training set"]["values"],
@@ -1506,6 +1569,7 @@ class DataSet(object):
             example_filter = self.example_filter,
             preprocessing_methods = self.preprocessing_methods,
             noisy_preprocessing_methods = self.noisy_preprocessing_methods,
+            preprocessing_parameters = preprocessing_parameters,
             kind = "training"
         )
         
@@ -1525,6 +1589,7 @@ class DataSet(object):
             example_filter = self.example_filter,
             preprocessing_methods = self.preprocessing_methods,
             noisy_preprocessing_methods = self.noisy_preprocessing_methods,
+            preprocessing_parameters = preprocessing_parameters,
             kind = "validation"
         )
         
@@ -1544,6 +1609,7 @@ class DataSet(object):
             example_filter = self.example_filter,
             preprocessing_methods = self.preprocessing_methods,
             noisy_preprocessing_methods = self.noisy_preprocessing_methods,
+            preprocessing_parameters = preprocessing_parameters,
             kind = "test"
         )
         
@@ -1659,9 +1725,8 @@ class SparseRowMatrix(scipy.sparse.csr_matrix):
         return var
 
 def standard_deviation(a, axis=None, ddof=0, batch_size=None):
-    if not isinstance(a, numpy.ndarray) or axis is not None \
-        or batch_size is None:
-            return a.std(axis=axis, ddof=ddof)
+    if axis is not None:
+        return a.std(axis=axis, ddof=ddof)
     return numpy.sqrt(variance(
         a=a,
         axis=axis,
@@ -1670,55 +1735,142 @@ def standard_deviation(a, axis=None, ddof=0, batch_size=None):
     ))
 
 def variance(a, axis=None, ddof=0, batch_size=None):
+    if axis is not None:
+        return a.var(axis=axis, ddof=ddof)
+    return summaryStatistics(a, ddof=ddof, batch_size=batch_size)["variance"]
     
-    if not isinstance(a, numpy.ndarray) or axis is not None \
-        or batch_size is None:
-            return a.var(axis=axis, ddof=ddof)
+def batchSummaryStatistics(a, tolerance = 1e-3):
     
-    number_of_rows = a.shape[0]
+    # Sparse batches only store nonzero values, so the implicit zeros are
+    # added to the sum of squared deviations and to the extrema
     
-    mean_squared = numpy.power(a.mean(axis=None), 2)
+    if scipy.sparse.issparse(a):
+        values = a.data.astype(numpy.float64)
+        size = a.shape[0] * a.shape[1]
+    else:
+        values = numpy.asarray(a, dtype=numpy.float64).reshape(-1)
+        size = values.size
     
-    squared_sum = 0
+    if size == 0:
+        return None
     
-    for i in range(0, number_of_rows, batch_size):
-        squared_sum += numpy.power(a[i:i+batch_size], 2).sum()
+    number_of_implicit_zeros = size - values.size
     
-    squared_mean = squared_sum / a.size
+    mean = values.sum() / size
+    squared_deviation_sum = numpy.square(values - mean).sum() \
+        + number_of_implicit_zeros * mean**2
     
-    var = squared_mean - mean_squared
+    extrema = []
     
-    if ddof > 0:
-        size = a.size
-        var = var * size / (size - ddof)
+    if values.size > 0:
+        extrema.extend([values.min(), values.max()])
     
-    return var
-
-def sparsity(a, tolerance = 1e-3, batch_size=None):
+    if number_of_implicit_zeros > 0:
+        extrema.append(0)
+    
+    nonzero_count = (values >= tolerance).sum()
+    
+    if tolerance <= 0:
+        nonzero_count += number_of_implicit_zeros
+    
+    return {
+        "size": size,
+        "mean": mean,
+        "squared deviation sum": squared_deviation_sum,
+        "minimum": min(extrema),
+        "maximum": max(extrema),
+        "nonzero count": nonzero_count
+    }
 
-    def count_nonzero_values(b):
-        return (b >= tolerance).sum()
+def mergeSummaryStatistics(statistics_a, statistics_b):
+    
+    # Pairwise update by Chan et al. (1979)
+    
+    size_a = statistics_a["size"]
+    size_b = statistics_b["size"]
+    size = size_a + size_b
+    
+    delta = statistics_b["mean"] - statistics_a["mean"]
+    
+    return {
+        "size": size,
+        "mean": statistics_a["mean"] + delta * size_b / size,
+        "squared deviation sum": statistics_a["squared deviation sum"]
+            + statistics_b["squared deviation sum"]
+            + delta**2 * size_a * size_b / size,
+        "minimum": min(statistics_a["minimum"], statistics_b["minimum"]),
+        "maximum": max(statistics_a["maximum"], statistics_b["maximum"]),
+        "nonzero count": statistics_a["nonzero count"]
+            + statistics_b["nonzero count"]
+    }
 
+def summaryStatistics(a, tolerance = 1e-3, ddof = 0, batch_size = None,
+    number_of_workers = None):
+    """Mean, variance, extrema and sparsity of all values in one pass.
+    
+    Dense, sparse and memory-mapped arrays are read in batches of rows,
+    which are summarised in parallel and then merged.
+    """
+    
     if scipy.sparse.issparse(a):
-        size = numpy.prod(a.shape)
+        a = scipy.sparse.csr_matrix(a)
+    elif not isinstance(a, numpy.ndarray):
+        a = numpy.asarray(a)
+    
+    if a.ndim < 2:
+        a = a.reshape(-1, 1)
+    
+    number_of_rows, number_of_columns = a.shape
+    
+    if batch_size is None:
+        batch_size = max(1, int(
+            maximum_number_of_values_per_statistics_batch
+            // max(number_of_columns, 1)
+        ))
+    
+    def summariseBatch(i):
+        return batchSummaryStatistics(a[i:i+batch_size], tolerance=tolerance)
+    
+    batch_starts = range(0, number_of_rows, batch_size)
+    
+    if len(batch_starts) > 1:
+        with ThreadPoolExecutor(number_of_workers) as executor:
+            batch_statistics = list(executor.map(summariseBatch, batch_starts))
     else:
-        size = a.size
-
-    if batch_size:
-
-        number_of_rows = a.shape[0]
-
-        nonzero_count = 0
-
-        for i in range(0, number_of_rows, batch_size):
-            nonzero_count += count_nonzero_values(a[i:i+batch_size])
-
+        batch_statistics = list(map(summariseBatch, batch_starts))
+    
+    batch_statistics = [
+        statistics for statistics in batch_statistics
+        if statistics is not None
+    ]
+    
+    if not batch_statistics:
+        return {
+            "size": 0,
+            "mean": numpy.nan,
+            "variance": numpy.nan,
+            "minimum": numpy.nan,
+            "maximum": numpy.nan,
+            "sparsity": numpy.nan
+        }
+    
+    statistics = reduce(mergeSummaryStatistics, batch_statistics)
+    
+    size = statistics["size"]
+    
+    if size > ddof:
+        statistics["variance"] = \
+            statistics["squared deviation sum"] / (size - ddof)
     else:
-        nonzero_count = count_nonzero_values(a)
-
-    a_sparsity = 1 - nonzero_count / size
+        statistics["variance"] = numpy.nan
+    
+    statistics["sparsity"] = 1 - statistics["nonzero count"] / size
+    
+    return statistics
 
-    return a_sparsity
+def sparsity(a, tolerance = 1e-3, batch_size=None):
+    return summaryStatistics(
+        a, tolerance=tolerance, batch_size=batch_size)["sparsity"]
 
 def parseInput(input_file_or_name):
     
@@ -2097,62 +2249,62 @@ def loadOriginalDataSet(title, paths):
     return data_dictionary
 
 def preprocessedPathFunction(preprocess_directory = "", name = ""):
+    # Partial function instead of closure, so that it can be pickled
+    return partial(preprocessedPath, preprocess_directory, name)
     
-    def preprocessedPath(base_name = None, map_features = None,
-        preprocessing_methods = None,
-        feature_selection = None, feature_selection_parameters = None,
-        example_filter = None, example_filter_parameters = None,
-        splitting_method = None, splitting_fraction = None,
-        split_indices = None):
+def preprocessedPath(preprocess_directory, name, base_name = None,
+    map_features = None, preprocessing_methods = None,
+    feature_selection = None, feature_selection_parameters = None,
+    example_filter = None, example_filter_parameters = None,
+    splitting_method = None, splitting_fraction = None,
+    split_indices = None):
         
-        base_path = os.path.join(preprocess_directory, name)
+    base_path = os.path.join(preprocess_directory, name)
         
-        filename_parts = [base_path]
+    filename_parts = [base_path]
         
-        if base_name:
-            filename_parts.append(normaliseString(base_name))
+    if base_name:
+        filename_parts.append(normaliseString(base_name))
         
-        if map_features:
-            filename_parts.append("features_mapped")
+    if map_features:
+        filename_parts.append("features_mapped")
         
-        if feature_selection:
-            feature_selection_part = normaliseString(feature_selection)
-            if feature_selection_parameters:
-                for parameter in feature_selection_parameters:
-                    feature_selection_part += "_" + normaliseString(str(
-                        parameter))
-            filename_parts.append(feature_selection_part)
+    if feature_selection:
+        feature_selection_part = normaliseString(feature_selection)
+        if feature_selection_parameters:
+            for parameter in feature_selection_parameters:
+                feature_selection_part += "_" + normaliseString(str(
+                    parameter))
+        filename_parts.append(feature_selection_part)
         
-        if example_filter:
-            example_filter_part = normaliseString(example_filter)
-            if example_filter_parameters:
-                for parameter in example_filter_parameters:
-                    example_filter_part += "_" + normaliseString(str(
-                        parameter))
-            filename_parts.append(example_filter_part)
+    if example_filter:
+        example_filter_part = normaliseString(example_filter)
+        if example_filter_parameters:
+            for parameter in example_filter_parameters:
+                example_filter_part += "_" + normaliseString(str(
+                    parameter))
+        filename_parts.append(example_filter_part)
         
-        if preprocessing_methods:
-            filename_parts.extend(map(normaliseString, preprocessing_methods))
+    if preprocessing_methods:
+        filename_parts.extend(map(normaliseString, preprocessing_methods))
         
         
-        if splitting_method:
-            filename_parts.append("split")
+    if splitting_method:
+        filename_parts.append("split")
             
-            if splitting_method == "indices" and \
-                len(split_indices) == 3 or not splitting_fraction:
+        if splitting_method == "indices" and \
+            len(split_indices) == 3 or not splitting_fraction:
                 
-                filename_parts.append(splitting_method)
-            else:
-                filename_parts.append("{}_{}".format(
-                    splitting_method,
-                    splitting_fraction
-                ))
+            filename_parts.append(splitting_method)
+        else:
+            filename_parts.append("{}_{}".format(
+                splitting_method,
+                splitting_fraction
+            ))
         
-        path = "-".join(filename_parts) + preprocessed_extension
+    path = "-".join(filename_parts) + preprocessed_extension
         
-        return path
-    
-    return preprocessedPath
+    return path
 
 def updateTagForMappedFeatures(tags):
     
@@ -2515,6 +2667,116 @@ def preprocessingFunctionForDataSet(title, preprocessing_methods = [],
     
     return preprocessing_function
 
+def preprocessValues(values, title, preprocessing_methods = [],
+    preprocessPath = None):
+    
+    # Preprocessing methods are applied as feature scales before and after
+    # binarisation, and these are returned as preprocessing parameters, so
+    # that new examples can be preprocessed using the same scales
+    
+    N = values.shape[1]
+    
+    feature_scales = numpy.ones((1, N))
+    binarised_feature_scales = None
+    
+    maximum_value = data_sets[title].get("original maximum value",
+        data_sets[title].get("maximum value"))
+    
+    for preprocessing_method in preprocessing_methods:
+        
+        if preprocessing_method in ["gini", "idf"]:
+            scales = loadWeights(values, preprocessing_method, preprocessPath)
+        
+        elif preprocessing_method == "normalise":
+            if maximum_value is not None:
+                scales = numpy.full(N, 1 / maximum_value)
+                maximum_value = 1
+            else:
+                # Same column norms as `sklearn.preprocessing.normalize`
+                if scipy.sparse.issparse(values):
+                    norms = numpy.sqrt(
+                        values.multiply(values).sum(axis = 0)).A.squeeze()
+                else:
+                    norms = numpy.sqrt((values ** 2).sum(axis = 0))
+                norms[norms == 0] = 1
+                scales = 1 / norms
+        
+        elif preprocessing_method == "binarise":
+            if binarised_feature_scales is not None:
+                raise ValueError("Values can only be binarised once.")
+            if maximum_value is not None:
+                values = scaleFeatures(values, 1 / maximum_value)
+                feature_scales = feature_scales / maximum_value
+            values = sklearn.preprocessing.binarize(values, threshold = 0.5)
+            binarised_feature_scales = numpy.ones((1, N))
+            continue
+        
+        else:
+            continue
+        
+        scales = numpy.asarray(scales).reshape(1, N)
+        values = scaleFeatures(values, scales)
+        
+        if binarised_feature_scales is None:
+            feature_scales = feature_scales * scales
+        else:
+            binarised_feature_scales = binarised_feature_scales * scales
+    
+    preprocessing_parameters = {
+        "feature scales": feature_scales,
+        "binarised feature scales": binarised_feature_scales
+    }
+    
+    return values, preprocessing_parameters
+
+def applyPreprocessingParameters(values, preprocessing_parameters):
+    
+    values = scaleFeatures(values,
+        preprocessing_parameters["feature scales"])
+    
+    binarised_feature_scales = \
+        preprocessing_parameters["binarised feature scales"]
+    
+    if binarised_feature_scales is not None:
+        values = sklearn.preprocessing.binarize(values, threshold = 0.5)
+        values = scaleFeatures(values, binarised_feature_scales)
+    
+    return values
+
+def preprocessingParametersFromDataDictionary(data_dictionary):
+    
+    if data_dictionary.get("feature scales") is None:
+        return None
+    
+    return {
+        "feature scales": data_dictionary["feature scales"],
+        "binarised feature scales":
+            data_dictionary.get("binarised feature scales")
+    }
+
+def scaleFeatures(values, scales):
+    if scipy.sparse.issparse(values):
+        return scipy.sparse.csr_matrix(values.multiply(scales))
+    else:
+        return values * scales
+
+def preprocessingParametersPath(directory):
+    return os.path.join(directory,
+        "preprocessing_parameters" + preprocessed_extension)
+
+def savePreprocessingParameters(preprocessing_parameters, directory):
+    saveDataDictionary(preprocessing_parameters,
+        preprocessingParametersPath(directory))
+
+def loadPreprocessingParameters(directory):
+    
+    path = preprocessingParametersPath(directory)
+    
+    if not os.path.isfile(path):
+        return None
+    
+    return preprocessingParametersFromDataDictionary(loadDataDictionary(path))
+
 def splitDataSet(data_dictionary, method = "default", fraction = 0.9):
     
     print("Splitting data set.")
@@ -2644,6 +2906,43 @@ def splitDataSet(data_dictionary, method = "default", fraction = 0.9):
     
     return split_data_dictionary
 
+decomposition_registry = {}
+
+def clearDecompositionRegistry():
+    decomposition_registry.clear()
+
+def dataSetIdentity(data_set):
+    
+    # Data sets are identified by their version, kind and examples instead of
+    # their values, so identifying them is cheap
+    
+    if data_set is None:
+        return None
+    
+    example_names = numpy.asarray(data_set.example_names)
+    example_name_hash = hashlib.sha1(
+        example_names.astype("U").tobytes()).hexdigest()
+    
+    return (
+        data_set.title,
+        data_set.version,
+        data_set.kind,
+        data_set.number_of_examples,
+        data_set.number_of_features,
+        example_name_hash
+    )
+
+def decompositionRegistryKey(data_sets, method, number_of_components,
+                             *specifiers):
+    
+    method = properString(normaliseString(method), DECOMPOSITION_METHOD_NAMES)
+    
+    return (
+        tuple(dataSetIdentity(data_set) for data_set in data_sets),
+        method,
+        number_of_components
+    ) + specifiers
+
 def decomposeDataSubsets(*subsets, method=None, number_of_components=None,
                       random=False):
     
@@ -2720,61 +3019,79 @@ def decomposeDataSubsets(*subsets, method=None, number_of_components=None,
     )
     time_start = time()
     
-    # Extract values
+    # Decompositions of the same subsets are only computed once per run
     
-    full_set = None
-    unique_subsets = []
-    
-    for subset in subsets:
-        if not full_set and subset.kind == "full":
-            full_set = subset
-        else:
-            unique_subsets.append(subset)
+    registry_key = decompositionRegistryKey(
+        sorted(
+            {s.kind: s for s in subsets}.values(),
+            key=lambda subset: subset.kind
+        ),
+        method,
+        number_of_components
+    )
     
-    if full_set:
-        values = full_set.values.copy()
-        
-        kind_indices = {}
-        
-        for subset in unique_subsets:
-            subset_indices = full_set.indicesForExampleNames(
-                subset.example_names)
-            kind_indices[subset.kind] = subset_indices
-            values[subset_indices] = subset.values
+    if registry_key in decomposition_registry:
+        decomposed_value_sets = decomposition_registry[registry_key]
         
     else:
-        values = numpy.vstack([s.values for s in unique_subsets])
     
-    # Decompose values
+        ## Extract values
     
-    decomposed_values = decompose(
-        values=values,
-        method=method,
-        number_of_components=number_of_components,
-        random=random
-    )
+        full_set = None
+        unique_subsets = []
     
-    # Package results
+        for subset in subsets:
+            if not full_set and subset.kind == "full":
+                full_set = subset
+            else:
+                unique_subsets.append(subset)
     
-    decomposed_value_sets = {}
+        if full_set:
+            values = full_set.values.copy()
     
-    if full_set:
-        decomposed_value_sets["full"] = decomposed_values
+            kind_indices = {}
     
-        for subset in unique_subsets:
-            subset_indices = kind_indices[subset.kind]
-            decomposed_value_sets[subset.kind] \
-                = decomposed_values[subset_indices]
+            for subset in unique_subsets:
+                subset_indices = full_set.indicesForExampleNames(
+                    subset.example_names)
+                kind_indices[subset.kind] = subset_indices
+                values[subset_indices] = subset.values
     
-    else:
-        cursor = 0
+        else:
+            values = numpy.vstack([s.values for s in unique_subsets])
+        
+        ## Decompose values
+        
+        decomposed_values = decompose(
+            values=values,
+            method=method,
+            number_of_components=number_of_components,
+            random=random
+        )
+        
+        ## Package results
         
-        for subset in unique_subsets:
-            M = len(subset.values)
-            subset_indices = numpy.arange(M) + cursor
-            decomposed_value_sets[subset.kind] \
-                = decomposed_values[subset_indices]
-            cursor += M
+        decomposed_value_sets = {}
+        
+        if full_set:
+            decomposed_value_sets["full"] = decomposed_values
+            
+            for subset in unique_subsets:
+                subset_indices = kind_indices[subset.kind]
+                decomposed_value_sets[subset.kind] \
+                    = decomposed_values[subset_indices]
+        
+        else:
+            cursor = 0
+            
+            for subset in unique_subsets:
+                M = len(subset.values)
+                subset_indices = numpy.arange(M) + cursor
+                decomposed_value_sets[subset.kind] \
+                    = decomposed_values[subset_indices]
+                cursor += M
+        
+        decomposition_registry[registry_key] = decomposed_value_sets
     
     decomposition_label = DECOMPOSITION_METHOD_LABEL[method]
     feature_names = numpy.array([
@@ -3967,27 +4284,27 @@ def supersetClassPalette(class_palette, label_superset):
 GENERAL_CLASS_NAMES = ["Others", "Unknown", "No class", "Remaining"]
 
 def createLabelSorter(sorted_class_names = []):
+    # Partial function instead of closure, so that it can be pickled
+    return partial(sortLabel, sorted_class_names = sorted_class_names)
     
-    def labelSorter(label):
+def sortLabel(label, sorted_class_names = []):
         
-        label = str(label)
+    label = str(label)
         
-        K = len(sorted_class_names)
-        L = len(GENERAL_CLASS_NAMES)
-        index_width = len(str(K+L))
+    K = len(sorted_class_names)
+    L = len(GENERAL_CLASS_NAMES)
+    index_width = len(str(K+L))
         
-        if label in sorted_class_names:
-            index = sorted_class_names.index(label)
-        elif label in GENERAL_CLASS_NAMES:
-            index = K + GENERAL_CLASS_NAMES.index(label)
-        else:
-            index = K + L
+    if label in sorted_class_names:
+        index = sorted_class_names.index(label)
+    elif label in GENERAL_CLASS_NAMES:
+        index = K + GENERAL_CLASS_NAMES.index(label)
+    else:
+        index = K + L
         
-        label =  "{:{}d} {}".format(index, index_width, label)
+    label =  "{:{}d} {}".format(index, index_width, label)
         
-        return label
-    
-    return labelSorter
+    return label
 
 def directory(base_directory, data_set, splitting_method, splitting_fraction,
     preprocessing = True):
@@ -0,0 +1,354 @@
+# ======================================================================== #
+# 
+# Copyright (c) 2017 - 2018 scVAE authors
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# 
+# ======================================================================== #
+
+import os
+
+import numpy
+import scipy.sparse
+import tables
+
+from time import time
+
+from data import loadValuesFrom10xDataSet, loadTabSeparatedMatrix
+from analysis import buildPathForResultDirectory
+from inference_server import InferenceModel
+from auxiliary import formatDuration
+
+EMBEDDING_BATCH_SIZE = 1000
+MAXIMUM_NAME_LENGTH = 256
+
+REPRODUCTION_TOLERANCE = 1e-4
+
+def loadNewValues(path):
+    
+    if path.endswith(".h5") or path.endswith(".tar.gz"):
+        data_dictionary = loadValuesFrom10xDataSet(path)
+        values = data_dictionary["values"]
+        example_names = data_dictionary["example names"]
+        feature_names = data_dictionary["feature names"]
+    
+    else:
+        # Features as rows and examples as columns as for other matrices
+        values, column_headers, row_indices = loadTabSeparatedMatrix(
+            path, numpy.float32)
+        values = values.T
+        example_names = numpy.array(column_headers)
+        feature_names = numpy.array(row_indices)[:, 0]
+    
+    values = scipy.sparse.csr_matrix(values, dtype = numpy.float32)
+    
+    return values, example_names, feature_names
+
+def alignFeatures(values, feature_names, reference_feature_names):
+    
+    # Reorder columns to the reference features; missing features are zero
+    
+    feature_indices = {
+        feature_name: i for i, feature_name in enumerate(feature_names)}
+    
+    reference_indices = []
+    indices = []
+    
+    for j, feature_name in enumerate(reference_feature_names):
+        i = feature_indices.get(feature_name)
+        if i is not None:
+            reference_indices.append(j)
+            indices.append(i)
+    
+    reference_indices = numpy.array(reference_indices, dtype = int)
+    indices = numpy.array(indices, dtype = int)
+    
+    F = len(reference_feature_names)
+    
+    column_mapping = scipy.sparse.csr_matrix(
+        (
+            numpy.ones(len(indices), dtype = numpy.float32),
+            (indices, reference_indices)
+        ),
+        shape = (values.shape[1], F)
+    )
+    
+    aligned_values = values.dot(column_mapping).tocsr()
+    
+    return aligned_values, len(indices)
+
+def latentStorePath(model, run_id = None, use_best_model = False,
+    use_early_stopping_model = False):
+    
+    filename_parts = ["latent_store"]
+    
+    if use_early_stopping_model:
+        filename_parts.append("early_stopping")
+    elif use_best_model:
+        filename_parts.append("best_model")
+    
+    directory = buildPathForResultDirectory(
+        base_directory = model.base_results_directory,
+        model_name = model.name,
+        run_id = run_id,
+        subdirectories = ["embeddings"]
+    )
+    
+    return os.path.join(directory, "-".join(filename_parts) + ".h5")
+
+def storedExamples(store_path):
+    
+    # Examples are identified by source and name, since example names, such
+    # as 10x barcodes, are only unique within a source
+    
+    if not os.path.isfile(store_path):
+        return set()
+    
+    with tables.open_file(store_path, "r") as store:
+        stored_sources = store.root.sources.read().astype("U")
+        stored_names = store.root.example_names.read().astype("U")
+    
+    return set(zip(stored_sources, stored_names))
+
+def appendToLatentStore(store_path, latent_values, example_names, source,
+    cluster_ids = None):
+    
+    directory = os.path.dirname(store_path)
+    
+    if not os.path.exists(directory):
+        os.makedirs(directory)
+    
+    filters = tables.Filters(complevel = 5, complib = "zlib")
+    
+    with tables.open_file(store_path, "a") as store:
+        
+        if "latent_values" not in store.root:
+            store.create_earray(store.root, "latent_values",
+                tables.Float32Atom(), (0, latent_values.shape[1]),
+                filters = filters)
+            store.create_earray(store.root, "example_names",
+                tables.StringAtom(MAXIMUM_NAME_LENGTH), (0,),
+                filters = filters)
+            store.create_earray(store.root, "sources",
+                tables.StringAtom(MAXIMUM_NAME_LENGTH), (0,),
+                filters = filters)
+            if cluster_ids is not None:
+                store.create_earray(store.root, "cluster_ids",
+                    tables.Int32Atom(), (0,), filters = filters)
+        
+        store.root.latent_values.append(latent_values)
+        store.root.example_names.append(
+            numpy.array(example_names).astype("S"))
+        store.root.sources.append(
+            numpy.array([source] * len(example_names)).astype("S"))
+        
+        if cluster_ids is not None and "cluster_ids" in store.root:
+            store.root.cluster_ids.append(cluster_ids.astype(numpy.int32))
+        
+        number_of_stored_examples = store.root.latent_values.nrows
+    
+    return number_of_stored_examples
+
+def checkReproductionOfReferenceExample(inference_model, reference_set,
+    example_index = 0):
+    
+    # An example of the reference set is embedded from its original values
+    # as a new example and compared with its latent value from the values
+    # the model was evaluated on, which fails if these were preprocessed
+    # differently
+    
+    if reference_set.noisy_preprocessing_methods:
+        # The model was evaluated on noisily preprocessed values
+        return
+    
+    example = slice(example_index, example_index + 1)
+    
+    if reference_set.has_preprocessed_values:
+        evaluated_values = reference_set.preprocessed_values[example]
+    else:
+        evaluated_values = reference_set.values[example]
+    
+    stored_latent_value = inference_model.run(
+        values = numpy.asarray(evaluated_values.toarray(),
+            dtype = numpy.float32),
+        count_sum = reference_set.count_sum[example],
+        normalised_count_sum = reference_set.normalised_count_sum[example],
+        operations = ["encode"]
+    )["encode"]
+    
+    values, _ = alignFeatures(
+        scipy.sparse.csr_matrix(reference_set.values[example]),
+        reference_set.feature_names,
+        reference_set.feature_names
+    )
+    
+    embedded_latent_value = inference_model.run(
+        *inference_model.prepare(values.toarray()),
+        operations = ["encode"]
+    )["encode"]
+    
+    difference = numpy.abs(embedded_latent_value - stored_latent_value).max()
+    
+    if difference > REPRODUCTION_TOLERANCE:
+        raise ValueError(
+            "Embedding of {} example {} differs from its latent value "
+            "by up to {:.3g}, so new examples would not be preprocessed "
+            "as the examples the model was trained on.".format(
+                reference_set.kind, example_index, difference)
+        )
+    
+    print("Embedding of {} example {} reproduces its latent value.".format(
+        reference_set.kind, example_index))
+
+def embed(model, reference_set, path, run_id = None, use_best_model = False,
+    use_early_stopping_model = False, batch_size = None):
+    
+    if batch_size is None:
+        batch_size = EMBEDDING_BATCH_SIZE
+    
+    source = os.path.basename(path)
+    
+    # Values
+    
+    print("Loading new values from {}.".format(source))
+    start_time = time()
+    
+    values, example_names, feature_names = loadNewValues(path)
+    
+    duration = time() - start_time
+    print("New values with {} examples and {} features loaded ({}).".format(
+        values.shape[0], values.shape[1], formatDuration(duration)))
+    
+    ## Skip examples already in store
+    
+    store_path = latentStorePath(
+        model,
+        run_id = run_id,
+        use_best_model = use_best_model,
+        use_early_stopping_model = use_early_stopping_model
+    )
+    
+    stored_examples = storedExamples(store_path)
+    
+    if stored_examples:
+        new_example_indices = numpy.array([
+            i for i, example_name in enumerate(example_names)
+            if (source, example_name) not in stored_examples
+        ], dtype = int)
+        number_of_stored_examples = len(example_names) \
+            - len(new_example_indices)
+        if number_of_stored_examples > 0:
+            print("Skipping {} examples already in latent store.".format(
+                number_of_stored_examples))
+        values = values[new_example_indices]
+        example_names = example_names[new_example_indices]
+    
+    M = values.shape[0]
+    
+    if M == 0:
+        print("No new examples to embed.")
+        return store_path
+    
+    ## Feature alignment
+    
+    print("Aligning features to model features.")
+    start_time = time()
+    
+    values, number_of_matched_features = alignFeatures(
+        values, feature_names, reference_set.feature_names)
+    
+    duration = time() - start_time
+    print("{} of {} model features found in new values ({}).".format(
+        number_of_matched_features, reference_set.number_of_features,
+        formatDuration(duration)))
+    
+    # Encoding
+    
+    inference_model = InferenceModel(
+        model,
+        reference_set = reference_set,
+        run_id = run_id,
+        use_best_model = use_best_model,
+        use_early_stopping_model = use_early_stopping_model
+    )
+    
+    checkReproductionOfReferenceExample(inference_model, reference_set)
+    
+    ## Preprocessing
+    
+    # Using the preprocessing parameters of the training set, so that new
+    # examples are preprocessed as the examples the model was trained on
+    
+    if inference_model.preprocessing_parameters:
+        print("Preprocessing new values.")
+        start_time = time()
+        preprocessed_values = inference_model.preprocessValues(values)
+        duration = time() - start_time
+        print("New values preprocessed ({}).".format(formatDuration(duration)))
+    else:
+        preprocessed_values = values
+    
+    count_sum = numpy.asarray(values.sum(axis = 1)).reshape(-1, 1)
+    normalised_count_sum = count_sum / inference_model.maximum_count_sum
+    
+    ## Embedding
+    
+    operations = ["encode"]
+    
+    if "predict" in inference_model.operations:
+        operations.append("predict")
+        cluster_ids = numpy.empty(M, numpy.int32)
+    else:
+        cluster_ids = None
+    
+    print("Embedding {} new examples in batches of {}.".format(M, batch_size))
+    start_time = time()
+    
+    latent_values = numpy.empty((M, model.latent_size), numpy.float32)
+    
+    for i in range(0, M, batch_size):
+        
+        batch = slice(i, min(i + batch_size, M))
+        
+        results = inference_model.run(
+            values = preprocessed_values[batch].toarray(),
+            count_sum = count_sum[batch],
+            normalised_count_sum = normalised_count_sum[batch],
+            operations = operations
+        )
+        
+        latent_values[batch] = results["encode"].reshape(
+            -1, model.latent_size)
+        
+        if cluster_ids is not None:
+            cluster_ids[batch] = results["predict"].argmax(axis = -1)
+    
+    inference_model.close()
+    
+    duration = time() - start_time
+    print("New examples embedded ({}).".format(formatDuration(duration)))
+    
+    # Storing
+    
+    number_of_stored_examples = appendToLatentStore(
+        store_path,
+        latent_values,
+        example_names,
+        source,
+        cluster_ids = cluster_ids
+    )
+    
+    print("Latent store now contains {} examples: {}.".format(
+        number_of_stored_examples, store_path))
+    
+    return store_path
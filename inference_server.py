@@ -0,0 +1,679 @@
+#!/usr/bin/env python3
+
+# ======================================================================== #
+# 
+# Copyright (c) 2017 - 2018 scVAE authors
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# 
+# ======================================================================== #
+
+import os
+import json
+import queue
+import threading
+import argparse
+import urllib.request
+
+from http.server import HTTPServer, BaseHTTPRequestHandler
+from socketserver import ThreadingMixIn
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy
+import scipy.sparse
+import tensorflow as tf
+
+from time import time
+
+from data import applyPreprocessingParameters, loadPreprocessingParameters
+from auxiliary import formatDuration, checkRunID
+from models.auxiliary import correctModelCheckpointPath
+
+DEFAULT_SERVER_ADDRESS = "localhost:8000"
+
+MAXIMUM_BATCH_SIZE = 1000
+MAXIMUM_BATCHING_DELAY = 0.005 # seconds
+
+INFERENCE_OPERATIONS = ["encode", "reconstruct", "predict"]
+
+class InferenceModel(object):
+    
+    # Trained model restored once into a long-lived session together with
+    # the preprocessing parameters and count-sum normalisation of its
+    # training set, so that examples are preprocessed independently of the
+    # other examples in a request
+    
+    def __init__(self, model, reference_set, run_id = None,
+        use_best_model = False, use_early_stopping_model = False):
+        
+        self.model = model
+        
+        self.maximum_count_sum = reference_set.count_sum.max()
+        
+        if run_id:
+            run_id = checkRunID(run_id)
+        
+        # Saved with the run after training; runs trained before these were
+        # saved use those of the reference set
+        preprocessing_parameters = loadPreprocessingParameters(
+            model.logDirectory(run_id = run_id))
+        
+        if preprocessing_parameters is None:
+            preprocessing_parameters = reference_set.preprocessing_parameters
+        
+        if preprocessing_parameters and \
+            preprocessing_parameters["feature scales"].shape[-1] \
+                != model.feature_size:
+            raise ValueError(
+                "Preprocessing parameters for {} features, but model has {}."
+                .format(preprocessing_parameters["feature scales"].shape[-1],
+                    model.feature_size)
+            )
+        
+        self.preprocessing_parameters = preprocessing_parameters
+        
+        log_directory = model.logDirectory(
+            run_id = run_id,
+            early_stopping = use_early_stopping_model,
+            best_model = use_best_model
+        )
+        
+        checkpoint = tf.train.get_checkpoint_state(log_directory)
+        
+        if not checkpoint:
+            raise Exception(
+                "Cannot restore model when it has not been trained.")
+        
+        self.log_directory = log_directory
+        
+        model_checkpoint_path = correctModelCheckpointPath(
+            checkpoint.model_checkpoint_path,
+            log_directory
+        )
+        
+        self.session = tf.Session(graph = model.graph)
+        model.saver.restore(self.session, model_checkpoint_path)
+        self.epoch = int(os.path.split(model_checkpoint_path)[-1]
+            .split('-')[-1])
+        
+        if "GM" in model.type:
+            self.outputs = {
+                "encode": model.z_mean,
+                "reconstruct": model.p_x_mean,
+                "predict": model.y_mean
+            }
+            self.sample_placeholders = [model.S_iw, model.S_mc]
+        else:
+            self.outputs = {
+                "encode": model.q_z_mean,
+                "reconstruct": model.p_x_mean
+            }
+            self.sample_placeholders = [
+                model.number_of_iw_samples,
+                model.number_of_mc_samples
+            ]
+        
+        # Placeholders with fixed values during inference
+        self.constant_inputs = {
+            model.is_training: False,
+            model.warm_up_weight: 1.0
+        }
+        
+        for sample_placeholder in self.sample_placeholders:
+            self.constant_inputs[sample_placeholder] = 1
+        
+        if "GM" not in model.type:
+            self.constant_inputs[model.use_deterministic_z] = True
+        
+        self.operations = [
+            operation for operation in INFERENCE_OPERATIONS
+            if operation in self.outputs
+        ]
+    
+    @property
+    def feature_size(self):
+        return self.model.feature_size
+    
+    def prepare(self, values):
+        
+        values = numpy.array(values, dtype = numpy.float32, ndmin = 2)
+        
+        if values.shape[1] != self.feature_size:
+            raise ValueError(
+                "Expected {} features, but got {}.".format(
+                    self.feature_size, values.shape[1])
+            )
+        
+        count_sum = values.sum(axis = 1).reshape(-1, 1)
+        normalised_count_sum = count_sum / self.maximum_count_sum
+        
+        values = self.preprocessValues(values)
+        
+        return values, count_sum, normalised_count_sum
+    
+    def preprocessValues(self, values):
+        
+        if self.preprocessing_parameters:
+            values = applyPreprocessingParameters(
+                values, self.preprocessing_parameters)
+        
+        if scipy.sparse.issparse(values):
+            return scipy.sparse.csr_matrix(values, dtype = numpy.float32)
+        else:
+            return numpy.asarray(values, dtype = numpy.float32)
+    
+    def run(self, values, count_sum, normalised_count_sum, operations):
+        
+        fetches = [self.outputs[operation] for operation in operations]
+        
+        feed_dict = {
+            self.model.x: values,
+            self.model.t: values
+        }
+        
+        feed_dict.update(self.constant_inputs)
+        
+        if self.model.count_sum:
+            feed_dict[self.model.n] = count_sum
+        
+        if self.model.count_sum_feature:
+            feed_dict[self.model.n_feature] = normalised_count_sum
+        
+        results = self.session.run(fetches, feed_dict = feed_dict)
+        
+        return dict(zip(operations, results))
+    
+    def close(self):
+        self.session.close()
+
+class InferenceBatcher(object):
+    
+    # Combines concurrent requests into one `session.run` (micro-batching)
+    
+    def __init__(self, inference_model, maximum_batch_size = None,
+        maximum_batching_delay = None):
+        
+        if maximum_batch_size is None:
+            maximum_batch_size = MAXIMUM_BATCH_SIZE
+        
+        if maximum_batching_delay is None:
+            maximum_batching_delay = MAXIMUM_BATCHING_DELAY
+        
+        self.inference_model = inference_model
+        self.maximum_batch_size = maximum_batch_size
+        self.maximum_batching_delay = maximum_batching_delay
+        
+        self.requests = queue.Queue()
+        
+        self.number_of_requests = 0
+        self.number_of_batches = 0
+        self.number_of_examples = 0
+        self.total_duration = 0
+        
+        self.worker = threading.Thread(target = self._work, daemon = True)
+        self.worker.start()
+    
+    def submit(self, operation, values):
+        
+        if operation not in self.inference_model.operations:
+            raise ValueError(
+                "Operation `{}` not available for this model.".format(
+                    operation)
+            )
+        
+        values, count_sum, normalised_count_sum = \
+            self.inference_model.prepare(values)
+        
+        request = {
+            "operation": operation,
+            "values": values,
+            "count sum": count_sum,
+            "normalised count sum": normalised_count_sum,
+            "result": None,
+            "error": None,
+            "done": threading.Event()
+        }
+        
+        self.requests.put(request)
+        request["done"].wait()
+        
+        if request["error"]:
+            raise request["error"]
+        
+        return request["result"]
+    
+    @property
+    def status(self):
+        
+        if self.number_of_batches > 0:
+            mean_batch_size = self.number_of_examples / self.number_of_batches
+        else:
+            mean_batch_size = None
+        
+        return {
+            "model": self.inference_model.model.name,
+            "epoch": self.inference_model.epoch,
+            "feature size": self.inference_model.feature_size,
+            "latent size": self.inference_model.model.latent_size,
+            "operations": self.inference_model.operations,
+            "number of requests": self.number_of_requests,
+            "number of batches": self.number_of_batches,
+            "mean batch size": mean_batch_size,
+            "total duration": formatDuration(self.total_duration)
+        }
+    
+    def _work(self):
+        
+        while True:
+            
+            request = self.requests.get()
+            batch = [request]
+            batch_size = request["values"].shape[0]
+            
+            batching_deadline = time() + self.maximum_batching_delay
+            
+            while batch_size < self.maximum_batch_size:
+                remaining_delay = batching_deadline - time()
+                if remaining_delay <= 0:
+                    break
+                try:
+                    request = self.requests.get(timeout = remaining_delay)
+                except queue.Empty:
+                    break
+                batch.append(request)
+                batch_size += request["values"].shape[0]
+            
+            self._process(batch)
+    
+    def _process(self, batch):
+        
+        start_time = time()
+        
+        operations = [
+            operation for operation in self.inference_model.operations
+            if any(request["operation"] == operation for request in batch)
+        ]
+        
+        try:
+            results = self.inference_model.run(
+                values = numpy.concatenate(
+                    [request["values"] for request in batch]),
+                count_sum = numpy.concatenate(
+                    [request["count sum"] for request in batch]),
+                normalised_count_sum = numpy.concatenate(
+                    [request["normalised count sum"] for request in batch]),
+                operations = operations
+            )
+        except Exception as error:
+            for request in batch:
+                request["error"] = error
+                request["done"].set()
+            return
+        
+        i = 0
+        
+        for request in batch:
+            batch_size = request["values"].shape[0]
+            request["result"] = results[request["operation"]][i:i + batch_size]
+            request["done"].set()
+            i += batch_size
+        
+        self.number_of_requests += len(batch)
+        self.number_of_batches += 1
+        self.number_of_examples += i
+        self.total_duration += time() - start_time
+
+class InferenceRequestHandler(BaseHTTPRequestHandler):
+    
+    # POST /encode, /reconstruct, or /predict with {"values": [[...], ...]}
+    # GET /status
+    
+    def do_GET(self):
+        if self.path.strip("/") == "status":
+            self._respond(200, self.server.batcher.status)
+        else:
+            self._respond(404, {"error": "Unknown path: {}.".format(self.path)})
+    
+    def do_POST(self):
+        
+        operation = self.path.strip("/")
+        
+        try:
+            content_length = int(self.headers.get("Content-Length", 0))
+            request = json.loads(self.rfile.read(content_length).decode())
+            result = self.server.batcher.submit(operation, request["values"])
+        except (ValueError, KeyError) as error:
+            self._respond(400, {"error": str(error)})
+            return
+        except Exception as error:
+            self._respond(500, {"error": str(error)})
+            return
+        
+        if operation == "predict":
+            response = {
+                "cluster ids": result.argmax(axis = 1).tolist(),
+                "probabilities": result.tolist()
+            }
+        else:
+            response = {"values": result.tolist()}
+        
+        self._respond(200, response)
+    
+    def log_message(self, format, *arguments):
+        pass
+    
+    def _respond(self, code, content):
+        body = json.dumps(content).encode()
+        self.send_response(code)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+class InferenceHTTPServer(ThreadingMixIn, HTTPServer):
+    daemon_threads = True
+
+def parseServerAddress(address):
+    host, port = address.rsplit(":", 1)
+    return host, int(port)
+
+def serve(model, reference_set, run_id = None, use_best_model = False,
+    use_early_stopping_model = False, address = None,
+    maximum_batch_size = None, maximum_batching_delay = None):
+    
+    if address is None:
+        address = DEFAULT_SERVER_ADDRESS
+    
+    print("Restoring model for inference.")
+    start_time = time()
+    
+    inference_model = InferenceModel(
+        model,
+        reference_set = reference_set,
+        run_id = run_id,
+        use_best_model = use_best_model,
+        use_early_stopping_model = use_early_stopping_model
+    )
+    
+    duration = time() - start_time
+    print("Model restored at epoch {} ({}).".format(
+        inference_model.epoch, formatDuration(duration)))
+    
+    batcher = InferenceBatcher(
+        inference_model,
+        maximum_batch_size = maximum_batch_size,
+        maximum_batching_delay = maximum_batching_delay
+    )
+    
+    server = InferenceHTTPServer(parseServerAddress(address),
+        InferenceRequestHandler)
+    server.batcher = batcher
+    
+    print("Serving {} at http://{}/ ({}).".format(
+        model.name, address, ", ".join(inference_model.operations)))
+    print()
+    
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        inference_model.close()
+    
+    print("Server stopped after {} requests in {} batches.".format(
+        batcher.number_of_requests, batcher.number_of_batches))
+
+# Frozen inference graphs
+
+def exportFrozenGraphs(inference_model, directory = None):
+    
+    # Write pruned subgraphs with variables converted to constants and
+    # training-time placeholders (training flag, sample counts) replaced by
+    # their inference values, so that they can be constant folded at load
+    
+    model = inference_model.model
+    session = inference_model.session
+    
+    if directory is None:
+        directory = os.path.join(inference_model.log_directory, "frozen")
+    
+    if not os.path.exists(directory):
+        os.makedirs(directory)
+    
+    with model.graph.as_default():
+        
+        if "GM" in model.type:
+            latent_samples = model.z[0]
+            decoder_mean = model.p_x_given_z[0].mean()
+        else:
+            latent_samples = model.z
+            decoder_mean = model.p_x_given_z.mean()
+        
+        frozen_graph_specifications = {
+            "encoder": {
+                "output": tf.identity(inference_model.outputs["encode"],
+                    name = "encoder_mean"),
+                "input map": {}
+            },
+            "decoder": {
+                "output": tf.identity(decoder_mean, name = "decoder_mean"),
+                "input map": {latent_samples: "Z"}
+            }
+        }
+        
+        if "predict" in inference_model.outputs:
+            frozen_graph_specifications["cluster_probabilities"] = {
+                "output": tf.identity(inference_model.outputs["predict"],
+                    name = "q_y_probabilities"),
+                "input map": {}
+            }
+    
+    print("Exporting frozen inference graphs.")
+    start_time = time()
+    
+    manifest = {}
+    
+    for name, specifications in frozen_graph_specifications.items():
+        
+        output_name = specifications["output"].op.name
+        
+        graph_def = tf.graph_util.convert_variables_to_constants(
+            session,
+            model.graph.as_graph_def(),
+            [output_name]
+        )
+        
+        if specifications["input map"]:
+            
+            with tf.Graph().as_default() as graph:
+                input_map = {}
+                for tensor, input_name in specifications["input map"].items():
+                    input_map[tensor.name] = tf.placeholder(
+                        tensor.dtype,
+                        [None, tensor.shape[-1].value],
+                        input_name
+                    )
+                tf.import_graph_def(graph_def, input_map = input_map,
+                    name = "")
+                graph_def = graph.as_graph_def()
+            
+            graph_def = tf.graph_util.extract_sub_graph(graph_def,
+                [output_name])
+        
+        graph_def = replacePlaceholdersWithConstants(
+            graph_def, inference_model.constant_inputs)
+        
+        input_names = [
+            node.name + ":0" for node in graph_def.node
+            if node.op == "Placeholder"
+        ]
+        
+        tf.train.write_graph(graph_def, directory, name + ".pb",
+            as_text = False)
+        
+        manifest[name] = {
+            "inputs": input_names,
+            "outputs": [output_name + ":0"],
+            "number of nodes": len(graph_def.node)
+        }
+    
+    manifest_path = os.path.join(directory, "manifest.json")
+    with open(manifest_path, "w") as manifest_file:
+        json.dump(manifest, manifest_file, indent = 4)
+    
+    duration = time() - start_time
+    print("Frozen inference graphs ({}) exported to {} ({}).".format(
+        ", ".join(manifest), directory, formatDuration(duration)))
+    
+    return manifest
+
+def replacePlaceholdersWithConstants(graph_def, constant_inputs):
+    
+    constant_values = {
+        tensor.op.name: value for tensor, value in constant_inputs.items()
+    }
+    
+    for node in graph_def.node:
+        if node.op == "Placeholder" and node.name in constant_values:
+            dtype = tf.as_dtype(node.attr["dtype"].type)
+            tensor_proto = tf.make_tensor_proto(
+                constant_values[node.name], dtype = dtype)
+            node.op = "Const"
+            node.ClearField("attr")
+            node.attr["dtype"].type = dtype.as_datatype_enum
+            node.attr["value"].tensor.CopyFrom(tensor_proto)
+    
+    return graph_def
+
+def loadFrozenGraph(name, directory):
+    
+    with open(os.path.join(directory, "manifest.json"), "r") as manifest_file:
+        specifications = json.load(manifest_file)[name]
+    
+    graph_def = tf.GraphDef()
+    with tf.gfile.GFile(os.path.join(directory, name + ".pb"), "rb") \
+        as graph_file:
+            graph_def.ParseFromString(graph_file.read())
+    
+    with tf.Graph().as_default() as graph:
+        tf.import_graph_def(graph_def, name = "")
+    
+    inputs = [graph.get_tensor_by_name(n) for n in specifications["inputs"]]
+    outputs = [graph.get_tensor_by_name(n) for n in specifications["outputs"]]
+    
+    return graph, inputs, outputs
+
+# Benchmark
+
+def request(address, path, content = None):
+    
+    url = "http://{}/{}".format(address, path)
+    
+    if content is None:
+        data = None
+    else:
+        data = json.dumps(content).encode()
+    
+    http_request = urllib.request.Request(url, data = data,
+        headers = {"Content-Type": "application/json"})
+    
+    with urllib.request.urlopen(http_request) as response:
+        return json.loads(response.read().decode())
+
+def benchmark(address = None, operation = "encode", number_of_requests = 1000,
+    request_size = 1, number_of_clients = 16, mean_count = 1.0):
+    
+    if address is None:
+        address = DEFAULT_SERVER_ADDRESS
+    
+    status = request(address, "status")
+    feature_size = status["feature size"]
+    
+    random_state = numpy.random.RandomState(57)
+    values = random_state.poisson(
+        mean_count, (request_size, feature_size)).tolist()
+    
+    def timedRequest(i):
+        start_time = time()
+        request(address, operation, {"values": values})
+        return time() - start_time
+    
+    print("Benchmarking {} with {} requests of {} examples from {} clients."\
+        .format(operation, number_of_requests, request_size,
+            number_of_clients))
+    
+    start_time = time()
+    
+    with ThreadPoolExecutor(max_workers = number_of_clients) as executor:
+        latencies = numpy.array(list(executor.map(
+            timedRequest, range(number_of_requests))))
+    
+    duration = time() - start_time
+    
+    status = request(address, "status")
+    
+    print("    Duration: {}.".format(formatDuration(duration)))
+    print("    Throughput: {:.1f} requests/s, {:.1f} examples/s.".format(
+        number_of_requests / duration,
+        number_of_requests * request_size / duration
+    ))
+    print("    Latency: median {:.1f} ms, 95th percentile {:.1f} ms, "\
+        .format(1000 * numpy.median(latencies),
+            1000 * numpy.percentile(latencies, 95)) + \
+        "maximum {:.1f} ms.".format(1000 * latencies.max()))
+    print("    Server: {} requests in {} batches (mean batch size: {}).".format(
+        status["number of requests"], status["number of batches"],
+        status["mean batch size"]))
+    
+    return latencies
+
+parser = argparse.ArgumentParser(
+    description="Benchmark latency and throughput of an inference server.",
+    formatter_class=argparse.ArgumentDefaultsHelpFormatter
+)
+parser.add_argument(
+    "--address", "-a",
+    type = str,
+    default = DEFAULT_SERVER_ADDRESS,
+    help = "address (host:port) of inference server"
+)
+parser.add_argument(
+    "--operation", "-o",
+    type = str,
+    default = "encode",
+    choices = INFERENCE_OPERATIONS,
+    help = "inference operation to benchmark"
+)
+parser.add_argument(
+    "--number-of-requests", "-n",
+    type = int,
+    default = 1000,
+    help = "total number of requests"
+)
+parser.add_argument(
+    "--request-size", "-s",
+    type = int,
+    default = 1,
+    help = "number of examples in each request"
+)
+parser.add_argument(
+    "--number-of-clients", "-c",
+    type = int,
+    default = 16,
+    help = "number of concurrent clients"
+)
+
+if __name__ == '__main__':
+    arguments = parser.parse_args()
+    benchmark(**vars(arguments))
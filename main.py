@@ -20,6 +20,8 @@
 
 import data
 import analysis
+import inference_server
+import embedding
 
 from models import (
     VariationalAutoencoder,
@@ -74,6 +76,8 @@ def main(input_file_or_name, data_directory = "data",
     count_sum = True,
     number_of_epochs = 200, plotting_interval_during_training = None, 
     batch_size = 100, learning_rate = 1e-4,
+    evaluation_batch_size = None, evaluation_memory_budget = None,
+    antithetic_sampling = False,
     run_id = None, new_run = False,
     prediction_method = None, prediction_training_set_name = "training",
     prediction_decomposition_method = None,
@@ -83,7 +87,9 @@ def main(input_file_or_name, data_directory = "data",
     model_versions = ["all"],
     analyse = True, evaluation_set_name = "test", analyse_data = False,
     analyses = ["default"], analysis_level = "normal", fast_analysis = False,
-    export_options = []):
+    analysis_workers = None, analysis_cache = False,
+    export_options = [], serve = None, export_frozen_graphs = False,
+    embed = None):
     
     # Setup
     
@@ -96,12 +102,27 @@ def main(input_file_or_name, data_directory = "data",
         analyses = ["simple"]
         analysis_level = "limited"
     
+    if analyse and analysis_workers is not None:
+        analysis.startFigureExecutor(analysis_workers)
+    
+    if analyse and analysis_cache:
+        analysis.enableAnalysisCache(
+            os.path.join(results_directory, "cache"))
+    
+    if analyse:
+        analysis.enableMetricsStore(results_directory)
+    
     ## Distributions
     
     reconstruction_distribution = parseDistribution(
         reconstruction_distribution)
     latent_distribution = parseDistribution(latent_distribution)
     
+    ## Evaluation memory budget (GiB -> bytes)
+    
+    if evaluation_memory_budget:
+        evaluation_memory_budget = int(evaluation_memory_budget * 2 ** 30)
+    
     ## Model configuration validation
     
     if not skip_modelling:
@@ -335,6 +356,63 @@ def main(input_file_or_name, data_directory = "data",
     print(model.parameters)
     print()
     
+    ## Inference
+    
+    if serve or export_frozen_graphs or embed:
+        
+        use_best_model = "best_model" in model_versions \
+            and betterModelExists(model, run_id = run_id)
+        use_early_stopping_model = not use_best_model \
+            and "early_stopping" in model_versions \
+            and modelStoppedEarly(model, run_id = run_id)
+        
+        if export_frozen_graphs:
+            
+            print(subtitle("Model export"))
+            
+            inference_model = inference_server.InferenceModel(
+                model,
+                reference_set = training_set,
+                run_id = run_id,
+                use_best_model = use_best_model,
+                use_early_stopping_model = use_early_stopping_model
+            )
+            inference_server.exportFrozenGraphs(inference_model)
+            inference_model.close()
+            
+            print()
+        
+        if embed:
+            
+            print(subtitle("Embedding of new examples"))
+            
+            embedding.embed(
+                model,
+                reference_set = training_set,
+                path = embed,
+                run_id = run_id,
+                use_best_model = use_best_model,
+                use_early_stopping_model = use_early_stopping_model,
+                batch_size = evaluation_batch_size
+            )
+            
+            print()
+        
+        if serve:
+            
+            print(subtitle("Model serving"))
+            
+            inference_server.serve(
+                model,
+                reference_set = training_set,
+                run_id = run_id,
+                use_best_model = use_best_model,
+                use_early_stopping_model = use_early_stopping_model,
+                address = serve
+            )
+        
+        return
+    
     ## Training
     
     print(subtitle("Model training"))
@@ -360,6 +438,14 @@ def main(input_file_or_name, data_directory = "data",
         print(status["message"])
         return
     
+    # Saved with the run, so that new examples are preprocessed as the
+    # training set, when the model is served or used for embedding
+    if training_set.preprocessing_parameters:
+        data.savePreprocessingParameters(
+            training_set.preprocessing_parameters,
+            model.logDirectory(run_id = run_id)
+        )
+    
     status_filename = "status"
     if "epochs trained" in status:
         status_filename += "-" + status["epochs trained"]
@@ -576,6 +662,9 @@ def main(input_file_or_name, data_directory = "data",
         model_parameter_set_name = model_parameter_set_name.capitalize()
         print(subtitle(model_parameter_set_name))
         
+        # Latent and reconstructed sets differ between parameter sets
+        data.clearDecompositionRegistry()
+        
         # Evaluation
         
         model_parameter_set_name = model_parameter_set_name.replace(" ", "-")
@@ -587,8 +676,10 @@ def main(input_file_or_name, data_directory = "data",
                 latent_evaluation_sets = model.evaluate(
                     evaluation_set = evaluation_set,
                     evaluation_subset_indices = evaluation_subset_indices,
-                    batch_size = batch_size,
+                    batch_size = evaluation_batch_size,
+                    memory_budget = evaluation_memory_budget,
                     predict_labels = predict_labels_using_model,
+                    use_antithetic_z = antithetic_sampling,
                     run_id = run_id,
                     use_best_model = use_best_model,
                     use_early_stopping_model = use_early_stopping_model
@@ -598,7 +689,8 @@ def main(input_file_or_name, data_directory = "data",
                 model.evaluate(
                     evaluation_set = evaluation_set,
                     evaluation_subset_indices = evaluation_subset_indices,
-                    batch_size = batch_size,
+                    batch_size = evaluation_batch_size,
+                    memory_budget = evaluation_memory_budget,
                     run_id = run_id,
                     use_best_model = use_best_model,
                     use_early_stopping_model = use_early_stopping_model
@@ -621,7 +713,8 @@ def main(input_file_or_name, data_directory = "data",
                 
                 latent_prediction_training_sets = model.evaluate(
                     evaluation_set = prediction_training_set,
-                    batch_size = batch_size,
+                    batch_size = evaluation_batch_size,
+                    memory_budget = evaluation_memory_budget,
                     run_id = run_id,
                     use_best_model = use_best_model,
                     use_early_stopping_model = use_early_stopping_model,
@@ -707,6 +800,7 @@ def main(input_file_or_name, data_directory = "data",
                 prediction_details = prediction_details,
                 best_model = use_best_model,
                 early_stopping = use_early_stopping_model,
+                antithetic_sampling = antithetic_sampling,
                 analyses = analyses, analysis_level = analysis_level,
                 export_options = export_options,
                 results_directory = results_directory
@@ -717,6 +811,8 @@ def main(input_file_or_name, data_directory = "data",
         if transformed_evaluation_set.version == "original":
             transformed_evaluation_set.resetPredictions()
 
+    analysis.finishFigureExecutor()
+
 def parseModelVersions(proposed_versions):
     
     version_alias_sets = {
@@ -1065,6 +1161,24 @@ parser.add_argument(
     default = 100,
     help = "batch size used when training"
 )
+parser.add_argument(
+    "--evaluation-batch-size",
+    type = int,
+    nargs = "?",
+    help = "maximum batch size used when evaluating (default: largest batch size within the evaluation memory budget)"
+)
+parser.add_argument(
+    "--evaluation-memory-budget",
+    type = float,
+    nargs = "?",
+    help = "memory budget in GiB used to plan the batch size when evaluating (default: 1 GiB)"
+)
+parser.add_argument(
+    "--antithetic-sampling",
+    action = "store_true",
+    help = "use antithetic pairs of Monte Carlo samples of the latent variables when evaluating to reduce the variance of the lower bound estimate"
+)
+parser.set_defaults(antithetic_sampling = False)
 parser.add_argument(
     "--learning-rate",
     type = float,
@@ -1247,6 +1361,25 @@ parser.add_argument(
     help = "perform fast analysis (equivalent to: `--analyses simple --analysis-level limited`)"
 )
 parser.set_defaults(fast_analysis = False)
+parser.add_argument(
+    "--analysis-workers",
+    type = int,
+    nargs = "?",
+    const = 0,
+    help = "render and save figures in parallel using this number of worker processes (all processors if no number is given)"
+)
+parser.add_argument(
+    "--analysis-cache",
+    action = "store_true",
+    help = "reuse decompositions, distance matrices, histograms, and decomposition plots from earlier analyses of unchanged data sets and model checkpoints"
+)
+parser.add_argument(
+    "--skip-analysis-cache",
+    dest = "analysis_cache",
+    action = "store_false",
+    help = "recompute all decompositions and figures in analyses (default)"
+)
+parser.set_defaults(analysis_cache = False)
 parser.add_argument(
     "--export-options",
     type = str,
@@ -1254,6 +1387,25 @@ parser.add_argument(
     default = [],
     help = "analyse model evolution for video"
 )
+parser.add_argument(
+    "--serve",
+    type = str,
+    nargs = "?",
+    const = inference_server.DEFAULT_SERVER_ADDRESS,
+    help = "serve trained model for inference at address (host:port) instead of training and evaluating it"
+)
+parser.add_argument(
+    "--export-frozen-graphs",
+    action = "store_true",
+    help = "export frozen encoder, decoder, and (for GMVAEs) cluster-probability graphs of trained model instead of training and evaluating it"
+)
+parser.set_defaults(export_frozen_graphs = False)
+parser.add_argument(
+    "--embed",
+    type = str,
+    nargs = "?",
+    help = "path to new 10x or tab-separated matrix to embed in the latent space of trained model and append to its latent store instead of training and evaluating it"
+)
 
 if __name__ == '__main__':
     arguments = parser.parse_args()
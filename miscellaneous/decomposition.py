@@ -1,23 +1,29 @@
+import hashlib
+from collections import OrderedDict
+
 import numpy
 import scipy
 from sklearn.decomposition import PCA, FastICA, TruncatedSVD
 from sklearn.manifold import TSNE
 
 from auxiliary import normaliseString, properString
-from miscellaneous.incremental_pca import IncrementalPCA
+from miscellaneous.randomized_pca import RandomizedPCA
+from miscellaneous.neighbour_embedding import NeighbourEmbedding
 
 DECOMPOSITION_METHOD_NAMES = {
     "PCA": ["pca"],
     "SVD": ["svd"],
     "ICA": ["ica"],
-    "t-SNE": ["t_sne", "tsne"]
+    "t-SNE": ["t_sne", "tsne"],
+    "NE": ["ne", "neighbour_embedding", "neighbor_embedding"]
 }
 
 DECOMPOSITION_METHOD_LABEL = {
     "PCA": "PC",
     "SVD": "SVD",
     "ICA": "IC",
-    "t-SNE": "tSNE"
+    "t-SNE": "tSNE",
+    "NE": "NE"
 }
 
 DEFAULT_DECOMPOSITION_METHOD = "PCA"
@@ -25,6 +31,49 @@ DEFAULT_DECOMPOSITION_DIMENSIONALITY = 2
 
 MAXIMUM_FEATURE_SIZE_FOR_NORMAL_PCA = 2000
 
+CACHEABLE_DECOMPOSITION_METHODS = ["PCA", "SVD", "ICA"]
+MAXIMUM_NUMBER_OF_CACHED_DECOMPOSITION_MODELS = 8
+
+decomposition_models = OrderedDict()
+
+def decompositionModelKey(values, method, number_of_components):
+    
+    # Fitted models are identified by the content of the values they were
+    # fitted to
+    
+    hash_function = hashlib.sha1()
+    hash_function.update(
+        "{}:{}".format(method, number_of_components).encode())
+    
+    return hashValues(values, hash_function).hexdigest()
+
+def hashValues(values, hash_function=None):
+    
+    if hash_function is None:
+        hash_function = hashlib.sha1()
+    
+    hash_function.update(str(values.shape).encode())
+    
+    if scipy.sparse.issparse(values):
+        values = scipy.sparse.csr_matrix(values)
+        arrays = [values.data, values.indices, values.indptr]
+    else:
+        arrays = [numpy.asarray(values)]
+    
+    for array in arrays:
+        hash_function.update(str(array.dtype).encode())
+        hash_function.update(numpy.ascontiguousarray(array).data)
+    
+    return hash_function
+
+def cacheDecompositionModel(model_key, model):
+    
+    decomposition_models[model_key] = model
+    
+    while len(decomposition_models) \
+        > MAXIMUM_NUMBER_OF_CACHED_DECOMPOSITION_MODELS:
+            decomposition_models.popitem(last=False)
+
 def decompose(values, other_value_sets=[], centroids={}, method=None,
               number_of_components=None, random=False):
     
@@ -62,9 +111,9 @@ def decompose(values, other_value_sets=[], centroids={}, method=None,
             and not scipy.sparse.issparse(values):
             model = PCA(n_components=number_of_components)
         else:
-            model = IncrementalPCA(
+            model = RandomizedPCA(
                 n_components=number_of_components,
-                batch_size=100
+                random_state=random_state
             )
     elif method == "SVD":
         model = TruncatedSVD(n_components=number_of_components)
@@ -80,14 +129,30 @@ def decompose(values, other_value_sets=[], centroids={}, method=None,
             method=tsne_method,
             random_state=random_state
         )
+    elif method == "NE":
+        model = NeighbourEmbedding(
+            n_components=number_of_components,
+            random_state=random_state
+        )
     else:
         raise ValueError("Method `{}` not found.".format(method))
     
     # Fit and transform
     
-    values_decomposed = model.fit_transform(values)
+    if method in CACHEABLE_DECOMPOSITION_METHODS and not random:
+        model_key = decompositionModelKey(values, method, number_of_components)
+    else:
+        model_key = None
+    
+    if model_key in decomposition_models:
+        model = decomposition_models[model_key]
+        values_decomposed = model.transform(values)
+    else:
+        values_decomposed = model.fit_transform(values)
+        if model_key is not None:
+            cacheDecompositionModel(model_key, model)
     
-    if other_value_sets and method != "t_sne":
+    if other_value_sets and method != "t-SNE":
         other_value_sets_decomposed = []
         for other_values in other_value_sets:
             other_value_decomposed = model.transform(other_values)
@@ -99,7 +164,7 @@ def decompose(values, other_value_sets=[], centroids={}, method=None,
         other_value_sets_decomposed = other_value_sets_decomposed[0]
     
     # Only supports centroids without data sets as top levels
-    if centroids and method == "pca":
+    if centroids and method == "PCA":
         if "means" in centroids:
             centroids = {"unknown": centroids}
         W = model.components_
@@ -119,10 +184,8 @@ def decompose(values, other_value_sets=[], centroids={}, method=None,
                         shape = numpy.array(values.shape)
                         L = shape[-1]
                         reshaped_values = values.reshape(-1, L, L)
-                        B = reshaped_values.shape[0]
-                        decomposed_values = numpy.empty((B, 2, 2))
-                        for i in range(B):
-                            decomposed_values[i] = W @ reshaped_values[i] @ W.T
+                        decomposed_values = numpy.matmul(
+                            numpy.matmul(W, reshaped_values), W.T)
                         shape[-2:] = number_of_components
                         new_values = decomposed_values.reshape(shape)
                     else:
@@ -0,0 +1,216 @@
+# ======================================================================== #
+# 
+# Copyright (c) 2017 - 2018 scVAE authors
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# 
+# ======================================================================== #
+
+import numpy
+import scipy.sparse
+
+MAXIMUM_NUMBER_OF_LEVELS = 20
+MAXIMUM_NUMBER_OF_PASSES = 10
+MINIMUM_MODULARITY_GAIN = 1e-7
+
+def louvain(graph, resolution = 1, random_state = None):
+    """Communities of a weighted undirected graph maximising modularity.
+    
+    Values are moved to the neighbouring community giving the largest gain
+    in modularity until no move improves it. Communities are then merged
+    into single values of a smaller graph, and this is repeated until
+    communities no longer change.
+    """
+    
+    random_state = numpy.random.RandomState(random_state)
+    
+    graph = scipy.sparse.csr_matrix(graph, dtype = numpy.float64)
+    cluster_ids = numpy.arange(graph.shape[0])
+    
+    for level in range(MAXIMUM_NUMBER_OF_LEVELS):
+        
+        community_ids, communities_changed = moveValuesLocally(
+            graph, resolution, random_state)
+        
+        if not communities_changed:
+            break
+        
+        _, community_ids = numpy.unique(community_ids, return_inverse = True)
+        cluster_ids = community_ids[cluster_ids]
+        
+        graph = aggregateGraph(graph, community_ids)
+    
+    return cluster_ids
+
+def moveValuesLocally(graph, resolution, random_state):
+    
+    # Values are moved in batches of values that are not neighbours of each
+    # other, so that moving one value does not change the community weights
+    # of another value in the same batch
+    
+    N = graph.shape[0]
+    
+    degrees = numpy.asarray(graph.sum(axis = 1)).reshape(-1)
+    total_weight = degrees.sum()
+    
+    community_ids = numpy.arange(N)
+    community_degrees = degrees.copy()
+    
+    communities_changed = False
+    
+    if total_weight == 0:
+        return community_ids, communities_changed
+    
+    neighbour_graph = (graph - scipy.sparse.diags(graph.diagonal())).tocsr()
+    neighbour_graph.eliminate_zeros()
+    
+    batches = independentBatches(neighbour_graph, random_state)
+    
+    for i in range(MAXIMUM_NUMBER_OF_PASSES):
+        
+        number_of_moves = 0
+        
+        for b in random_state.permutation(len(batches)):
+            number_of_moves += moveBatchOfValues(
+                batches[b], neighbour_graph, degrees, total_weight,
+                community_ids, community_degrees, resolution
+            )
+        
+        if number_of_moves == 0:
+            break
+        
+        communities_changed = True
+    
+    return community_ids, communities_changed
+
+def independentBatches(neighbour_graph, random_state):
+    
+    # Batches of values with no neighbours in the same batch found as in the
+    # Jones-Plassmann colouring algorithm: values with a higher random
+    # priority than all their remaining neighbours form the next batch
+    
+    N = neighbour_graph.shape[0]
+    
+    priorities = random_state.permutation(N) + 1
+    remaining_priorities = priorities.copy()
+    remaining_indices = numpy.arange(N)
+    
+    batches = []
+    
+    while remaining_indices.size:
+        
+        remaining_graph = neighbour_graph[remaining_indices]
+        maximum_neighbour_priorities = scipy.sparse.csr_matrix(
+            (
+                remaining_priorities[remaining_graph.indices],
+                remaining_graph.indices,
+                remaining_graph.indptr
+            ),
+            shape = remaining_graph.shape
+        ).max(axis = 1).toarray().reshape(-1)
+        
+        in_batch = priorities[remaining_indices] \
+            > maximum_neighbour_priorities
+        batch = remaining_indices[in_batch]
+        
+        batches.append(batch)
+        
+        remaining_priorities[batch] = 0
+        remaining_indices = remaining_indices[~in_batch]
+    
+    return batches
+
+def moveBatchOfValues(batch, neighbour_graph, degrees, total_weight,
+    community_ids, community_degrees, resolution):
+    
+    # Each value is moved to the neighbouring community giving the largest
+    # gain in modularity, if it is larger than the gain of staying in its
+    # current community; community IDs and degrees are updated in place
+    
+    B = batch.size
+    N = community_ids.size
+    
+    batch_graph = neighbour_graph[batch]
+    batch_rows = numpy.repeat(numpy.arange(B), numpy.diff(batch_graph.indptr))
+    
+    # Summed weights of edges from each value to each neighbouring community
+    community_weights = scipy.sparse.csr_matrix(
+        (
+            batch_graph.data,
+            (batch_rows, community_ids[batch_graph.indices])
+        ),
+        shape = (B, N)
+    )
+    community_weights.sum_duplicates()
+    
+    rows = numpy.repeat(
+        numpy.arange(B), numpy.diff(community_weights.indptr))
+    neighbour_community_ids = community_weights.indices
+    weights = community_weights.data
+    
+    batch_degrees = degrees[batch]
+    current_community_ids = community_ids[batch]
+    
+    in_current_community = \
+        neighbour_community_ids == current_community_ids[rows]
+    
+    # Modularity gains up to a common factor with values removed from their
+    # current communities
+    gains = weights - resolution * batch_degrees[rows] * (
+        community_degrees[neighbour_community_ids]
+        - batch_degrees[rows] * in_current_community
+    ) / total_weight
+    current_gains = numpy.bincount(
+        rows[in_current_community],
+        weights = weights[in_current_community],
+        minlength = B
+    ) - resolution * batch_degrees * (
+        community_degrees[current_community_ids] - batch_degrees
+    ) / total_weight
+    
+    # Largest gain for each value with neighbours
+    has_neighbours = numpy.diff(community_weights.indptr) > 0
+    gain_order = numpy.lexsort((-gains, rows))
+    best_indices = gain_order[community_weights.indptr[:-1][has_neighbours]]
+    
+    best_gains = numpy.full(B, -numpy.inf)
+    best_gains[has_neighbours] = gains[best_indices]
+    best_community_ids = current_community_ids.copy()
+    best_community_ids[has_neighbours] = neighbour_community_ids[best_indices]
+    
+    moving = (best_gains > current_gains + MINIMUM_MODULARITY_GAIN) \
+        & (best_community_ids != current_community_ids)
+    
+    moving_values = batch[moving]
+    moving_degrees = degrees[moving_values]
+    
+    community_degrees -= numpy.bincount(current_community_ids[moving],
+        weights = moving_degrees, minlength = N)
+    community_degrees += numpy.bincount(best_community_ids[moving],
+        weights = moving_degrees, minlength = N)
+    
+    community_ids[moving_values] = best_community_ids[moving]
+    
+    return moving.sum()
+
+def aggregateGraph(graph, community_ids):
+    
+    N = graph.shape[0]
+    C = community_ids.max() + 1
+    
+    membership = scipy.sparse.csr_matrix(
+        (numpy.ones(N), (numpy.arange(N), community_ids)),
+        shape = (N, C)
+    )
+    
+    return (membership.T @ graph @ membership).tocsr()
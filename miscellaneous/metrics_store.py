@@ -0,0 +1,215 @@
+# ======================================================================== #
+# 
+# Copyright (c) 2017 - 2018 scVAE authors
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# 
+# ======================================================================== #
+
+import os
+import pickle
+import sqlite3
+
+METRICS_STORE_FILENAME = "metrics.sqlite"
+METRICS_STORE_TIMEOUT = 60
+
+METRICS_STORE_KEY_COLUMNS = [
+    "data_set",
+    "model",
+    "run",
+    "version",
+    "evaluation_set",
+    "record_kind",
+    "prediction_name"
+]
+
+# Model path relative to the data set directory as when walking it
+MODEL_PATH_EXPRESSION = (
+    "(CASE WHEN run = 'default' THEN model || ? || version "
+    "ELSE model || ? || run || ? || version END)"
+)
+
+def metricsStorePath(results_directory):
+    return os.path.join(results_directory, METRICS_STORE_FILENAME)
+
+def connectToMetricsStore(store_path):
+    
+    connection = sqlite3.connect(store_path, timeout = METRICS_STORE_TIMEOUT)
+    
+    # Each record is stored with its path components as separate, indexed
+    # columns, so that filtering on them does not require unpickling
+    with connection:
+        connection.execute(
+            "CREATE TABLE IF NOT EXISTS records ({}, timestamp REAL, "
+            "record BLOB, PRIMARY KEY ({}))".format(
+                ", ".join(column + " TEXT NOT NULL"
+                    for column in METRICS_STORE_KEY_COLUMNS),
+                ", ".join(METRICS_STORE_KEY_COLUMNS)
+            )
+        )
+        connection.execute(
+            "CREATE INDEX IF NOT EXISTS records_by_data_set_and_model "
+            "ON records (data_set, model)"
+        )
+    
+    return connection
+
+def recordKeysFromDirectory(directory, results_directory):
+    
+    # Results are saved in
+    # `<data set (3 parts)>/<model (3 parts)>/[<run>/]<version>`
+    # relative to the results directory
+    
+    parts = os.path.relpath(directory, results_directory).split(os.sep)
+    
+    data_set = os.sep.join(parts[:3])
+    model_parts = parts[3:]
+    model = os.sep.join(model_parts[:3])
+    
+    if len(model_parts) == 4:
+        run = "default"
+        version = model_parts[3]
+    elif len(model_parts) == 5:
+        run = model_parts[3]
+        version = model_parts[4]
+    else:
+        return None
+    
+    return data_set, model, run, version
+
+def appendToMetricsStore(store_path, directory, results_directory,
+    evaluation_set, record_kind, record, prediction_name = ""):
+    
+    record_keys = recordKeysFromDirectory(directory, results_directory)
+    
+    if record_keys is None:
+        return False
+    
+    appendRecordsToMetricsStore(
+        store_path,
+        [(record_keys, evaluation_set, record_kind, prediction_name, record)]
+    )
+    
+    return True
+
+def appendRecordsToMetricsStore(store_path, records):
+    
+    # Records are given as tuples of record keys (data set, model, run, and
+    # version), evaluation set, record kind, prediction name, and record
+    
+    connection = connectToMetricsStore(store_path)
+    
+    with connection:
+        connection.executemany(
+            "INSERT OR REPLACE INTO records VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            [
+                (
+                    *record_keys, evaluation_set, record_kind,
+                    prediction_name, record.get("timestamp", None),
+                    sqlite3.Binary(pickle.dumps(
+                        record, protocol = pickle.HIGHEST_PROTOCOL))
+                )
+                for record_keys, evaluation_set, record_kind,
+                    prediction_name, record in records
+            ]
+        )
+    
+    connection.close()
+
+def storedRecordKeys(store_path, evaluation_set = "test"):
+    
+    # Keys of stored records without reading the records themselves
+    
+    if not os.path.exists(store_path):
+        return set()
+    
+    connection = connectToMetricsStore(store_path)
+    
+    rows = connection.execute(
+        "SELECT data_set, model, run, version, record_kind, prediction_name "
+        "FROM records WHERE evaluation_set = ?",
+        [evaluation_set]
+    ).fetchall()
+    
+    connection.close()
+    
+    return {
+        ((data_set, model, run, version), record_kind, prediction_name)
+        for data_set, model, run, version, record_kind, prediction_name
+        in rows
+    }
+
+def stringFilters(expression, included_strings, excluded_strings,
+    expression_parameters = []):
+    
+    conditions = []
+    parameters = []
+    
+    for search_string in included_strings:
+        conditions.append("instr({}, ?) > 0".format(expression))
+        parameters.extend(expression_parameters + [search_string])
+    
+    for search_string in excluded_strings:
+        conditions.append("instr({}, ?) = 0".format(expression))
+        parameters.extend(expression_parameters + [search_string])
+    
+    return conditions, parameters
+
+def loadFromMetricsStore(store_path, evaluation_set = "test",
+    record_kind = None, data_set_included_strings = [],
+    data_set_excluded_strings = [], model_included_strings = [],
+    model_excluded_strings = []):
+    """Load records matching the search strings from a metrics store.
+    
+    Search strings are matched as substrings of the data set path and of
+    the model path including run and version (without the run for the
+    default run) in the same way as `cross_analysis.matchString`, but by
+    SQLite, so only matching records are read and unpickled.
+    """
+    
+    conditions = ["evaluation_set = ?"]
+    parameters = [evaluation_set]
+    
+    if record_kind:
+        conditions.append("record_kind = ?")
+        parameters.append(record_kind)
+    
+    data_set_conditions, data_set_parameters = stringFilters(
+        "data_set", data_set_included_strings, data_set_excluded_strings)
+    conditions.extend(data_set_conditions)
+    parameters.extend(data_set_parameters)
+    
+    model_conditions, model_parameters = stringFilters(
+        MODEL_PATH_EXPRESSION, model_included_strings, model_excluded_strings,
+        expression_parameters = [os.sep] * 3
+    )
+    conditions.extend(model_conditions)
+    parameters.extend(model_parameters)
+    
+    connection = connectToMetricsStore(store_path)
+    
+    rows = connection.execute(
+        "SELECT data_set, model, run, version, record_kind, prediction_name, "
+        "record FROM records WHERE {} ORDER BY data_set, model, run, version"
+        .format(" AND ".join(conditions)),
+        parameters
+    ).fetchall()
+    
+    connection.close()
+    
+    return [
+        (data_set, model, run, version, record_kind, prediction_name,
+            pickle.loads(record))
+        for data_set, model, run, version, record_kind, prediction_name,
+            record in rows
+    ]
@@ -0,0 +1,408 @@
+# ======================================================================== #
+# 
+# Copyright (c) 2017 - 2018 scVAE authors
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# 
+# ======================================================================== #
+
+import argparse
+import os
+
+import numpy
+import scipy.sparse
+import scipy.sparse.csgraph
+
+from concurrent.futures import ThreadPoolExecutor
+from time import time
+
+DEFAULT_NUMBER_OF_TREES = 10
+DEFAULT_LEAF_SIZE = 64
+
+class RandomProjectionForest(object):
+    """Approximate nearest neighbours of a set of values.
+    
+    Each tree recursively splits the values in two halves at the median of
+    their projections onto the difference between two random values until
+    at most `leaf_size` values remain. The neighbours of a value are then
+    searched for among the values sharing a leaf with it in any tree.
+    """
+    def __init__(self, number_of_trees = None, leaf_size = None,
+        random_state = None):
+        
+        if number_of_trees is None:
+            number_of_trees = DEFAULT_NUMBER_OF_TREES
+        
+        if leaf_size is None:
+            leaf_size = DEFAULT_LEAF_SIZE
+        
+        self.number_of_trees = number_of_trees
+        self.leaf_size = leaf_size
+        self.random_state = numpy.random.RandomState(random_state)
+    
+    def fit(self, values):
+        
+        if scipy.sparse.issparse(values):
+            values = values.A
+        
+        self.values = numpy.asarray(values, dtype = numpy.float32)
+        self.squared_norms = numpy.einsum(
+            "ij,ij->i", self.values, self.values)
+        
+        self.trees = [self._buildTree() for i in range(self.number_of_trees)]
+        
+        return self
+    
+    def _buildTree(self):
+        
+        leaves = []
+        nodes = [numpy.arange(self.values.shape[0])]
+        
+        while nodes:
+            
+            indices = nodes.pop()
+            
+            if len(indices) <= self.leaf_size:
+                leaves.append(indices)
+                continue
+            
+            i, j = self.random_state.choice(len(indices), 2, replace = False)
+            direction = self.values[indices[i]] - self.values[indices[j]]
+            projections = self.values[indices] @ direction
+            
+            # Splitting at the median keeps leaves at least half full
+            half = len(indices) // 2
+            order = numpy.argpartition(projections, half)
+            
+            nodes.append(indices[order[:half]])
+            nodes.append(indices[order[half:]])
+        
+        return leaves
+    
+    def kneighbors(self, number_of_neighbours):
+        
+        M = self.values.shape[0]
+        k = number_of_neighbours
+        
+        if 2 * k > self.leaf_size:
+            raise ValueError(
+                "Leaf size ({}) must be at least twice ".format(self.leaf_size)
+                + "the number of neighbours ({}).".format(k)
+            )
+        
+        neighbour_indices = numpy.full((M, k), -1, numpy.int64)
+        neighbour_distances = numpy.full((M, k), numpy.inf, numpy.float32)
+        
+        for leaves in self.trees:
+            for leaf in leaves:
+                
+                leaf_values = self.values[leaf]
+                leaf_squared_norms = self.squared_norms[leaf]
+                
+                leaf_distances = leaf_squared_norms[:, numpy.newaxis] \
+                    + leaf_squared_norms[numpy.newaxis] \
+                    - 2 * leaf_values @ leaf_values.T
+                numpy.maximum(leaf_distances, 0, out = leaf_distances)
+                numpy.sqrt(leaf_distances, out = leaf_distances)
+                numpy.fill_diagonal(leaf_distances, 0)
+                
+                candidate_indices = numpy.concatenate([
+                    neighbour_indices[leaf],
+                    numpy.broadcast_to(leaf, (len(leaf), len(leaf)))
+                ], axis = 1)
+                candidate_distances = numpy.concatenate(
+                    [neighbour_distances[leaf], leaf_distances], axis = 1)
+                
+                neighbour_distances[leaf], neighbour_indices[leaf] = \
+                    nearestCandidates(candidate_distances, candidate_indices, k)
+        
+        return neighbour_distances, neighbour_indices
+
+def nearestCandidates(candidate_distances, candidate_indices,
+    number_of_neighbours):
+    
+    # Remove candidates found more than once before keeping the nearest
+    order = numpy.lexsort((candidate_distances, candidate_indices))
+    candidate_indices = numpy.take_along_axis(
+        candidate_indices, order, axis = 1)
+    candidate_distances = numpy.take_along_axis(
+        candidate_distances, order, axis = 1)
+    duplicates = numpy.zeros(candidate_indices.shape, bool)
+    duplicates[:, 1:] = \
+        candidate_indices[:, 1:] == candidate_indices[:, :-1]
+    candidate_distances[duplicates] = numpy.inf
+    
+    order = numpy.argsort(candidate_distances, axis = 1, kind = "stable")
+    order = order[:, :number_of_neighbours]
+    
+    return (
+        numpy.take_along_axis(candidate_distances, order, axis = 1),
+        numpy.take_along_axis(candidate_indices, order, axis = 1)
+    )
+
+def approximateNearestNeighbours(values, number_of_neighbours,
+    number_of_trees = None, leaf_size = None, random_state = None,
+    number_of_workers = 1):
+    
+    # With more than one worker, the trees are split between forests
+    # searched in parallel, whose neighbours are merged afterwards
+    
+    if number_of_trees is None:
+        number_of_trees = DEFAULT_NUMBER_OF_TREES
+    
+    if leaf_size is None:
+        leaf_size = max(DEFAULT_LEAF_SIZE, 2 * number_of_neighbours)
+    
+    if number_of_workers is None:
+        number_of_workers = os.cpu_count() or 1
+    
+    number_of_workers = max(1, min(number_of_workers, number_of_trees))
+    
+    if number_of_workers == 1:
+        seeds = [random_state]
+    else:
+        seeds = numpy.random.RandomState(random_state).randint(
+            numpy.iinfo(numpy.int32).max, size = number_of_workers)
+    
+    def searchForest(i):
+        forest = RandomProjectionForest(
+            number_of_trees = len(range(i, number_of_trees, number_of_workers)),
+            leaf_size = leaf_size,
+            random_state = seeds[i]
+        )
+        forest.fit(values)
+        return forest.kneighbors(number_of_neighbours)
+    
+    if number_of_workers == 1:
+        return searchForest(0)
+    
+    with ThreadPoolExecutor(number_of_workers) as executor:
+        forest_neighbours = list(
+            executor.map(searchForest, range(number_of_workers)))
+    
+    neighbour_distances = numpy.concatenate(
+        [distances for distances, _ in forest_neighbours], axis = 1)
+    neighbour_indices = numpy.concatenate(
+        [indices for _, indices in forest_neighbours], axis = 1)
+    
+    return nearestCandidates(
+        neighbour_distances, neighbour_indices, number_of_neighbours)
+
+def nearestNeighbourGraph(neighbour_indices):
+    
+    # Symmetric connectivity graph linking values to their neighbours
+    # except themselves
+    
+    M, k = neighbour_indices.shape
+    
+    sources = numpy.repeat(numpy.arange(M), k)
+    targets = neighbour_indices.reshape(-1)
+    edges = (targets >= 0) & (targets != sources)
+    
+    graph = scipy.sparse.csr_matrix(
+        (
+            numpy.ones(edges.sum(), numpy.float32),
+            (sources[edges], targets[edges])
+        ),
+        shape = (M, M)
+    )
+    graph = graph.maximum(graph.T).tocsr()
+    
+    return graph
+
+def dbscanFromNeighbours(neighbour_distances, neighbour_indices,
+    maximum_neighbour_distance, minimum_neighbourhood_size):
+    """DBSCAN restricted to the edges of a nearest-neighbour graph.
+    
+    Neighbours include the values themselves, and there have to be at least
+    `minimum_neighbourhood_size` of them for every value. Unclustered values
+    get the cluster ID -1 as for `sklearn.cluster.DBSCAN`.
+    """
+    
+    M, k = neighbour_indices.shape
+    
+    core = neighbour_distances[:, minimum_neighbourhood_size - 1] \
+        <= maximum_neighbour_distance
+    
+    within_distance = (neighbour_distances <= maximum_neighbour_distance) \
+        & (neighbour_indices >= 0)
+    
+    sources = numpy.repeat(numpy.arange(M), k)[within_distance.reshape(-1)]
+    targets = neighbour_indices[within_distance]
+    
+    # Core values reachable from each other form clusters
+    
+    core_edges = core[sources] & core[targets]
+    core_graph = scipy.sparse.csr_matrix(
+        (
+            numpy.ones(core_edges.sum(), numpy.int8),
+            (sources[core_edges], targets[core_edges])
+        ),
+        shape = (M, M)
+    )
+    _, component_ids = scipy.sparse.csgraph.connected_components(
+        core_graph, directed = False)
+    
+    _, core_cluster_ids = numpy.unique(
+        component_ids[core], return_inverse = True)
+    
+    cluster_ids = numpy.full(M, -1, numpy.int64)
+    cluster_ids[core] = core_cluster_ids
+    
+    # Border values join a cluster of a core value within reach in either
+    # direction of the graph
+    
+    border_sources = numpy.concatenate([sources, targets])
+    border_targets = numpy.concatenate([targets, sources])
+    border_edges = core[border_sources] & ~core[border_targets]
+    
+    cluster_ids[border_targets[border_edges]] = \
+        cluster_ids[border_sources[border_edges]]
+    
+    return cluster_ids
+
+def benchmark(number_of_examples = 20000, number_of_features = 10,
+    number_of_clusters = 10, number_of_trees = None, skip_exact = False):
+    
+    # Imported here, since the prediction module uses this module
+    from sklearn.metrics import adjusted_rand_score
+    from auxiliary import formatDuration
+    from miscellaneous.prediction import louvainClusterIDs
+    
+    random_state = numpy.random.RandomState(57)
+    
+    cluster_centres = random_state.normal(
+        scale = 10, size = (number_of_clusters, number_of_features))
+    true_cluster_ids = random_state.randint(
+        number_of_clusters, size = number_of_examples)
+    values = cluster_centres[true_cluster_ids] + random_state.normal(
+        size = (number_of_examples, number_of_features))
+    
+    number_of_neighbours = 2 * number_of_features
+    
+    print("Benchmarking nearest neighbours, DBSCAN, and Louvain clustering for "
+        "{} examples with {} features in {} clusters.".format(
+            number_of_examples, number_of_features, number_of_clusters))
+    
+    start_time = time()
+    approximate_distances, approximate_indices = \
+        approximateNearestNeighbours(
+            values,
+            number_of_neighbours,
+            number_of_trees = number_of_trees,
+            random_state = 57
+        )
+    approximate_neighbours_duration = time() - start_time
+    
+    if not skip_exact:
+        benchmarkExactMethods(values, true_cluster_ids, number_of_neighbours,
+            approximate_indices, approximate_neighbours_duration)
+    else:
+        print("    Nearest neighbours: approximate {}.".format(
+            formatDuration(approximate_neighbours_duration)))
+    
+    start_time = time()
+    louvain_cluster_ids = louvainClusterIDs(values, approximate = True)
+    louvain_duration = time() - start_time
+    
+    print("    Louvain: {} ({} clusters), ".format(
+        formatDuration(louvain_duration), len(set(louvain_cluster_ids)))
+        + "adjusted Rand index vs true {:.3f}.".format(
+        adjusted_rand_score(true_cluster_ids, louvain_cluster_ids)))
+
+def benchmarkExactMethods(values, true_cluster_ids, number_of_neighbours,
+    approximate_indices, approximate_neighbours_duration):
+    
+    # Imported here, since the prediction module uses this module
+    from sklearn.metrics import adjusted_rand_score
+    from sklearn.neighbors import NearestNeighbors
+    from auxiliary import formatDuration
+    from miscellaneous.prediction import dbscanClusterIDs
+    
+    start_time = time()
+    exact_distances, exact_indices = NearestNeighbors(
+        n_neighbors = number_of_neighbours).fit(values).kneighbors(values)
+    exact_neighbours_duration = time() - start_time
+    
+    recall = numpy.mean([
+        len(numpy.intersect1d(exact_row, approximate_row))
+        for exact_row, approximate_row in zip(
+            exact_indices, approximate_indices)
+    ]) / number_of_neighbours
+    
+    print("    Nearest neighbours: exact {}, approximate {}, recall {:.3f}."\
+        .format(
+            formatDuration(exact_neighbours_duration),
+            formatDuration(approximate_neighbours_duration),
+            recall
+    ))
+    
+    start_time = time()
+    exact_cluster_ids = dbscanClusterIDs(values, approximate = False)
+    exact_dbscan_duration = time() - start_time
+    
+    start_time = time()
+    approximate_cluster_ids = dbscanClusterIDs(values, approximate = True)
+    approximate_dbscan_duration = time() - start_time
+    
+    print("    DBSCAN: exact {} ({} clusters), approximate {} ({} clusters)."\
+        .format(
+            formatDuration(exact_dbscan_duration),
+            len(set(exact_cluster_ids) - {-1}),
+            formatDuration(approximate_dbscan_duration),
+            len(set(approximate_cluster_ids) - {-1})
+    ))
+    print("    Adjusted Rand index: exact vs approximate {:.3f}, ".format(
+        adjusted_rand_score(exact_cluster_ids, approximate_cluster_ids))
+        + "approximate vs true {:.3f}.".format(
+        adjusted_rand_score(true_cluster_ids, approximate_cluster_ids)))
+
+parser = argparse.ArgumentParser(
+    description = "Benchmark approximate against exact nearest neighbours "
+        "and DBSCAN clustering as well as Louvain clustering.",
+    formatter_class = argparse.ArgumentDefaultsHelpFormatter
+)
+parser.add_argument(
+    "--number-of-examples", "-n",
+    type = int,
+    default = 20000,
+    help = "number of simulated examples"
+)
+parser.add_argument(
+    "--number-of-features", "-f",
+    type = int,
+    default = 10,
+    help = "number of features of simulated examples"
+)
+parser.add_argument(
+    "--number-of-clusters", "-k",
+    type = int,
+    default = 10,
+    help = "number of simulated clusters"
+)
+parser.add_argument(
+    "--number-of-trees", "-t",
+    type = int,
+    default = DEFAULT_NUMBER_OF_TREES,
+    help = "number of random-projection trees"
+)
+parser.add_argument(
+    "--skip-exact",
+    action = "store_true",
+    help = "only benchmark approximate methods (for large numbers of "
+        "examples)"
+)
+
+if __name__ == '__main__':
+    arguments = parser.parse_args()
+    benchmark(**vars(arguments))
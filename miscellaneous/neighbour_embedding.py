@@ -0,0 +1,416 @@
+# ======================================================================== #
+# 
+# Copyright (c) 2017 - 2018 scVAE authors
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# 
+# ======================================================================== #
+
+import argparse
+import os
+
+import numpy
+import scipy.optimize
+import scipy.sparse
+
+from sklearn.decomposition import PCA
+from sklearn.neighbors import NearestNeighbors
+
+from time import time
+
+from miscellaneous.nearest_neighbours import approximateNearestNeighbours
+
+DEFAULT_NUMBER_OF_NEIGHBOURS = 15
+DEFAULT_NUMBER_OF_NEGATIVE_SAMPLES = 5
+DEFAULT_MINIMUM_DISTANCE = 0.1
+DEFAULT_LEARNING_RATE = 1.0
+
+MAXIMUM_SAMPLE_SIZE_FOR_EXACT_NEAREST_NEIGHBOURS = 10000
+MAXIMUM_SAMPLE_SIZE_FOR_LONG_OPTIMISATION = 10000
+
+NUMBER_OF_BANDWIDTH_SEARCH_STEPS = 64
+MAXIMUM_GRADIENT = 4
+
+class NeighbourEmbedding(object):
+    """Nonlinear embedding of a nearest-neighbour graph.
+    
+    Values are linked to their nearest neighbours with weights decreasing
+    with distance, normalised so that the weights of each value sum to
+    log2 of the number of neighbours. Low-dimensional coordinates are then
+    optimised by stochastic gradient descent, where each epoch attracts the
+    ends of edges sampled in proportion to their weights and repels each
+    sampled edge head from a few randomly drawn values (negative sampling),
+    as for LargeVis and UMAP.
+    
+    For M values with D features, k neighbours, T random-projection trees,
+    E epochs and S negative samples per edge, the neighbour search takes
+    O(T M (log M + k) D) time in parallel over the trees, and the
+    optimisation takes O(E M k S) time and O(M k) memory, in contrast to
+    the O(M log M) time per iteration for Barnes-Hut t-SNE, which is
+    single-threaded in scikit-learn.
+    """
+    def __init__(self, n_components = 2, number_of_neighbours = None,
+        number_of_epochs = None, number_of_negative_samples = None,
+        minimum_distance = None, learning_rate = None, approximate = None,
+        number_of_workers = None, random_state = None):
+        
+        if number_of_neighbours is None:
+            number_of_neighbours = DEFAULT_NUMBER_OF_NEIGHBOURS
+        
+        if number_of_negative_samples is None:
+            number_of_negative_samples = DEFAULT_NUMBER_OF_NEGATIVE_SAMPLES
+        
+        if minimum_distance is None:
+            minimum_distance = DEFAULT_MINIMUM_DISTANCE
+        
+        if learning_rate is None:
+            learning_rate = DEFAULT_LEARNING_RATE
+        
+        if number_of_workers is None:
+            number_of_workers = os.cpu_count() or 1
+        
+        self.n_components = n_components
+        self.number_of_neighbours = number_of_neighbours
+        self.number_of_epochs = number_of_epochs
+        self.number_of_negative_samples = number_of_negative_samples
+        self.minimum_distance = minimum_distance
+        self.learning_rate = learning_rate
+        self.approximate = approximate
+        self.number_of_workers = number_of_workers
+        self.random_state = random_state
+    
+    def fit(self, X, y = None):
+        self.fit_transform(X)
+        return self
+    
+    def fit_transform(self, X, y = None):
+        
+        if scipy.sparse.issparse(X):
+            X = X.A
+        
+        X = numpy.asarray(X, dtype = numpy.float32)
+        M = X.shape[0]
+        
+        random_state = numpy.random.RandomState(self.random_state)
+        
+        neighbour_distances, neighbour_indices = self._nearestNeighbours(X)
+        graph = neighbourGraphWeights(neighbour_distances, neighbour_indices)
+        
+        self.a_, self.b_ = curveParameters(self.minimum_distance)
+        
+        # Start from the principal components scaled to a fixed range
+        embedding = PCA(
+            n_components = self.n_components,
+            random_state = random_state
+        ).fit_transform(X)
+        embedding = 10 * embedding / numpy.abs(embedding).max()
+        embedding += random_state.normal(
+            scale = 1e-4, size = embedding.shape)
+        
+        number_of_epochs = self.number_of_epochs
+        
+        if number_of_epochs is None:
+            if M > MAXIMUM_SAMPLE_SIZE_FOR_LONG_OPTIMISATION:
+                number_of_epochs = 200
+            else:
+                number_of_epochs = 500
+        
+        self.embedding_ = optimiseEmbedding(
+            embedding.astype(numpy.float64),
+            graph,
+            a = self.a_,
+            b = self.b_,
+            number_of_epochs = number_of_epochs,
+            number_of_negative_samples = self.number_of_negative_samples,
+            learning_rate = self.learning_rate,
+            random_state = random_state
+        )
+        
+        self.training_values_ = X
+        
+        return self.embedding_
+    
+    def transform(self, X):
+        
+        # New values are placed at the weighted mean of the coordinates of
+        # their nearest neighbours among the fitted values
+        
+        if scipy.sparse.issparse(X):
+            X = X.A
+        
+        X = numpy.asarray(X, dtype = numpy.float32)
+        
+        neighbour_distances, neighbour_indices = NearestNeighbors(
+            n_neighbors = self.number_of_neighbours,
+            n_jobs = self.number_of_workers
+        ).fit(self.training_values_).kneighbors(X)
+        
+        weights = 1 / (neighbour_distances + 1e-8)
+        weights /= weights.sum(axis = 1, keepdims = True)
+        
+        return numpy.einsum(
+            "ij,ijk->ik", weights, self.embedding_[neighbour_indices])
+    
+    def _nearestNeighbours(self, X):
+        
+        M = X.shape[0]
+        
+        # Neighbours include the values themselves
+        number_of_neighbours = min(self.number_of_neighbours + 1, M)
+        
+        approximate = self.approximate
+        
+        if approximate is None:
+            approximate = M > MAXIMUM_SAMPLE_SIZE_FOR_EXACT_NEAREST_NEIGHBOURS
+        
+        if approximate:
+            return approximateNearestNeighbours(
+                X,
+                number_of_neighbours,
+                random_state = self.random_state,
+                number_of_workers = self.number_of_workers
+            )
+        else:
+            return NearestNeighbors(
+                n_neighbors = number_of_neighbours,
+                n_jobs = self.number_of_workers
+            ).fit(X).kneighbors(X)
+
+def neighbourGraphWeights(neighbour_distances, neighbour_indices):
+    
+    # For each value, distances are shifted by the distance to its nearest
+    # other neighbour, and a bandwidth is found by bisection for all values
+    # at once, so that the weights sum to log2 of the number of neighbours
+    
+    M, k = neighbour_indices.shape
+    
+    distances = numpy.where(
+        neighbour_indices >= 0, neighbour_distances, numpy.inf)[:, 1:]
+    indices = neighbour_indices[:, 1:]
+    
+    finite_distances = numpy.where(numpy.isfinite(distances), distances, 0)
+    nearest_distances = finite_distances[:, 0]
+    shifted_distances = numpy.maximum(
+        distances - nearest_distances[:, numpy.newaxis], 0)
+    
+    target = numpy.log2(k)
+    
+    lower_bandwidths = numpy.zeros(M)
+    upper_bandwidths = numpy.full(M, numpy.inf)
+    bandwidths = numpy.ones(M)
+    
+    for step in range(NUMBER_OF_BANDWIDTH_SEARCH_STEPS):
+        
+        weight_sums = numpy.exp(
+            - shifted_distances / bandwidths[:, numpy.newaxis]).sum(axis = 1)
+        
+        too_large = weight_sums > target
+        
+        upper_bandwidths[too_large] = bandwidths[too_large]
+        lower_bandwidths[~too_large] = bandwidths[~too_large]
+        
+        bandwidths = numpy.where(
+            numpy.isinf(upper_bandwidths),
+            2 * bandwidths,
+            (lower_bandwidths + upper_bandwidths) / 2
+        )
+    
+    bandwidths = numpy.maximum(
+        bandwidths, 1e-3 * finite_distances.mean(axis = 1) + 1e-12)
+    
+    weights = numpy.exp(- shifted_distances / bandwidths[:, numpy.newaxis])
+    
+    edges = (indices >= 0) & numpy.isfinite(distances)
+    sources = numpy.repeat(numpy.arange(M), k - 1).reshape(M, k - 1)
+    
+    graph = scipy.sparse.csr_matrix(
+        (weights[edges], (sources[edges], indices[edges])),
+        shape = (M, M)
+    )
+    
+    # Fuzzy union of the directed graph with its transpose
+    transposed_graph = graph.T.tocsr()
+    graph = graph + transposed_graph - graph.multiply(transposed_graph)
+    graph = graph.tocoo()
+    graph.eliminate_zeros()
+    
+    return graph
+
+def curveParameters(minimum_distance, spread = 1):
+    
+    # Parameters of the low-dimensional similarity 1 / (1 + a d^(2 b))
+    # approximating 1 within the minimum distance and an exponential decay
+    # beyond it
+    
+    def curve(x, a, b):
+        return 1 / (1 + a * x ** (2 * b))
+    
+    x = numpy.linspace(0, 3 * spread, 300)
+    y = numpy.where(
+        x < minimum_distance,
+        1,
+        numpy.exp(-(x - minimum_distance) / spread)
+    )
+    
+    (a, b), _ = scipy.optimize.curve_fit(curve, x, y)
+    
+    return a, b
+
+def optimiseEmbedding(embedding, graph, a, b, number_of_epochs,
+    number_of_negative_samples, learning_rate, random_state):
+    
+    # Each epoch updates all coordinates at once from the gradients of the
+    # edges sampled in that epoch, which are summed per value with bincount
+    
+    M, D = embedding.shape
+    
+    heads = graph.row
+    tails = graph.col
+    edge_probabilities = graph.data / graph.data.max()
+    
+    def accumulate(indices, gradients):
+        return numpy.stack([
+            numpy.bincount(indices, weights = gradients[:, d], minlength = M)
+            for d in range(D)
+        ], axis = 1)
+    
+    for epoch in range(number_of_epochs):
+        
+        alpha = learning_rate * (1 - epoch / number_of_epochs)
+        
+        sampled = random_state.rand(len(heads)) < edge_probabilities
+        sampled_heads = heads[sampled]
+        sampled_tails = tails[sampled]
+        
+        # Attraction along edges
+        
+        differences = embedding[sampled_heads] - embedding[sampled_tails]
+        squared_distances = numpy.square(differences).sum(axis = 1)
+        
+        with numpy.errstate(divide = "ignore", invalid = "ignore"):
+            coefficients = -2 * a * b * squared_distances ** (b - 1) \
+                / (1 + a * squared_distances ** b)
+        coefficients[squared_distances == 0] = 0
+        
+        gradients = numpy.clip(
+            coefficients[:, numpy.newaxis] * differences,
+            -MAXIMUM_GRADIENT, MAXIMUM_GRADIENT
+        )
+        
+        updates = accumulate(sampled_heads, gradients) \
+            - accumulate(sampled_tails, gradients)
+        
+        # Repulsion from random values
+        
+        negative_heads = numpy.repeat(
+            sampled_heads, number_of_negative_samples)
+        negative_tails = random_state.randint(M, size = len(negative_heads))
+        
+        differences = embedding[negative_heads] - embedding[negative_tails]
+        squared_distances = numpy.square(differences).sum(axis = 1)
+        
+        coefficients = 2 * b / (
+            (0.001 + squared_distances) * (1 + a * squared_distances ** b))
+        coefficients[negative_heads == negative_tails] = 0
+        
+        gradients = numpy.clip(
+            coefficients[:, numpy.newaxis] * differences,
+            -MAXIMUM_GRADIENT, MAXIMUM_GRADIENT
+        )
+        
+        updates += accumulate(negative_heads, gradients)
+        
+        # Values with many sampled edges are not moved further than others
+        updates = numpy.clip(updates, -MAXIMUM_GRADIENT, MAXIMUM_GRADIENT)
+        
+        embedding += alpha * updates
+    
+    return embedding
+
+def neighbourPreservation(values, embedding, number_of_neighbours = 15):
+    
+    # Fraction of nearest neighbours of each value that are also its
+    # nearest neighbours in the embedding
+    
+    neighbours = [
+        NearestNeighbors(n_neighbors = number_of_neighbours + 1)
+            .fit(x).kneighbors(x, return_distance = False)[:, 1:]
+        for x in [values, embedding]
+    ]
+    
+    return numpy.mean([
+        len(numpy.intersect1d(original_row, embedded_row))
+        for original_row, embedded_row in zip(*neighbours)
+    ]) / number_of_neighbours
+
+def benchmark(number_of_examples = 10000, number_of_workers = None):
+    
+    # Imported here, since the decomposition module uses this module
+    from sklearn.manifold import TSNE
+    from auxiliary import formatDuration
+    from data import loadDevelopmentDataSet
+    
+    print("Benchmarking neighbour embedding against t-SNE on the development "
+        "data set with {} examples.".format(number_of_examples))
+    
+    data_dictionary = loadDevelopmentDataSet(
+        number_of_examples = number_of_examples,
+        number_of_features = 5 * 5,
+        scale = 10,
+        update_probability = 0.0001
+    )
+    values = numpy.log1p(data_dictionary["values"])
+    
+    start_time = time()
+    t_sne_values = TSNE(n_components = 2, random_state = 42)\
+        .fit_transform(values)
+    t_sne_duration = time() - start_time
+    
+    start_time = time()
+    embedded_values = NeighbourEmbedding(
+        n_components = 2,
+        number_of_workers = number_of_workers,
+        random_state = 42
+    ).fit_transform(values)
+    embedding_duration = time() - start_time
+    
+    print("    t-SNE: {}, neighbour preservation {:.3f}.".format(
+        formatDuration(t_sne_duration),
+        neighbourPreservation(values, t_sne_values)
+    ))
+    print("    Neighbour embedding: {}, neighbour preservation {:.3f}.".format(
+        formatDuration(embedding_duration),
+        neighbourPreservation(values, embedded_values)
+    ))
+
+parser = argparse.ArgumentParser(
+    description = "Benchmark neighbour embedding against t-SNE on the "
+        "development data set.",
+    formatter_class = argparse.ArgumentDefaultsHelpFormatter
+)
+parser.add_argument(
+    "--number-of-examples", "-n",
+    type = int,
+    default = 10000,
+    help = "number of examples in development data set"
+)
+parser.add_argument(
+    "--number-of-workers", "-w",
+    type = int,
+    default = None,
+    help = "number of threads for nearest-neighbour search"
+)
+
+if __name__ == '__main__':
+    arguments = parser.parse_args()
+    benchmark(**vars(arguments))
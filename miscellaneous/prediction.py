@@ -16,8 +16,9 @@
 # 
 # ======================================================================== #
 
+import os
+
 import numpy
-import scipy.stats
 from kneed import KneeLocator
 from sklearn.cluster import KMeans, MiniBatchKMeans, DBSCAN
 from sklearn.neighbors import NearestNeighbors
@@ -26,10 +27,15 @@ from scipy.signal import savgol_filter, convolve, windows
 from time import time
 
 from auxiliary import properString, formatDuration
+from miscellaneous.nearest_neighbours import (
+    approximateNearestNeighbours, nearestNeighbourGraph, dbscanFromNeighbours
+)
+from miscellaneous.graph_clustering import louvain
 
 PREDICTION_METHOD_NAMES = {
     "k-means": ["k_means", "kmeans"],
     "DBSCAN": ["dbscan"],
+    "Louvain": ["louvain", "graph", "knn_graph"],
     "model": ["model"],
     "test": ["test"],
     "copy": ["copy"]
@@ -47,6 +53,11 @@ PREDICTION_METHOD_SPECIFICATIONS = {
         "base": "density",
         "fixed number of clusters": False
     },
+    "Louvain": {
+        "inference": "transductive",
+        "base": "graph",
+        "fixed number of clusters": False
+    },
     "model": {
         "inference": "inductive",
         "base": "distribution",
@@ -56,6 +67,8 @@ PREDICTION_METHOD_SPECIFICATIONS = {
 }
 
 MAXIMUM_SAMPLE_SIZE_FOR_NORMAL_KMEANS = 10000
+MAXIMUM_SAMPLE_SIZE_FOR_EXACT_NEAREST_NEIGHBOURS = 10000
+NUMBER_OF_NEIGHBOURS_FOR_GRAPH_CLUSTERING = 15
 
 def predict(training_set, evaluation_set, method = "copy",
     number_of_clusters = 2):
@@ -90,39 +103,27 @@ def predict(training_set, evaluation_set, method = "copy",
     
     if evaluation_set.has_labels:
         
-        class_names_to_class_ids = numpy.vectorize(lambda class_name:
-            evaluation_set.class_name_to_class_id[class_name])
-        class_ids_to_class_names = numpy.vectorize(lambda class_id:
-            evaluation_set.class_id_to_class_name[class_id])
-            
-        evaluation_label_ids = class_names_to_class_ids(
-            evaluation_set.labels)
+        evaluation_label_ids = classNamesToClassIDs(
+            evaluation_set.labels, evaluation_set.class_names)
         
         if evaluation_set.excluded_classes:
-            excluded_class_ids = class_names_to_class_ids(
-                evaluation_set.excluded_classes)
+            excluded_class_ids = classNamesToClassIDs(
+                evaluation_set.excluded_classes, evaluation_set.class_names)
         else:
             excluded_class_ids = []
     
     if evaluation_set.has_superset_labels:
         
-        superset_class_names_to_superset_class_ids = numpy.vectorize(
-            lambda superset_class_name: evaluation_set\
-                .superset_class_name_to_superset_class_id[superset_class_name]
+        evaluation_superset_label_ids = classNamesToClassIDs(
+            evaluation_set.superset_labels,
+            evaluation_set.superset_class_names
         )
-        superset_class_ids_to_superset_class_names = numpy.vectorize(
-            lambda superset_class_id: evaluation_set\
-                .superset_class_id_to_superset_class_name[superset_class_id]
-        )
-        
-        evaluation_superset_label_ids = \
-            superset_class_names_to_superset_class_ids(
-                evaluation_set.superset_labels)
         
         if evaluation_set.excluded_superset_classes:
-            excluded_superset_class_ids = \
-                superset_class_names_to_superset_class_ids(
-                    evaluation_set.excluded_superset_classes)
+            excluded_superset_class_ids = classNamesToClassIDs(
+                evaluation_set.excluded_superset_classes,
+                evaluation_set.superset_class_names
+            )
         else:
             excluded_superset_class_ids = []
     
@@ -151,33 +152,10 @@ def predict(training_set, evaluation_set, method = "copy",
         cluster_ids = model.predict(evaluation_set.values)
     
     elif method == "DBSCAN":
-        
-        minimum_neighbourhood_size = 2 * evaluation_set.number_of_features
-        
-        knn_model = NearestNeighbors(
-            n_neighbors=minimum_neighbourhood_size - 1
-        )
-        knn_model.fit(evaluation_set.values)
-        knn_distance_matrix, knn_index_matrix = knn_model.kneighbors(evaluation_set.values)
-        knn_distances = knn_distance_matrix[:, -1]
-        knn_distances_sorted = numpy.sort(knn_distances)[::-1]
-        
-        cut_off = int(0.5 * len(knn_distances))
-        knee_locator = KneeLocator(
-            x=numpy.arange(cut_off),
-            y=knn_distances_sorted[:cut_off],
-            # S=1.0,
-            curve="convex",
-            direction="decreasing"
-        )
-        index_knee = knee_locator.knee
-        maximum_neighbour_distance = knn_distances_sorted[index_knee]
-        
-        model = DBSCAN(
-            eps=maximum_neighbour_distance,
-            min_samples=minimum_neighbourhood_size
-        )
-        cluster_ids = model.fit_predict(evaluation_set.values)
+        cluster_ids = dbscanClusterIDs(evaluation_set.values)
+    
+    elif method == "Louvain":
+        cluster_ids = louvainClusterIDs(evaluation_set.values)
     
     else:
         raise ValueError("Prediction method not found: `{}`.".format(method))
@@ -190,7 +168,8 @@ def predict(training_set, evaluation_set, method = "copy",
                 cluster_ids,
                 excluded_class_ids
             )
-            predicted_labels = class_ids_to_class_names(predicted_label_ids)
+            predicted_labels = classIDsToClassNames(
+                predicted_label_ids, evaluation_set.class_names)
         
         if predicted_superset_labels is None \
             and evaluation_set.has_superset_labels:
@@ -200,9 +179,10 @@ def predict(training_set, evaluation_set, method = "copy",
                 cluster_ids,
                 excluded_superset_class_ids
             )
-            predicted_superset_labels = \
-                superset_class_ids_to_superset_class_names(
-                    predicted_superset_label_ids)
+            predicted_superset_labels = classIDsToClassNames(
+                predicted_superset_label_ids,
+                evaluation_set.superset_class_names
+            )
     
     prediction_duration = time() - prediction_time_start
     print("Labels predicted ({}).".format(
@@ -210,15 +190,154 @@ def predict(training_set, evaluation_set, method = "copy",
     
     return cluster_ids, predicted_labels, predicted_superset_labels
 
+def dbscanClusterIDs(values, approximate = None):
+    
+    # The neighbourhood radius is estimated from the knee of the sorted
+    # distances to the farthest of the nearest neighbours, and the same
+    # neighbours are used to expand clusters from core values when they are
+    # found approximately
+    
+    number_of_examples, number_of_features = values.shape
+    
+    if approximate is None:
+        approximate = number_of_examples \
+            > MAXIMUM_SAMPLE_SIZE_FOR_EXACT_NEAREST_NEIGHBOURS
+    
+    minimum_neighbourhood_size = 2 * number_of_features
+    
+    if approximate:
+        knn_distance_matrix, knn_index_matrix = approximateNearestNeighbours(
+            values,
+            number_of_neighbours = minimum_neighbourhood_size
+        )
+        knn_distances = knn_distance_matrix[:, -2]
+    else:
+        knn_model = NearestNeighbors(
+            n_neighbors=minimum_neighbourhood_size - 1
+        )
+        knn_model.fit(values)
+        knn_distance_matrix, knn_index_matrix = knn_model.kneighbors(values)
+        knn_distances = knn_distance_matrix[:, -1]
+    
+    knn_distances_sorted = numpy.sort(knn_distances)[::-1]
+    
+    cut_off = int(0.5 * len(knn_distances))
+    knee_locator = KneeLocator(
+        x=numpy.arange(cut_off),
+        y=knn_distances_sorted[:cut_off],
+        # S=1.0,
+        curve="convex",
+        direction="decreasing"
+    )
+    index_knee = knee_locator.knee
+    maximum_neighbour_distance = knn_distances_sorted[index_knee]
+    
+    if approximate:
+        cluster_ids = dbscanFromNeighbours(
+            knn_distance_matrix,
+            knn_index_matrix,
+            maximum_neighbour_distance = maximum_neighbour_distance,
+            minimum_neighbourhood_size = minimum_neighbourhood_size
+        )
+    else:
+        model = DBSCAN(
+            eps=maximum_neighbour_distance,
+            min_samples=minimum_neighbourhood_size
+        )
+        cluster_ids = model.fit_predict(values)
+    
+    return cluster_ids
+
+def louvainClusterIDs(values, number_of_neighbours = None,
+    approximate = None):
+    
+    if number_of_neighbours is None:
+        number_of_neighbours = NUMBER_OF_NEIGHBOURS_FOR_GRAPH_CLUSTERING
+    
+    number_of_examples = values.shape[0]
+    
+    if approximate is None:
+        approximate = number_of_examples \
+            > MAXIMUM_SAMPLE_SIZE_FOR_EXACT_NEAREST_NEIGHBOURS
+    
+    # Neighbours include the values themselves
+    if approximate:
+        _, knn_index_matrix = approximateNearestNeighbours(
+            values,
+            number_of_neighbours = number_of_neighbours + 1,
+            number_of_workers = os.cpu_count()
+        )
+    else:
+        knn_model = NearestNeighbors(
+            n_neighbors=number_of_neighbours + 1,
+            n_jobs=-1
+        )
+        knn_model.fit(values)
+        knn_index_matrix = knn_model.kneighbors(
+            values, return_distance=False)
+    
+    knn_graph = nearestNeighbourGraph(knn_index_matrix)
+    
+    cluster_ids = louvain(knn_graph, random_state = 42)
+    
+    return cluster_ids
+
+def classNamesToClassIDs(labels, class_names):
+    
+    # Only unique labels are looked up among the class names
+    
+    unique_labels, label_indices = numpy.unique(
+        labels, return_inverse = True)
+    
+    class_names = numpy.asarray(class_names)
+    class_name_order = numpy.argsort(class_names)
+    unique_label_ids = class_name_order[numpy.searchsorted(
+        class_names, unique_labels, sorter = class_name_order)]
+    
+    return unique_label_ids[label_indices]
+
+def classIDsToClassNames(class_ids, class_names):
+    return numpy.asarray(class_names)[class_ids]
+
+def contingencyTable(label_ids, cluster_ids, number_of_classes = None):
+    
+    # Number of examples for each cluster (rows) and class ID (columns)
+    
+    label_ids = numpy.asarray(label_ids)
+    
+    cluster_values, cluster_indices = numpy.unique(
+        cluster_ids, return_inverse = True)
+    
+    K = len(cluster_values)
+    
+    if number_of_classes is None:
+        number_of_classes = label_ids.max() + 1 if label_ids.size else 0
+    
+    table = numpy.bincount(
+        cluster_indices * number_of_classes + label_ids,
+        minlength = K * number_of_classes
+    ).reshape(K, number_of_classes)
+    
+    return table, cluster_values, cluster_indices
+
 def mapClusterIDsToLabelIDs(label_ids, cluster_ids, excluded_class_ids = []):
-    unique_cluster_ids = numpy.unique(cluster_ids).tolist()
-    predicted_label_ids = numpy.zeros_like(cluster_ids)
-    for unique_cluster_id in unique_cluster_ids:
-        idx = cluster_ids == unique_cluster_id
-        lab = label_ids[idx]
-        for excluded_class_id in excluded_class_ids:
-            lab = lab[lab != excluded_class_id]
-        if len(lab) == 0:
-            continue
-        predicted_label_ids[idx] = scipy.stats.mode(lab)[0]
+    
+    # Each cluster is mapped to its most frequent class that is not
+    # excluded, or to class ID 0 if it only has excluded classes
+    
+    cluster_ids = numpy.asarray(cluster_ids)
+    
+    table, _, cluster_indices = contingencyTable(label_ids, cluster_ids)
+    
+    excluded_class_ids = numpy.asarray(excluded_class_ids, dtype = int)
+    excluded_class_ids = excluded_class_ids[
+        excluded_class_ids < table.shape[1]]
+    table[:, excluded_class_ids] = 0
+    
+    cluster_label_ids = table.argmax(axis = 1)
+    cluster_label_ids[table.max(axis = 1) == 0] = 0
+    
+    predicted_label_ids = cluster_label_ids[cluster_indices].astype(
+        cluster_ids.dtype)
+    
     return predicted_label_ids
@@ -0,0 +1,203 @@
+# ======================================================================== #
+# 
+# Copyright (c) 2017 - 2018 scVAE authors
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# 
+# ======================================================================== #
+
+import numpy
+import scipy.linalg
+import scipy.sparse
+
+from concurrent.futures import ThreadPoolExecutor
+
+DEFAULT_BLOCK_SIZE = 10000
+DEFAULT_NUMBER_OF_OVERSAMPLES = 10
+DEFAULT_NUMBER_OF_POWER_ITERATIONS = 4
+
+def rowBlocks(number_of_rows, block_size = None):
+    
+    if block_size is None:
+        block_size = DEFAULT_BLOCK_SIZE
+    
+    return [
+        slice(start, min(start + block_size, number_of_rows))
+        for start in range(0, number_of_rows, block_size)
+    ]
+
+def centredProjection(X, components, mean, block_size = None,
+    number_of_workers = None, dtype = numpy.float32):
+    """Project values onto components after centring them.
+    
+    Uses that `(X - mean) @ W.T = X @ W.T - mean @ W.T`, so blocks of
+    sparse values are never made dense. The blocks are projected in
+    parallel into a preallocated single-precision array by default.
+    """
+    
+    M = X.shape[0]
+    K = components.shape[0]
+    
+    components_transposed = components.T
+    mean_projection = numpy.asarray(mean) @ components_transposed
+    
+    X_projected = numpy.empty((M, K), dtype = dtype)
+    
+    def projectBlock(block):
+        X_block_projected = X[block] @ components_transposed
+        X_projected[block] = X_block_projected - mean_projection
+    
+    with ThreadPoolExecutor(number_of_workers) as executor:
+        list(executor.map(projectBlock, rowBlocks(M, block_size)))
+    
+    return X_projected
+
+class RandomizedPCA(object):
+    """PCA by randomised singular value decomposition with implicit centring.
+    
+    The centred values `C = X - 1 mean` are only used through products
+    
+        C @ Q = X @ Q - 1 (mean @ Q) and
+        C.T @ Q = X.T @ Q - mean.T (1.T @ Q),
+    
+    which are computed for blocks of rows in parallel, so sparse and
+    memory-mapped values are neither made dense nor loaded at once. See
+    Halko, Martinsson, and Tropp (2011) for the algorithm.
+    """
+    def __init__(self, n_components = 2, n_oversamples = None,
+        n_iterations = None, block_size = None, number_of_workers = None,
+        random_state = None):
+        
+        if n_oversamples is None:
+            n_oversamples = DEFAULT_NUMBER_OF_OVERSAMPLES
+        
+        if n_iterations is None:
+            n_iterations = DEFAULT_NUMBER_OF_POWER_ITERATIONS
+        
+        self.n_components = n_components
+        self.n_oversamples = n_oversamples
+        self.n_iterations = n_iterations
+        self.block_size = block_size
+        self.number_of_workers = number_of_workers
+        self.random_state = random_state
+    
+    def _mapBlocks(self, function, X):
+        with ThreadPoolExecutor(self.number_of_workers) as executor:
+            return list(executor.map(
+                lambda block: function(X[block]),
+                rowBlocks(X.shape[0], self.block_size)
+            ))
+    
+    def _centredProduct(self, X, Q):
+        # C @ Q
+        Y = numpy.concatenate(self._mapBlocks(
+            lambda X_block: numpy.asarray(X_block @ Q), X))
+        return Y - self.mean_ @ Q
+    
+    def _transposedCentredProduct(self, X, Q):
+        # C.T @ Q summed over blocks of rows
+        Z = numpy.zeros((X.shape[1], Q.shape[1]))
+        with ThreadPoolExecutor(self.number_of_workers) as executor:
+            for Z_block in executor.map(
+                lambda block: numpy.asarray(X[block].T @ Q[block]),
+                rowBlocks(X.shape[0], self.block_size)
+            ):
+                Z += Z_block
+        return Z - numpy.outer(self.mean_, Q.sum(axis = 0))
+    
+    def fit(self, X, y = None):
+        self._fit(X)
+        return self
+    
+    def fit_transform(self, X, y = None):
+        U, S = self._fit(X)
+        return U * S
+    
+    def transform(self, X):
+        return centredProjection(
+            X,
+            self.components_,
+            self.mean_,
+            block_size = self.block_size,
+            number_of_workers = self.number_of_workers
+        )
+    
+    def _fit(self, X):
+        
+        if scipy.sparse.issparse(X):
+            X = scipy.sparse.csr_matrix(X)
+        
+        M, N = X.shape
+        K = self.n_components
+        L = min(K + self.n_oversamples, M, N)
+        
+        random_state = numpy.random.RandomState(self.random_state)
+        
+        # Column means and variances
+        
+        def columnSums(X_block):
+            if scipy.sparse.issparse(X_block):
+                squared_X_block = X_block.multiply(X_block)
+            else:
+                X_block = numpy.asarray(X_block, dtype = numpy.float64)
+                squared_X_block = numpy.square(X_block)
+            return (
+                numpy.asarray(X_block.sum(axis = 0), numpy.float64).ravel(),
+                numpy.asarray(
+                    squared_X_block.sum(axis = 0), numpy.float64).ravel()
+            )
+        
+        column_sums = self._mapBlocks(columnSums, X)
+        column_sum = sum(sums for sums, _ in column_sums)
+        squared_column_sum = sum(
+            squared_sums for _, squared_sums in column_sums)
+        
+        self.mean_ = column_sum / M
+        total_variance = numpy.sum(
+            squared_column_sum - M * numpy.square(self.mean_)) / (M - 1)
+        
+        # Range of the centred values
+        
+        Q = self._centredProduct(X, random_state.normal(size = (N, L)))
+        Q, _ = scipy.linalg.qr(Q, mode = "economic")
+        
+        for i in range(self.n_iterations):
+            Q, _ = scipy.linalg.qr(
+                self._transposedCentredProduct(X, Q), mode = "economic")
+            Q, _ = scipy.linalg.qr(
+                self._centredProduct(X, Q), mode = "economic")
+        
+        # Singular value decomposition in that range
+        
+        B = self._transposedCentredProduct(X, Q).T
+        U_B, S, V = scipy.linalg.svd(B, full_matrices = False)
+        U = Q @ U_B
+        
+        U, S, V = U[:, :K], S[:K], V[:K]
+        
+        # Deterministic signs with the largest loading of each component
+        # being positive
+        signs = numpy.sign(V[numpy.arange(K), numpy.abs(V).argmax(axis = 1)])
+        signs[signs == 0] = 1
+        U *= signs
+        V *= signs[:, numpy.newaxis]
+        
+        self.components_ = V
+        self.singular_values_ = S
+        self.explained_variance_ = numpy.square(S) / (M - 1)
+        self.explained_variance_ratio_ = \
+            self.explained_variance_ / total_variance
+        self.n_samples_ = M
+        self.n_features_ = N
+        
+        return U, S
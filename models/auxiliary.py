@@ -36,6 +36,10 @@ from auxiliary import capitaliseString
 
 LENTGH_OF_RUN_ID_ALPHABETICAL_PART = 2
 
+EVALUATION_MEMORY_BUDGET = 2 ** 30 # bytes
+NUMBER_OF_BYTES_PER_VALUE = 4 # float32
+NUMBER_OF_FEATURE_TENSORS_PER_SAMPLE = 4
+
 ## N(mu=0,sigma=sqrt(2/n_in)) weight and 0-bias initialiser.
 # weights_init = variance_scaling_initializer(factor=2.0, mode ='FAN_IN', 
 #     uniform = False, seed = None, dtype = tf.float32)
@@ -167,6 +171,44 @@ def reduce_logmeanexp(input_tensor, axis=None, keepdims=False):
 
     return -tf.log(n) + logsumexp
 
+def antithetic_normal_sample(mean, stddev, number_of_iw_samples,
+    number_of_mc_samples):
+    # Reparameterised Gaussian samples, where the noise of the second half of
+    # the Monte Carlo samples is the negated noise of the first half
+    # (R, ceil(L/2), B, D) --> (R, L, B, D) --> (R * L * B, D)
+    latent_size = mean.shape[-1].value
+    number_of_noise_samples = (number_of_mc_samples + 1) // 2
+    noise = tf.random_normal(tf.stack([
+        number_of_iw_samples,
+        number_of_noise_samples,
+        tf.shape(mean)[-2],
+        latent_size
+    ]))
+    noise = tf.concat([noise, -noise], axis = 1)[:, :number_of_mc_samples]
+    samples = tf.reshape(mean + stddev * noise, [-1, latent_size])
+    return samples
+
+def monte_carlo_estimator_variance(estimates, antithetic = False):
+    # Variance of the Monte Carlo mean of per-example estimates over
+    # independent replicates, where antithetic pairs are averaged first
+    # (L, B) --> (B)
+    number_of_estimates = tf.shape(estimates)[0]
+    number_of_noise_samples = (number_of_estimates + 1) // 2
+    replicates = tf.cond(
+        antithetic,
+        lambda: (
+            estimates[:number_of_estimates - number_of_noise_samples]
+            + estimates[number_of_noise_samples:]
+        ) / 2,
+        lambda: estimates
+    )
+    number_of_replicates = tf.cast(tf.shape(replicates)[0], tf.float32)
+    replicate_mean = tf.reduce_mean(replicates, axis = 0)
+    variance = tf.reduce_sum(tf.square(replicates - replicate_mean), axis = 0) \
+        / tf.maximum(number_of_replicates - 1, 1) \
+        / tf.maximum(number_of_replicates, 1)
+    return variance
+
 def pairwise_distance(a, b = None):
     if not b:
         r = tf.reduce_sum(a*a, axis = 1, keepdims=True)
@@ -258,6 +300,53 @@ def dataString(data_set, reconstruction_distribution_name):
     
     return data_string
 
+# Evaluation
+
+def planEvaluationBatchSize(feature_size, latent_size, hidden_sizes,
+    number_of_samples = 1, number_of_latent_clusters = 1,
+    number_of_examples = None, maximum_batch_size = None,
+    memory_budget = None):
+    
+    # Largest batch size for which the estimated size of the intermediate
+    # tensors of one evaluation step fits within the memory budget.
+    # For each example, the encoder is run once, whereas the latent samples,
+    # the decoder, and the (R·L·B, F) reconstruction tensors (tiled targets,
+    # distribution parameters, and log-likelihoods) are computed for each of
+    # the R·L samples and for each latent cluster.
+    
+    if memory_budget is None:
+        memory_budget = EVALUATION_MEMORY_BUDGET
+    
+    hidden_size = sum(hidden_sizes)
+    
+    number_of_values_per_example = 4 * feature_size + hidden_size \
+        + 2 * latent_size
+    number_of_values_per_sample = number_of_latent_clusters * (
+        2 * latent_size + hidden_size
+        + NUMBER_OF_FEATURE_TENSORS_PER_SAMPLE * feature_size
+    )
+    number_of_values_per_example += \
+        number_of_samples * number_of_values_per_sample
+    
+    batch_size = int(memory_budget
+        // (NUMBER_OF_BYTES_PER_VALUE * number_of_values_per_example))
+    
+    if maximum_batch_size:
+        batch_size = min(batch_size, maximum_batch_size)
+    
+    if number_of_examples:
+        batch_size = min(batch_size, number_of_examples)
+    
+    batch_size = max(batch_size, 1)
+    
+    return batch_size
+
+def numberOfMonteCarloReplicates(number_of_mc_samples, antithetic = False):
+    if antithetic:
+        return number_of_mc_samples - (number_of_mc_samples + 1) // 2
+    else:
+        return number_of_mc_samples
+
 # Model
 
 def generateRunID(timestamp = None):
@@ -22,10 +22,11 @@ from models.auxiliary import (
     dense_layer, dense_layers,
     earlyStoppingStatus,
     log_reduce_exp, reduce_logmeanexp,
+    antithetic_normal_sample, monte_carlo_estimator_variance,
     trainingString, dataString,
     generateUniqueRunIDForModel,
     correctModelCheckpointPath, copyModelDirectory, removeOldCheckpoints,
-    clearLogDirectory
+    clearLogDirectory, planEvaluationBatchSize, numberOfMonteCarloReplicates
 )
 
 from tensorflow.python.ops.nn import relu, softmax
@@ -220,6 +221,8 @@ class GaussianMixtureVariationalAutoencoder(object):
                 [],
                 'number_of_mc_samples'
             )
+            self.use_antithetic_z = tf.placeholder_with_default(False, [],
+                'use_antithetic_z')
             
             # Sum up counts in replicated_n feature if needed
             if self.count_sum_feature:
@@ -523,9 +526,17 @@ class GaussianMixtureVariationalAutoencoder(object):
                 ### Sampling of
                     ### 1st dim.: importance weighting samples
                     ### 2nd dim.: monte carlo samples
-                z_samples = q_z_given_x_y.sample(
-                            self.S_iw * self.S_mc
-                            )
+                # Antithetic pairs of Monte Carlo samples for variance
+                # reduction
+                z_samples = tf.cond(self.use_antithetic_z,
+                    lambda: antithetic_normal_sample(
+                        z_mean,
+                        q_z_given_x_y.stddev(),
+                        self.S_iw,
+                        self.S_mc
+                    ),
+                    lambda: q_z_given_x_y.sample(self.S_iw * self.S_mc)
+                )
                 z = tf.cast(
                     tf.reshape(
                         z_samples,
@@ -855,6 +866,7 @@ class GaussianMixtureVariationalAutoencoder(object):
         KL_z_mean = [None] * self.K
         log_p_x_given_z_mean = [None] * self.K
         log_likelihood_x_z = [None] * self.K
+        lower_bound_estimates = [None] * self.K
         p_x_means = [None] * self.K
         p_x_variance_weighted = [None] * self.K
         mean_of_p_x_given_z_variances = [None] * self.K
@@ -913,6 +925,14 @@ class GaussianMixtureVariationalAutoencoder(object):
                 ),
                 axis = 0
             ) * self.q_y_given_x_probs[:, k]
+            
+            # Lower-bound estimates for each Monte Carlo sample
+            # (R, L, B) --> (L, B)
+            lower_bound_estimates[k] = tf.reduce_mean(
+                log_p_x_given_z
+                - self.warm_up_weight * self.kl_weight * KL_z[k],
+                axis = 0
+            ) * self.q_y_given_x_probs[:, k]
 
             # Importance weighted Monte Carlo estimates of: 
             # Reconstruction mean (marginalised conditional mean): 
@@ -1026,6 +1046,13 @@ class GaussianMixtureVariationalAutoencoder(object):
         # self.ELBO = self.ENRE - self.KL
         tf.add_to_collection('losses', self.ELBO)
         
+        # Variance of the Monte Carlo estimate for each example
+        # (L, B) --> (B)
+        self.lower_bound_estimator_variance = monte_carlo_estimator_variance(
+            tf.add_n(lower_bound_estimates)
+                - self.warm_up_weight * self.kl_weight * tf.reshape(KL_y, [-1]),
+            antithetic = self.use_antithetic_z
+        )
     
     def training(self):
         
@@ -2164,9 +2191,11 @@ class GaussianMixtureVariationalAutoencoder(object):
             return status, run_id
     
     def evaluate(self, evaluation_set, evaluation_subset_indices = set(),
-        batch_size = 100, predict_labels = True, run_id = None,
+        batch_size = None, memory_budget = None,
+        predict_labels = True, run_id = None,
         use_early_stopping_model = False, use_best_model = False,
-        output_versions = "all", log_results = True):
+        use_antithetic_z = False, output_versions = "all",
+        log_results = True):
         
         # Setup
         
@@ -2310,16 +2339,30 @@ class GaussianMixtureVariationalAutoencoder(object):
                 )
                 return [None] * len(output_versions)
             
+            batch_size = planEvaluationBatchSize(
+                feature_size = self.feature_size,
+                latent_size = self.latent_size,
+                hidden_sizes = self.hidden_sizes,
+                number_of_samples =
+                    self.number_of_importance_samples["evaluation"]
+                    * self.number_of_monte_carlo_samples["evaluation"],
+                number_of_latent_clusters = self.K,
+                number_of_examples = M_eval,
+                maximum_batch_size = batch_size,
+                memory_budget = memory_budget
+            )
+            
             data_string = dataString(evaluation_set,
                 self.reconstruction_distribution_name)
-            print('Evaluating trained {} on {}.'.format(model_string,
-                data_string))
+            print('Evaluating trained {} on {} in batches of {} examples.'\
+                .format(model_string, data_string, batch_size))
             evaluating_time_start = time()
             
             ELBO_eval = 0
             KL_z_eval = 0
             KL_y_eval = 0
             ENRE_eval = 0
+            ELBO_variance_eval = 0
             
             if log_results:
                 q_y_probabilities = numpy.zeros(self.K)
@@ -2358,7 +2401,8 @@ class GaussianMixtureVariationalAutoencoder(object):
                     self.S_iw:
                         self.number_of_importance_samples["evaluation"],
                     self.S_mc:
-                        self.number_of_monte_carlo_samples["evaluation"]
+                        self.number_of_monte_carlo_samples["evaluation"],
+                    self.use_antithetic_z: use_antithetic_z
                 }
                 if self.count_sum:
                     feed_dict_batch[self.n] = n_eval[indices]
@@ -2366,7 +2410,7 @@ class GaussianMixtureVariationalAutoencoder(object):
                 if self.count_sum_feature:
                     feed_dict_batch[self.n_feature] = n_feature_eval[indices]
 
-                (ELBO_i, ENRE_i, KL_z_i, KL_y_i,
+                (ELBO_i, ENRE_i, KL_z_i, KL_y_i, ELBO_variance_i,
                     q_y_probabilities_i, q_z_means_i, q_z_variances_i,
                     p_y_probabilities_i, p_z_means_i, p_z_variances_i,
                     q_y_logits_i, p_x_mean_i,
@@ -2374,6 +2418,7 @@ class GaussianMixtureVariationalAutoencoder(object):
                     y_mean_i, z_mean_i) = session.run(
                         [
                             self.ELBO, self.ENRE, self.KL_z, self.KL_y,
+                            self.lower_bound_estimator_variance,
                             self.q_y_probabilities, self.q_z_means, 
                             self.q_z_variances, self.p_y_probabilities, 
                             self.p_z_means, self.p_z_variances,
@@ -2384,18 +2429,23 @@ class GaussianMixtureVariationalAutoencoder(object):
                         feed_dict = feed_dict_batch
                     )
                 
-                ELBO_eval += ELBO_i
-                KL_z_eval += KL_z_i
-                KL_y_eval += KL_y_i
-                ENRE_eval += ENRE_i
+                ELBO_eval += ELBO_i * indices.size
+                KL_z_eval += KL_z_i * indices.size
+                KL_y_eval += KL_y_i * indices.size
+                ENRE_eval += ENRE_i * indices.size
+                ELBO_variance_eval += ELBO_variance_i.sum()
                 
                 if log_results:
-                    q_y_probabilities += numpy.array(q_y_probabilities_i)
-                    q_z_means += numpy.array(q_z_means_i)
-                    q_z_variances += numpy.array(q_z_variances_i)
-                    p_y_probabilities += numpy.array(p_y_probabilities_i)
-                    p_z_means += numpy.array(p_z_means_i)
-                    p_z_variances += numpy.array(p_z_variances_i)
+                    q_y_probabilities += numpy.array(q_y_probabilities_i) \
+                        * indices.size
+                    q_z_means += numpy.array(q_z_means_i) * indices.size
+                    q_z_variances += numpy.array(q_z_variances_i) \
+                        * indices.size
+                    p_y_probabilities += numpy.array(p_y_probabilities_i) \
+                        * indices.size
+                    p_z_means += numpy.array(p_z_means_i) * indices.size
+                    p_z_variances += numpy.array(p_z_variances_i) \
+                        * indices.size
                 
                 q_y_logits[indices] = q_y_logits_i
                 
@@ -2412,18 +2462,27 @@ class GaussianMixtureVariationalAutoencoder(object):
                     y_mean_eval[indices] = y_mean_i 
                     z_mean_eval[indices] = z_mean_i 
             
-            ELBO_eval /= M_eval / batch_size
-            KL_z_eval /= M_eval / batch_size
-            KL_y_eval /= M_eval / batch_size
-            ENRE_eval /= M_eval / batch_size
+            ELBO_eval /= M_eval
+            KL_z_eval /= M_eval
+            KL_y_eval /= M_eval
+            ENRE_eval /= M_eval
+            
+            # Standard error of the Monte Carlo estimate of the ELBO
+            if numberOfMonteCarloReplicates(
+                self.number_of_monte_carlo_samples["evaluation"],
+                use_antithetic_z) > 1:
+                ELBO_standard_error_eval = numpy.sqrt(ELBO_variance_eval) \
+                    / M_eval
+            else:
+                ELBO_standard_error_eval = None
             
             if log_results:
-                q_y_probabilities /= M_eval / batch_size
-                q_z_means /= M_eval / batch_size
-                q_z_variances /= M_eval / batch_size
-                p_y_probabilities /= M_eval / batch_size
-                p_z_means /= M_eval / batch_size
-                p_z_variances /= M_eval / batch_size
+                q_y_probabilities /= M_eval
+                q_z_means /= M_eval
+                q_z_variances /= M_eval
+                p_y_probabilities /= M_eval
+                p_z_means /= M_eval
+                p_z_variances /= M_eval
             
             evaluation_cluster_ids = q_y_logits.argmax(axis = 1)
             
@@ -2463,6 +2522,9 @@ class GaussianMixtureVariationalAutoencoder(object):
                 summary = tf.Summary()
                 summary.value.add(tag="losses/lower_bound",
                     simple_value = ELBO_eval)
+                if ELBO_standard_error_eval is not None:
+                    summary.value.add(tag="standard_errors/lower_bound",
+                        simple_value = ELBO_standard_error_eval)
                 summary.value.add(tag="losses/reconstruction_error",
                     simple_value = ENRE_eval)
                 summary.value.add(tag="losses/kl_divergence_z",
@@ -2514,8 +2576,13 @@ class GaussianMixtureVariationalAutoencoder(object):
             evaluation_string = "    {} set ({}): ".format(
                 evaluation_set.kind.capitalize(),
                 formatDuration(evaluating_duration))
+            if ELBO_standard_error_eval is not None:
+                ELBO_string = "ELBO: {:.5g} ± {:.2g}".format(
+                    ELBO_eval, ELBO_standard_error_eval)
+            else:
+                ELBO_string = "ELBO: {:.5g}".format(ELBO_eval)
             evaluation_metrics = [
-                "ELBO: {:.5g}".format(ELBO_eval),
+                ELBO_string,
                 "ENRE: {:.5g}".format(ENRE_eval),
                 "KL_z: {:.5g}".format(KL_z_eval),
                 "KL_y: {:.5g}".format(KL_y_eval)
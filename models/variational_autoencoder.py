@@ -20,11 +20,12 @@ import tensorflow as tf
 
 from models.auxiliary import (
     dense_layer, dense_layers, log_reduce_exp, reduce_logmeanexp,
+    antithetic_normal_sample, monte_carlo_estimator_variance,
     earlyStoppingStatus,
     trainingString, dataString,
     generateUniqueRunIDForModel,
     correctModelCheckpointPath, copyModelDirectory, removeOldCheckpoints,
-    clearLogDirectory
+    clearLogDirectory, planEvaluationBatchSize, numberOfMonteCarloReplicates
 )
 
 from tensorflow.python.ops.nn import relu, softmax
@@ -217,6 +218,8 @@ class VariationalAutoencoder(object):
                 [],
                 'number_of_mc_samples'
             )
+            self.use_antithetic_z = tf.placeholder_with_default(False, [],
+                'use_antithetic_z')
 
             self.model_graph()
             self.loss()
@@ -591,11 +594,25 @@ class VariationalAutoencoder(object):
             self.number_of_iw_samples * self.number_of_mc_samples
         )
 
+        if "mixture" in self.latent_distribution["posterior"]["name"]:
+            sample_z = lambda: self.q_z_given_x.sample(total_number_of_samples)
+        else:
+            # Antithetic pairs of Monte Carlo samples for variance reduction
+            sample_z = lambda: tf.cond(self.use_antithetic_z,
+                lambda: antithetic_normal_sample(
+                    self.q_z_mean,
+                    self.q_z_given_x.stddev(),
+                    self.number_of_iw_samples,
+                    self.number_of_mc_samples
+                ),
+                lambda: self.q_z_given_x.sample(total_number_of_samples)
+            )
+        
         self.z = tf.cast(
             tf.reshape(
                 tf.cond(self.use_deterministic_z, 
                     lambda: tf.expand_dims(self.q_z_mean, 0),
-                    lambda: self.q_z_given_x.sample(total_number_of_samples)
+                    sample_z
                 ),
                 [-1, self.latent_size]
             ), tf.float32
@@ -942,6 +959,13 @@ class VariationalAutoencoder(object):
 
         # average over eq_samples, batch_size dimensions    -> shape: ()
         self.lower_bound = tf.reduce_mean(LL) # scalar
+        
+        # Variance of the Monte Carlo estimate for each example
+        # (L, batch_size) -> shape: (batch_size)
+        self.lower_bound_estimator_variance = monte_carlo_estimator_variance(
+            tf.reshape(LL, [self.number_of_mc_samples, -1]),
+            antithetic = self.use_antithetic_z
+        )
 
         # # Averaging over samples.
         # self.lower_bound = tf.subtract(log_p_x_given_z, 
@@ -1862,10 +1886,16 @@ class VariationalAutoencoder(object):
             return status, run_id
     
     def evaluate(self, evaluation_set, evaluation_subset_indices = set(),
-        batch_size = 100, predict_labels = False, run_id = None,
+        batch_size = None, memory_budget = None,
+        predict_labels = False, run_id = None,
         use_early_stopping_model = False, use_best_model = False,
-        use_deterministic_z = False, output_versions = "all",
-        log_results = True):
+        use_deterministic_z = False, use_antithetic_z = False,
+        output_versions = "all", log_results = True):
+        
+        if use_antithetic_z and "mixture" in \
+            self.latent_distribution["posterior"]["name"]:
+                raise ValueError("Antithetic sampling is only available for "
+                    + "a Gaussian latent posterior distribution.")
         
         if run_id:
             run_id = checkRunID(run_id)
@@ -1888,10 +1918,6 @@ class VariationalAutoencoder(object):
         
         evaluation_set_transformed = False
         
-        batch_size /= self.number_of_importance_samples["evaluation"] \
-            * self.number_of_monte_carlo_samples["evaluation"]
-        batch_size = int(numpy.ceil(batch_size))
-        
         if self.count_sum:
             n_eval = evaluation_set.count_sum
         
@@ -1963,15 +1989,35 @@ class VariationalAutoencoder(object):
                 )
                 return [None] * len(output_versions)
             
+            if use_deterministic_z:
+                number_of_iw_samples = 1
+                number_of_mc_samples = 1
+            else:
+                number_of_iw_samples = \
+                    self.number_of_importance_samples["evaluation"]
+                number_of_mc_samples = \
+                    self.number_of_monte_carlo_samples["evaluation"]
+            
+            batch_size = planEvaluationBatchSize(
+                feature_size = self.feature_size,
+                latent_size = self.latent_size,
+                hidden_sizes = self.hidden_sizes,
+                number_of_samples = number_of_iw_samples * number_of_mc_samples,
+                number_of_examples = M_eval,
+                maximum_batch_size = batch_size,
+                memory_budget = memory_budget
+            )
+            
             data_string = dataString(evaluation_set,
                 self.reconstruction_distribution_name)
-            print('Evaluating trained {} on {}.'.format(model_string,
-                data_string))
+            print('Evaluating trained {} on {} in batches of {} examples.'\
+                .format(model_string, data_string, batch_size))
             evaluating_time_start = time()
             
             ELBO_eval = 0
             KL_eval = 0
             ENRE_eval = 0
+            ELBO_variance_eval = 0
             
             if "reconstructed" in output_versions:
                 p_x_mean_eval = numpy.empty((M_eval, F_eval), numpy.float32)
@@ -1984,15 +2030,6 @@ class VariationalAutoencoder(object):
                 q_z_mean_eval = numpy.empty([M_eval, self.latent_size],
                     numpy.float32)
             
-            if use_deterministic_z:
-                number_of_iw_samples = 1
-                number_of_mc_samples = 1
-            else:
-                number_of_iw_samples = \
-                    self.number_of_importance_samples["evaluation"]
-                number_of_mc_samples = \
-                    self.number_of_monte_carlo_samples["evaluation"]
-
             for i in range(0, M_eval, batch_size):
                 
                 indices = numpy.arange(i, min(i + batch_size, M_eval))
@@ -2007,7 +2044,8 @@ class VariationalAutoencoder(object):
                     self.use_deterministic_z: use_deterministic_z,
                     self.warm_up_weight: 1.0,
                     self.number_of_iw_samples: number_of_iw_samples,
-                    self.number_of_mc_samples: number_of_mc_samples
+                    self.number_of_mc_samples: number_of_mc_samples,
+                    self.use_antithetic_z: use_antithetic_z
                 }
                 if self.count_sum:
                     feed_dict_batch[self.n] = n_eval[indices]
@@ -2015,18 +2053,20 @@ class VariationalAutoencoder(object):
                 if self.count_sum_feature:
                     feed_dict_batch[self.n_feature] = n_feature_eval[indices]
                 
-                (ELBO_i, KL_i, ENRE_i, p_x_mean_i,
+                (ELBO_i, KL_i, ENRE_i, ELBO_variance_i, p_x_mean_i,
                     p_x_stddev_i, stddev_of_p_x_mean_i,
                     q_z_mean_i) = session.run(
-                    [self.ELBO, self.KL, self.ENRE, self.p_x_mean,
+                    [self.ELBO, self.KL, self.ENRE,
+                        self.lower_bound_estimator_variance, self.p_x_mean,
                         self.p_x_stddev, self.stddev_of_p_x_given_z_mean,
                         self.q_z_mean],
                     feed_dict = feed_dict_batch
                 )
                 
-                ELBO_eval += ELBO_i
-                KL_eval += KL_i
-                ENRE_eval += ENRE_i
+                ELBO_eval += ELBO_i * indices.size
+                KL_eval += KL_i * indices.size
+                ENRE_eval += ENRE_i * indices.size
+                ELBO_variance_eval += ELBO_variance_i.sum()
                 
                 if "reconstructed" in output_versions:
                     # Save Importance weighted Monte Carlo estimates of: 
@@ -2055,9 +2095,17 @@ class VariationalAutoencoder(object):
                     # Latent space
                     q_z_mean_eval[indices] = q_z_mean_i
             
-            ELBO_eval /= M_eval / batch_size
-            KL_eval /= M_eval / batch_size
-            ENRE_eval /= M_eval / batch_size
+            ELBO_eval /= M_eval
+            KL_eval /= M_eval
+            ENRE_eval /= M_eval
+            
+            # Standard error of the Monte Carlo estimate of the ELBO
+            if numberOfMonteCarloReplicates(number_of_mc_samples,
+                use_antithetic_z) > 1:
+                ELBO_standard_error_eval = numpy.sqrt(ELBO_variance_eval) \
+                    / M_eval
+            else:
+                ELBO_standard_error_eval = None
             
             ## Summaries
             
@@ -2066,6 +2114,9 @@ class VariationalAutoencoder(object):
                 summary = tf.Summary()
                 summary.value.add(tag="losses/lower_bound",
                     simple_value = ELBO_eval)
+                if ELBO_standard_error_eval is not None:
+                    summary.value.add(tag="standard_errors/lower_bound",
+                        simple_value = ELBO_standard_error_eval)
                 summary.value.add(tag="losses/reconstruction_error",
                     simple_value = ENRE_eval)
                 summary.value.add(tag="losses/kl_divergence",
@@ -2107,11 +2158,15 @@ class VariationalAutoencoder(object):
                 eval_summary_writer.flush()
             
             evaluating_duration = time() - evaluating_time_start
+            if ELBO_standard_error_eval is not None:
+                ELBO_string = "ELBO: {:.5g} ± {:.2g}".format(
+                    ELBO_eval, ELBO_standard_error_eval)
+            else:
+                ELBO_string = "ELBO: {:.5g}".format(ELBO_eval)
             print("    {} set ({}): ".format(
                 evaluation_set.kind.capitalize(),
-                formatDuration(evaluating_duration)) + \
-                "ELBO: {:.5g}, ENRE: {:.5g}, KL: {:.5g}.".format(
-                ELBO_eval, ENRE_eval, KL_eval))
+                formatDuration(evaluating_duration)) + ELBO_string + \
+                ", ENRE: {:.5g}, KL: {:.5g}.".format(ENRE_eval, KL_eval))
             
             # Data sets
             